@@ -1,25 +1,34 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from jose import jwt, JWTError
-from passlib.context import CryptContext
-from fastapi import HTTPException, status, Depends
+from fastapi import HTTPException, status, Depends, Request
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
 from .config import settings
-from .db import get_db
+from .db import get_db, get_async_db, async_engine
 from .models import User
-
-pwd = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from .cache import MemoryBackend
+from .metrics import cache_requests
+from .hashing import pwd
 oauth2 = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+log = logging.getLogger(__name__)
 
-def hash_password(p: str) -> str: 
+def hash_password(p: str) -> str:
     return pwd.hash(p)
 
-def verify_password(p: str, h: str) -> bool: 
+def verify_password(p: str, h: str) -> bool:
     return pwd.verify(p, h)
 
 def create_token(user: User) -> str:
-    exp = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_MINUTES)
-    payload = {"sub": str(user.id), "nick": user.nickname, "adm": user.is_admin, "exp": exp}
+    now = datetime.utcnow()
+    exp = now + timedelta(minutes=settings.ACCESS_TOKEN_MINUTES)
+    payload = {"sub": str(user.id), "nick": user.nickname, "adm": user.is_admin, "iat": now, "exp": exp}
     return jwt.encode(payload, settings.JWT_SECRET, algorithm=settings.JWT_ALG)
 
 def decode_token(token: str) -> dict:
@@ -28,15 +37,121 @@ def decode_token(token: str) -> dict:
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2)) -> User:
+
+# ---------- principal cache ----------
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """What request handlers need to know about the caller; cached instead of a `users` lookup."""
+    id: int
+    nickname: str
+    email: str
+    is_admin: bool
+    tokens_valid_after: int
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(user.id, user.nickname, user.email, user.is_admin, user.tokens_valid_after or 0)
+
+# per worker; changes from other workers and processes (e.g. app.create_admin) arrive as
+# NOTIFY on USERS_CHANNEL (users_notify trigger, see migrate.user_notifications)
+_principals = MemoryBackend(settings.AUTH_CACHE_MAX_ENTRIES)
+USERS_CHANNEL = "zg_users"
+_listening = False  # cached entries are only trusted while watch_users is connected
+_changes = 0  # bumped on every invalidation: an entry read before one is not cached
+
+def invalidate_user(user_id: int) -> None:
+    global _changes
+    _changes += 1
+    _principals.delete(str(user_id))
+
+def _on_notify(conn, pid, channel, payload):
+    invalidate_user(int(payload))
+
+async def watch_users():
+    """Listen for users changes committed anywhere; reconnects, and forgets everything after a gap."""
+    global _listening, _changes
+    listener = create_async_engine(async_engine.url, poolclass=NullPool)
+    try:
+        while True:
+            try:
+                async with listener.connect() as conn:
+                    raw = (await conn.get_raw_connection()).driver_connection
+                    await raw.add_listener(USERS_CHANNEL, _on_notify)
+                    _changes += 1
+                    _principals.clear()
+                    _listening = True
+                    while True:
+                        await asyncio.sleep(settings.AUTH_LISTEN_CHECK_SECONDS)
+                        await raw.execute("SELECT 1")
+            except Exception as e:  # DBAPIError on connect, raw asyncpg errors on the heartbeat
+                log.warning("users listener lost: %s", e)
+            finally:
+                _listening = False
+            await asyncio.sleep(1)
+    finally:
+        await listener.dispose()
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target: User):
+    invalidate_user(target.id)
+
+def revoke_tokens(user: User) -> None:
+    """Reject every token issued before now (commit the session to persist)."""
+    user.tokens_valid_after = int(time.time())
+
+def _token_claims(token: str) -> tuple[int, int]:
     data = decode_token(token)
-    user_id = int(data.get("sub"))
-    user = db.get(User, user_id)
-    if not user:
+    try:
+        return int(data.get("sub")), int(data.get("iat") or 0)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+def _check(request: Request, principal: Principal | None, issued_at: int) -> Principal:
+    if principal is None:
         raise HTTPException(status_code=401, detail="User not found")
+    if issued_at < principal.tokens_valid_after:
+        raise HTTPException(status_code=401, detail="Token revoked")
+    request.state.user_id = principal.id  # read-your-writes routing, see main.request_metrics
+    return principal
+
+def _cached(user_id: int) -> Principal | None:
+    principal = _principals.get(str(user_id)) if _listening else None
+    cache_requests.inc(cache="principal", result="miss" if principal is None else "hit")
+    return principal
+
+def _remember(user: User, changes: int) -> Principal:
+    principal = Principal.from_user(user)
+    if _listening and changes == _changes:
+        _principals.set(str(user.id), principal, settings.AUTH_CACHE_TTL_SECONDS)
+    return principal
+
+def get_current_user(request: Request, db: Session = Depends(get_db), token: str = Depends(oauth2)) -> Principal:
+    user_id, issued_at = _token_claims(token)
+    principal = _cached(user_id)
+    if principal is None:
+        changes = _changes
+        user = db.get(User, user_id)
+        if user:
+            principal = _remember(user, changes)
+    return _check(request, principal, issued_at)
+
+async def get_current_user_async(request: Request, db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2)) -> Principal:
+    user_id, issued_at = _token_claims(token)
+    principal = _cached(user_id)
+    if principal is None:
+        changes = _changes
+        user = await db.get(User, user_id)
+        if user:
+            principal = _remember(user, changes)
+    return _check(request, principal, issued_at)
+
+def require_admin(user: Principal = Depends(get_current_user)) -> Principal:
+    if not user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin only")
     return user
 
-def require_admin(user: User = Depends(get_current_user)) -> User:
+async def require_admin_async(user: Principal = Depends(get_current_user_async)) -> Principal:
     if not user.is_admin:
         raise HTTPException(status_code=403, detail="Admin only")
     return user
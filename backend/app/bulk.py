@@ -0,0 +1,260 @@
+"""Bulk admin product upserts (CSV / NDJSON keyed by slug) and zipped images.
+
+Rows are parsed while the body streams in and validated one by one (a bad row
+is reported and skipped). The valid ones are diffed against the current
+products, locked FOR UPDATE, and applied in one transaction: multi-row INSERTs
+for new slugs, UPDATE ... FROM (VALUES ...) for changed ones. A field a row
+leaves out keeps its value: missing CSV column or empty cell, missing NDJSON
+key (an NDJSON null clears supplier / category). New products without a
+category get one from the category rules.
+
+Images come as a zip of <slug>.<jpg|png|webp> files (folders ignored), go
+through the image worker pool a few at a time and are saved in one commit; a
+file that can't be read is reported and skipped.
+"""
+import asyncio
+import codecs
+import csv
+import os
+import zipfile
+import zlib
+from collections import defaultdict
+from typing import AsyncIterator
+
+import anyio.to_thread
+import orjson
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import select, insert, update, values, column, Integer, String, Text, Numeric
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .categories import default_rules
+from .config import settings
+from .images import FORMATS, BAD_IMAGE, process_image, media_files, remove_media
+from .media import amedia_lock, aunused, missing
+from .models import Product
+from .schemas import ProductBulkRow
+from .workers import WorkerPool
+
+FIELDS = ("name", "description", "supplier", "category", "price")
+CHUNK = 4000  # rows per statement; asyncpg takes at most 32767 bind parameters
+
+
+async def _lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()  # Excel puts a BOM first
+    tail = ""
+    try:
+        async for chunk in stream:
+            *lines, tail = (tail + decoder.decode(chunk)).split("\n")
+            for line in lines:
+                yield line + "\n"
+        tail += decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise HTTPException(400, "Файл має бути в UTF-8")
+    if tail:
+        yield tail
+
+
+async def csv_records(stream: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, dict | str]]:
+    """(line, fields) per record; empty cells are left out. Quoted cells may span lines."""
+    header = None
+    record, start, n = "", 0, 0
+    async for line in _lines(stream):
+        n += 1
+        start = start if record else n
+        record += line
+        if record.count('"') % 2:  # inside a quoted cell
+            continue
+        cells = next(csv.reader([record]), [])
+        record = ""
+        if not any(c.strip() for c in cells):
+            continue
+        if header is None:
+            header = [c.strip().lower() for c in cells]
+            unknown = set(header) - {"slug", *FIELDS}
+            if "slug" not in header or unknown:
+                raise HTTPException(400, f"CSV: потрібна колонка slug, дозволені {', '.join(FIELDS)}"
+                                         + (f"; невідомі: {', '.join(sorted(unknown))}" if unknown else ""))
+            continue
+        if len(cells) > len(header):
+            yield start, "Більше клітинок, ніж колонок"
+            continue
+        fields = {k: v.strip() for k, v in zip(header, cells) if v.strip()}
+        if "price" in fields:
+            fields["price"] = fields["price"].replace(",", ".").replace(" ", "")
+        yield start, fields
+    if record:
+        yield start, "Незакрита лапка"
+
+
+async def ndjson_records(stream: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, dict | str]]:
+    n = 0
+    async for line in _lines(stream):
+        n += 1
+        if not line.strip():
+            continue
+        try:
+            obj = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            yield n, "Некоректний JSON"
+            continue
+        yield n, obj if isinstance(obj, dict) else "Рядок має бути JSON-обʼєктом"
+
+
+def _error(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, err['loc'])) or 'row'}: {err['msg']}" for err in e.errors())
+
+
+def _chunks(rows: list) -> list[list]:
+    return [rows[i:i + CHUNK] for i in range(0, len(rows), CHUNK)]
+
+
+TYPES = {"name": String, "description": Text, "supplier": String, "category": String, "price": Numeric(10, 2)}
+
+
+def _update(fields: tuple[str, ...], rows: list[tuple]):
+    # only the columns that change: a price-only update doesn't re-run the search_vector trigger
+    v = values(column("id", Integer), *(column(f, TYPES[f]) for f in fields), name="v").data(rows)
+    return update(Product).where(Product.id == v.c.id).values(**{f: v.c[f] for f in fields})
+
+
+async def import_products(db: AsyncSession, records: AsyncIterator[tuple[int, dict | str]], dry_run: bool) -> dict:
+    report, rows = [], {}
+    async for line, raw in records:
+        if len(report) >= settings.BULK_MAX_ROWS:
+            raise HTTPException(413, f"Не більше {settings.BULK_MAX_ROWS} рядків за раз")
+        entry = {"line": line, "slug": raw.get("slug") if isinstance(raw, dict) else None}
+        report.append(entry)
+        if isinstance(raw, str):
+            entry.update(status="error", error=raw)
+            continue
+        try:
+            row = ProductBulkRow.model_validate(raw)
+        except ValidationError as e:
+            entry.update(status="error", error=_error(e))
+            continue
+        entry["slug"] = row.slug = row.slug.strip()
+        if row.slug in rows:
+            entry.update(status="error", error=f"slug уже був у рядку {rows[row.slug][0]['line']}")
+            continue
+        rows[row.slug] = (entry, row)
+
+    current = {}
+    for slugs in _chunks(list(rows)):
+        stmt = select(Product.id, Product.slug, *(getattr(Product, f) for f in FIELDS)).where(Product.slug.in_(slugs))
+        current.update((r.slug, r) for r in await db.execute(stmt if dry_run else stmt.with_for_update()))
+
+    inserts, updates = [], defaultdict(list)
+    for slug, (entry, row) in rows.items():
+        given = row.model_dump(include=row.model_fields_set - {"slug"})
+        if given.get("description", "") is None:
+            given["description"] = ""
+        old = current.get(slug)
+        if old is None:
+            if given.get("name") is None or given.get("price") is None:
+                entry.update(status="error", error="Новий товар: потрібні name і price")
+                continue
+            new = {"slug": slug, "description": "", "supplier": None, "category": None, **given}
+            if "category" not in given:
+                new["category"] = default_rules().categorize(new["name"])
+            inserts.append(new)
+            entry["status"] = "created"
+            continue
+        changes = tuple(f for f in FIELDS if f in given and given[f] != getattr(old, f)
+                        and not (given[f] is None and f in ("name", "price")))
+        if not changes:
+            entry["status"] = "unchanged"
+            continue
+        updates[changes].append((old.id, *(given[f] for f in changes)))
+        entry.update(status="updated", changes={f: [getattr(old, f), given[f]] for f in changes})
+
+    if not dry_run:
+        for chunk in _chunks(inserts):
+            await db.execute(insert(Product), chunk)
+        for fields, group in updates.items():
+            for chunk in _chunks(group):
+                await db.execute(_update(fields, chunk))
+        await db.commit()
+
+    summary = dict.fromkeys(("created", "updated", "unchanged", "error"), 0)
+    for entry in report:
+        summary[entry["status"]] += 1
+    return {"dry_run": dry_run, "summary": summary, "rows": report}
+
+
+async def import_images(db: AsyncSession, fileobj, pool: WorkerPool) -> dict:
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile:
+        raise HTTPException(400, "Потрібен zip-архів")
+    with archive:
+        return await _import_images(db, archive, pool)
+
+
+async def _import_images(db: AsyncSession, archive: zipfile.ZipFile, pool: WorkerPool) -> dict:
+    report, members, total = [], {}, 0
+    for info in archive.infolist():
+        base = os.path.basename(info.filename)
+        if info.is_dir() or not base or base.startswith(".") or info.filename.startswith("__MACOSX/"):
+            continue
+        slug, ext = os.path.splitext(base)
+        entry = {"file": info.filename, "slug": slug}
+        report.append(entry)
+        if ext.lower() not in FORMATS:
+            entry.update(status="error", error="Підтримуються лише jpg/png/webp")
+        elif slug in members:
+            entry.update(status="error", error=f"Для цього slug уже є {members[slug][1].filename}")
+        else:
+            members[slug] = (entry, info)
+            total += info.file_size
+    if total > settings.BULK_IMAGES_MAX_MB * 2**20:
+        raise HTTPException(413, f"Розпакований архів більший за {settings.BULK_IMAGES_MAX_MB} МБ")
+
+    products = {}
+    for slugs in _chunks(list(members)):
+        products.update((p.slug, p) for p in await db.scalars(select(Product).where(Product.slug.in_(slugs))))
+
+    # a few files at a time: leaves room in the pool for single uploads
+    slots = asyncio.Semaphore(pool.workers)
+    results = {}
+
+    async def process(info: zipfile.ZipInfo) -> dict:
+        async with slots:
+            data = await anyio.to_thread.run_sync(archive.read, info)
+            return await pool.run(process_image, data, os.path.splitext(info.filename)[1].lower(), settings.MEDIA_DIR)
+
+    async def one(slug: str, entry: dict, info: zipfile.ZipInfo):
+        if slug not in products:
+            entry.update(status="error", error="Товар не знайдено")
+            return
+        try:
+            results[slug] = await process(info)
+        except (zipfile.BadZipFile, zlib.error, NotImplementedError, RuntimeError, *BAD_IMAGE):
+            # corrupt / encrypted member, unreadable or truncated image: this file only
+            entry.update(status="error", error="Не вдалося прочитати зображення")
+        except HTTPException as e:  # pool overloaded
+            entry.update(status="error", error=e.detail)
+
+    await asyncio.gather(*(one(slug, entry, info) for slug, (entry, info) in members.items()))
+
+    if results:
+        async with amedia_lock():
+            old, new = set(), set()
+            for slug, result in results.items():
+                files = media_files(result["original"], result["variants"])
+                if missing(files):  # same picture, removed with another product meanwhile
+                    result = await process(members[slug][1])
+                    files = media_files(result["original"], result["variants"])
+                p = products[slug]
+                old |= media_files(p.image_path, p.image_variants)
+                p.image_path = result["original"]
+                p.image_variants = result["variants"]
+                new |= files
+                members[slug][0]["status"] = "updated"
+            await db.flush()
+            old = await aunused(db, old - new)
+            await db.commit()
+            remove_media(old)
+
+    summary = {"updated": len(results), "error": sum(e.get("status") == "error" for e in report)}
+    return {"summary": summary, "files": report}
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy.exc import DBAPIError
+
+from .config import settings
+from .db import version_watermark
+from .metrics import cache_requests
+
+log = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """In-process LRU + TTL store. Each uvicorn worker keeps its own copy."""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return None
+            expires, value = hit
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    # never blocks on I/O, so the async API is the sync one
+    async def aget(self, key: str) -> Any:
+        return self.get(key)
+
+    async def aset(self, key: str, value: Any, ttl: int) -> None:
+        self.set(key, value, ttl)
+
+
+class RedisBackend:
+    """Out-of-process store shared by all workers.
+
+    TTL is applied per key; LRU eviction is left to the Redis server
+    (``maxmemory-policy allkeys-lru``). Redis errors degrade to cache misses.
+    """
+
+    def __init__(self, url: str, prefix: str = "zg:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_URL=redis://... потребує пакет `redis`") from e
+        from redis import asyncio as aioredis
+        self._redis = redis
+        self._client = redis.Redis.from_url(url)
+        self._aclient = aioredis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Any:
+        try:
+            raw = self._client.get(self.prefix + key)
+        except self._redis.RedisError:
+            log.warning("cache get failed", exc_info=True)
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        try:
+            self._client.set(self.prefix + key, json.dumps(value, ensure_ascii=False), ex=ttl)
+        except self._redis.RedisError:
+            log.warning("cache set failed", exc_info=True)
+
+    async def aget(self, key: str) -> Any:
+        try:
+            raw = await self._aclient.get(self.prefix + key)
+        except self._redis.RedisError:
+            log.warning("cache get failed", exc_info=True)
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    async def aset(self, key: str, value: Any, ttl: int) -> None:
+        try:
+            await self._aclient.set(self.prefix + key, json.dumps(value, ensure_ascii=False), ex=ttl)
+        except self._redis.RedisError:
+            log.warning("cache set failed", exc_info=True)
+
+
+def make_backend(url: str, max_entries: int):
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    if url in ("", "memory://"):
+        return MemoryBackend(max_entries)
+    raise ValueError(f"Unsupported CACHE_URL: {url}")
+
+
+def normalize_params(params: dict) -> dict:
+    out = {}
+    for k, v in sorted(params.items()):
+        if v is None or v == "":
+            continue
+        if isinstance(v, str):
+            v = " ".join(v.split())
+        out[k] = v
+    return out
+
+
+class CatalogCache:
+    """Response cache for catalog reads, keyed by the catalog version.
+
+    The version is the products.version watermark (db.version_watermark): it
+    moves with every insert, update and delete of products once the transaction
+    has committed, whichever process made it (admin API, seed, categories,
+    image backfill, plain SQL). Entries written under an older version are
+    never read again and age out via LRU/TTL. The version also feeds HTTP ETags.
+    Each worker asks the database at most every CATALOG_VERSION_CHECK_SECONDS;
+    ``bump()`` after a change made by this worker makes its next read ask at once;
+    other workers and CLI processes need nothing but the committed rows.
+    0 means the database could not be asked (nothing is cached then).
+    """
+
+    def __init__(self, backend, ttl: int, check_seconds: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.check_seconds = check_seconds
+        self._version, self._lsn = 0, None
+        self._checked = self._bumped = self._forced = float("-inf")
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _fresh(self, now: float) -> bool:
+        return now - self._checked < self.check_seconds
+
+    async def awatermark(self, seen: int = 0) -> tuple[int, str | None]:
+        """Catalog version and the primary's WAL position after reading it (read catalog
+        data only where that is replayed, see replicas.get_catalog_db).
+
+        `seen`: a version a client already got, e.g. from another worker. A newer one
+        than ours forces a re-read, but only once per check interval: clients pick it.
+        """
+        now = time.monotonic()
+        if self._fresh(now):
+            if seen <= self._version or now - self._forced < self.check_seconds:
+                return self._version, self._lsn
+            self._forced = now
+        try:
+            version, lsn = await version_watermark()
+        except (DBAPIError, OSError):
+            log.warning("catalog version read failed", exc_info=True)
+            return 0, None
+        # a read that started before the last bump() may predate the change
+        if now > self._checked and now >= self._bumped:
+            self._version, self._lsn, self._checked = version, lsn, now
+        return version, lsn
+
+    def bump(self) -> None:
+        self._checked, self._bumped = float("-inf"), time.monotonic()
+
+    @staticmethod
+    def _key(version: int, name: str, params: dict) -> str:
+        raw = json.dumps(normalize_params(params), ensure_ascii=False, sort_keys=True, default=str)
+        digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+        return f"catalog:{version}:{name}:{digest}"
+
+    async def aget_or_set(self, name: str, params: dict, loader: Callable[[], Awaitable[Any]],
+                          version: int) -> Any:
+        if not self.enabled or not version:
+            return await loader()
+        key = self._key(version, name, params)
+        hit = await self.backend.aget(key)
+        cache_requests.inc(cache="catalog", result="miss" if hit is None else "hit")
+        if hit is not None:
+            return hit
+        value = await loader()
+        if value is not None:
+            await self.backend.aset(key, value, self.ttl)
+        return value
+
+
+catalog_cache = CatalogCache(
+    make_backend(settings.CACHE_URL, settings.CACHE_MAX_ENTRIES),
+    settings.CACHE_TTL_SECONDS,
+    settings.CATALOG_VERSION_CHECK_SECONDS,
+)
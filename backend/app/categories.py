@@ -0,0 +1,171 @@
+"""Category inference from rules kept as data.
+
+Rules (app/category_rules.json, or CATEGORY_RULES_FILE) are tried in file
+order: the first rule with a keyword inside the lower-cased product name, or a
+matching regex, wins; no match means "default". The keywords of all rules are
+compiled into one Aho-Corasick automaton, so a name is read once whatever the
+number of rules; regexes run only when they could still beat the keyword match.
+
+`python -m app.categories [--dry-run]` re-applies the rules to the whole
+products table: (id, name, category) through a server-side cursor, changed rows
+written back with one UPDATE ... FROM (VALUES ...) per batch.
+"""
+import argparse
+import csv
+import json
+import re
+import time
+from collections import Counter, deque
+from functools import lru_cache
+from pathlib import Path
+
+from sqlalchemy import select, update, values, column, Integer, String
+
+from .config import settings
+from .db import engine
+from .models import Product
+
+RULES_FILE = Path(__file__).with_name("category_rules.json")
+
+
+class Automaton:
+    """Aho-Corasick over keywords -> value; `best(text)` is the smallest value found in `text`, else `none`."""
+
+    def __init__(self, keywords: dict[str, int], none: int):
+        self.none = none
+        goto: list[dict[str, int]] = [{}]
+        out = [none]
+        for word, value in keywords.items():
+            s = 0
+            for ch in word:
+                if ch not in goto[s]:
+                    goto[s][ch] = len(goto)
+                    goto.append({})
+                    out.append(none)
+                s = goto[s][ch]
+            out[s] = min(out[s], value)
+        # breadth first: fail links folded into full transition tables (one dict lookup per
+        # character), outputs inherited along the fail links
+        fail = [0] * len(goto)
+        self.delta = [dict(goto[0])] + [None] * (len(goto) - 1)
+        queue = deque(goto[0].values())
+        while queue:
+            s = queue.popleft()
+            f = fail[s]
+            out[s] = min(out[s], out[f])
+            self.delta[s] = {**self.delta[f], **goto[s]}
+            for ch, t in goto[s].items():
+                fail[t] = self.delta[f].get(ch, 0)
+                queue.append(t)
+        self.out = out
+
+    def best(self, text: str) -> int:
+        delta, out = self.delta, self.out
+        s, found = 0, self.none
+        for ch in text:
+            s = delta[s].get(ch, 0)
+            if out[s] < found:
+                found = out[s]
+                if not found:
+                    break
+        return found
+
+
+class CategoryRules:
+    def __init__(self, rules: list[dict], default: str | None = None):
+        self.categories = [r["category"] for r in rules]
+        self.default = default
+        keywords: dict[str, int] = {}
+        for i, rule in enumerate(rules):
+            for word in rule.get("keywords", []):
+                keywords.setdefault(word.lower(), i)  # a keyword listed twice belongs to the earlier rule
+        self.automaton = Automaton(keywords, len(rules))
+        self.patterns = [(i, re.compile(p, re.IGNORECASE)) for i, rule in enumerate(rules) for p in rule.get("regex", [])]
+
+    @classmethod
+    def load(cls, path: str | Path | None = None) -> "CategoryRules":
+        data = json.loads(Path(path or settings.CATEGORY_RULES_FILE or RULES_FILE).read_text(encoding="utf-8"))
+        return cls(data["rules"], data.get("default"))
+
+    def match(self, name: str) -> str | None:
+        best = self.automaton.best(name.lower())
+        for i, pattern in self.patterns:
+            if i >= best:
+                break
+            if pattern.search(name):
+                best = i
+                break
+        return self.categories[best] if best < len(self.categories) else None
+
+    def categorize(self, name: str) -> str | None:
+        return self.match(name) or self.default
+
+
+@lru_cache(maxsize=1)
+def default_rules() -> CategoryRules:
+    return CategoryRules.load()
+
+
+def _update(batch: list[tuple]):
+    v = values(column("id", Integer), column("version", Integer), column("category", String), name="v").data(batch)
+    # rows edited after they were read keep their state; the next run picks them up
+    return update(Product).where(Product.id == v.c.id, Product.version == v.c.version).values(category=v.c.category)
+
+
+def recategorize(rules: CategoryRules, dry_run: bool = False, reset_unmatched: bool = False,
+                 batch_size: int = 5000, show: int = 20, diff_path: str | None = None) -> None:
+    """Products the rules don't match keep their category unless it is empty (or `reset_unmatched`)."""
+    started = time.perf_counter()
+    transitions: Counter = Counter()
+    scanned = changed = written = 0
+    diff_file = open(diff_path, "w", newline="", encoding="utf-8") if diff_path else None
+    diff = csv.writer(diff_file) if diff_file else None
+    if diff:
+        diff.writerow(["id", "name", "old_category", "new_category"])
+    try:
+        with engine.connect() as read, engine.connect() as write:
+            rows = read.execution_options(yield_per=batch_size).execute(
+                select(Product.id, Product.version, Product.name, Product.category).order_by(Product.id))
+            for part in rows.partitions():
+                batch = []
+                for id_, version, name, old in part:
+                    new = rules.match(name)
+                    if new is None:
+                        new = rules.default if reset_unmatched or not old else old
+                    if new != old:
+                        batch.append((id_, version, new))
+                        transitions[(old, new)] += 1
+                        if changed < show:
+                            print(f"  {id_:>8}  {name[:60]}: {old} -> {new}")
+                        if diff:
+                            diff.writerow([id_, name, old, new])
+                        changed += 1
+                scanned += len(part)
+                if batch and not dry_run:
+                    with write.begin():
+                        written += write.execute(_update(batch)).rowcount
+    finally:
+        if diff_file:
+            diff_file.close()
+    for (old, new), n in transitions.most_common():
+        print(f"  {old} -> {new}: {n}")
+    elapsed = time.perf_counter() - started
+    if dry_run:
+        print(f"Would change {changed} of {scanned} products ({elapsed:.1f}s)")
+    else:
+        skipped = f", {changed - written} skipped (edited meanwhile)" if changed > written else ""
+        print(f"Changed {written} of {scanned} products{skipped} ({elapsed:.1f}s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-apply category rules to all products")
+    parser.add_argument("--rules", help="Rules JSON (default: CATEGORY_RULES_FILE or app/category_rules.json)")
+    parser.add_argument("--dry-run", action="store_true", help="Print the changes without writing them")
+    parser.add_argument("--reset-unmatched", action="store_true",
+                        help="Give products no rule matches the default category instead of keeping theirs")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per read batch / UPDATE")
+    parser.add_argument("--show", type=int, default=20, help="Changed products to print")
+    parser.add_argument("--diff", help="Write every change to this CSV file")
+    args = parser.parse_args()
+    recategorize(CategoryRules.load(args.rules), dry_run=args.dry_run, reset_unmatched=args.reset_unmatched,
+                 batch_size=args.batch_size, show=args.show, diff_path=args.diff)
@@ -2,9 +2,86 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    ASYNC_DATABASE_URL: str = ""  # default: DATABASE_URL with the asyncpg driver
+    # per engine (sync and async) and per worker process
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+
+    # optional read replicas for catalog / order-history reads, comma-separated URLs
+    DATABASE_REPLICA_URLS: str = ""
+    DB_REPLICA_POOL_SIZE: int = 5
+    DB_REPLICA_MAX_OVERFLOW: int = 10
+    REPLICA_CHECK_SECONDS: float = 5
+    REPLICA_MAX_LAG_SECONDS: float = 5
+    # reads stay on the primary this long after the caller's (or any catalog) write;
+    # keep it above REPLICA_MAX_LAG_SECONDS
+    READ_YOUR_WRITES_SECONDS: int = 10
     JWT_SECRET: str
     JWT_ALG: str = "HS256"
     ACCESS_TOKEN_MINUTES: int = 60 * 24 * 7
     MEDIA_DIR: str = "media"
 
+    # bcrypt process pool: 0 workers = one per CPU; further requests get 503 once this many are pending
+    PASSWORD_HASH_WORKERS: int = 0
+    PASSWORD_HASH_MAX_PENDING: int = 32
+
+    # image variant generation pool (0 workers = one per CPU)
+    IMAGE_WORKERS: int = 2
+    IMAGE_MAX_PENDING: int = 8
+
+    # admin bulk import: rows per CSV/NDJSON upload, unpacked size of an images zip
+    BULK_MAX_ROWS: int = 100_000
+    BULK_IMAGES_MAX_MB: int = 500
+
+    # authenticated user cache (per worker), dropped on users changes via LISTEN/NOTIFY
+    AUTH_CACHE_TTL_SECONDS: int = 60
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    AUTH_LISTEN_CHECK_SECONDS: int = 5  # listener heartbeat; the cache is bypassed while it is down
+
+    # catalog response cache: memory:// (per worker) or redis://host:6379/0 (shared)
+    CACHE_URL: str = "memory://"
+    CACHE_TTL_SECONDS: int = 300  # 0 disables the cache
+    CACHE_MAX_ENTRIES: int = 2048
+    CATALOG_VERSION_CHECK_SECONDS: float = 1.0  # how stale a worker's catalog version (and ETags) may be
+
+    # per-worker cache of encoded product JSON, keyed by id + products.version
+    PRODUCT_JSON_CACHE_ENTRIES: int = 20000
+    PRODUCT_JSON_CACHE_TTL_SECONDS: int = 3600
+
+    # in-process columnar catalog for /api/products without `q` (needs numpy, per worker)
+    CATALOG_SNAPSHOT: bool = False
+    CATALOG_SNAPSHOT_REFRESH_SECONDS: int = 60  # also refreshed on every catalog change
+
+    # /api/products/suggest prefix index (per worker): the most ordered products only;
+    # full rebuild (popularity included) this often, changed products on every catalog change
+    SUGGEST_MAX_PRODUCTS: int = 50000
+    SUGGEST_REBUILD_SECONDS: int = 600
+
+    # Cache-Control per public catalog route (ETags come from the catalog version)
+    HTTP_CACHE_CONTROL: dict[str, str] = {
+        "products": "public, max-age=60, stale-while-revalidate=600",
+        "product": "public, max-age=300, stale-while-revalidate=3600",
+        "filters": "public, max-age=300, stale-while-revalidate=3600",
+        "slugs": "public, max-age=300, stale-while-revalidate=3600",
+        "facets": "public, max-age=60, stale-while-revalidate=600",
+        "export": "no-cache",
+        "suggest": "public, max-age=60, stale-while-revalidate=600",
+        "related": "public, max-age=300, stale-while-revalidate=3600",
+    }
+
+    # category rules JSON for seeding and `python -m app.categories`; empty = app/category_rules.json
+    CATEGORY_RULES_FILE: str = ""
+
+    # price facet bucket edges; run `python -m app.migrate --rebuild-facets` after changing
+    FACET_PRICE_BOUNDS: list[float] = [10, 20, 50, 100, 200, 500, 1000]
+
+    # debug: add X-Query-Count (SQL statements per request) to every response
+    QUERY_COUNT_HEADER: bool = False
+
+    # /api/metrics requires "Authorization: Bearer <token>" when set
+    METRICS_TOKEN: str = ""
+
+    # full-text search config; empty = 'ukrainian' if installed, else 'simple'
+    SEARCH_TS_CONFIG: str = ""
+
 settings = Settings()
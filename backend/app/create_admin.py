@@ -2,26 +2,37 @@ import argparse
 from sqlalchemy import select
 from .db import SessionLocal
 from .models import User
-from .auth import hash_password
+from .auth import hash_password, revoke_tokens
 
 
 def main():
-    p = argparse.ArgumentParser(description="Create or promote admin user")
+    p = argparse.ArgumentParser(description="Create, promote or demote admin user")
     p.add_argument("--email", required=True)
-    p.add_argument("--nickname", required=True)
-    p.add_argument("--password", required=True)
+    p.add_argument("--nickname")
+    p.add_argument("--password")
+    p.add_argument("--demote", action="store_true", help="Remove admin rights and revoke the user's tokens")
     args = p.parse_args()
 
     db = SessionLocal()
     u = db.scalar(select(User).where(User.email == args.email))
-    if u:
+    if args.demote:
+        if not u:
+            p.error("user not found")
+        u.is_admin = False
+        revoke_tokens(u)
+        db.commit()
+        print("Demoted admin, existing tokens revoked ✅")
+    elif u:
         u.is_admin = True
         if args.password:
             u.password_hash = hash_password(args.password)
-        u.nickname = args.nickname
+        if args.nickname:
+            u.nickname = args.nickname
         db.commit()
         print("Updated existing user to admin ✅")
     else:
+        if not args.nickname or not args.password:
+            p.error("--nickname and --password are required for a new admin")
         u = User(
             email=args.email,
             nickname=args.nickname,
@@ -1,10 +1,45 @@
-from sqlalchemy import create_engine
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from .config import settings
+from .metrics import db_pool_wait
+
+class _WaitTimed:
+    # pool mixin: how long checkouts wait for a free connection (zg_db_pool_wait_seconds)
+    label = ""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_wait.observe(time.perf_counter() - started, pool=self.label)
+
+class SyncPool(_WaitTimed, QueuePool):
+    label = "sync"
+
+class AsyncPool(_WaitTimed, AsyncAdaptedQueuePool):
+    label = "async"
+
+POOL = dict(pool_size=settings.DB_POOL_SIZE, max_overflow=settings.DB_MAX_OVERFLOW, pool_pre_ping=True)
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+engine = create_engine(settings.DATABASE_URL, poolclass=SyncPool, **POOL)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+def async_url(url: str) -> str:
+    u = make_url(url)
+    return u.set(drivername=f"{u.get_backend_name()}+asyncpg").render_as_string(hide_password=False)
+
+# request path for hot read endpoints; CLI tools (seed, create_admin, migrate) stay on `engine`
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL or async_url(settings.DATABASE_URL), poolclass=AsyncPool, **POOL
+)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 class Base(DeclarativeBase):
     pass
 
@@ -14,3 +49,17 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+WATERMARK_SQL = text("SELECT products_version_watermark(), pg_current_wal_lsn()::text")
+
+async def version_watermark() -> tuple[int, str]:
+    """products.version up to which every change is committed, and the primary's WAL position
+    after reading it (a replica that replayed past it has all those changes). See
+    migrate.commit_safe_versions; read before the snapshot the changes are looked up in."""
+    async with async_engine.connect() as conn:
+        watermark, lsn = (await conn.execute(WATERMARK_SQL)).one()
+    return watermark, lsn
@@ -0,0 +1,117 @@
+import csv
+import io
+import re
+from datetime import datetime
+from typing import AsyncIterator
+
+import orjson
+from sqlalchemy import select, func
+
+from .db import version_watermark
+from .models import Product, Order, OrderItem
+from .payloads import product_json
+from .replicas import read_router
+
+CHUNK_ROWS = 500
+
+
+async def export_stream(since_version: int, updated_after: datetime | None) -> AsyncIterator:
+    """NDJSON ``ProductOut`` lines ordered by id, read from one snapshot.
+
+    The first item is ``(watermark, top_version, product_count)`` (for the
+    headers, before the response starts); the rest are byte chunks. Every
+    version up to the watermark, read before the snapshot, is in the snapshot,
+    so ``since_version=<watermark>`` next time misses nothing; rows above it can
+    come again. The session lives as long as the generator, not the request
+    dependencies.
+    """
+    watermark, lsn = await version_watermark()
+    async with read_router.session("catalog", lsn) as db:
+        await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        top, total = (await db.execute(select(func.coalesce(func.max(Product.version), 0), func.count()))).one()
+        yield watermark, top, total
+
+        stmt = select(Product).where(Product.version > since_version).order_by(Product.id)
+        if updated_after is not None:
+            stmt = stmt.where(Product.updated_at > updated_after)
+        chunk = []
+        async for p in await db.stream_scalars(stmt.execution_options(yield_per=CHUNK_ROWS)):
+            chunk.append(product_json(p))
+            if len(chunk) == CHUNK_ROWS:
+                yield b"\n".join(chunk) + b"\n"
+                chunk = []
+        if chunk:
+            yield b"\n".join(chunk) + b"\n"
+
+
+ORDER_COLUMNS = [Order.id, Order.user_id, Order.status, Order.created_at, Order.payment_method,
+                 Order.delivery_method, Order.full_name, Order.phone, Order.city, Order.address, Order.comment]
+ITEM_COLUMNS = [OrderItem.product_id, OrderItem.name, OrderItem.price, OrderItem.qty]
+CSV_HEADER = ["order_id", *(c.key for c in ORDER_COLUMNS[1:]), "product_id", "item_name", "price", "qty"]
+
+# a leading = @ + - makes spreadsheets evaluate the cell; "+380 ..." and "-5" stay as they are
+_FORMULA = re.compile(r"[=@\t\r]|[+-](?![\d\s()]*$)")
+
+
+async def _order_rows(where: list, scope: str):
+    """(order columns..., item columns...) ordered by order, then item; one snapshot, server-side cursor."""
+    async with read_router.session(scope) as db:
+        await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        stmt = (
+            select(*ORDER_COLUMNS, *ITEM_COLUMNS)
+            .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+            .where(*where)
+            .order_by(Order.id, OrderItem.id)
+            .execution_options(yield_per=CHUNK_ROWS)
+        )
+        async for partition in (await db.stream(stmt)).partitions():
+            yield partition
+
+
+def _cell(v):
+    if isinstance(v, datetime):
+        return v.isoformat()
+    if isinstance(v, str) and _FORMULA.match(v):
+        return "'" + v
+    return v
+
+
+async def orders_csv_stream(where: list, scope: str) -> AsyncIterator[str]:
+    """A row per order item (order columns repeated); BOM so spreadsheets pick UTF-8."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    buf.write("\ufeff")
+    writer.writerow(CSV_HEADER)
+    async for rows in _order_rows(where, scope):
+        writer.writerows([_cell(v) for v in row] for row in rows)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def _order_line(order: tuple, items: list) -> bytes:
+    out = {c.key: v for c, v in zip(ORDER_COLUMNS, order)}
+    out["items"] = [{"product_id": pid, "name": name, "price": float(price), "qty": qty}
+                    for pid, name, price, qty in items]
+    return orjson.dumps(out) + b"\n"
+
+
+async def orders_ndjson_stream(where: list, scope: str) -> AsyncIterator[bytes]:
+    """An order per line with its items nested."""
+    n = len(ORDER_COLUMNS)
+    order, items = None, []
+    async for rows in _order_rows(where, scope):
+        chunk = []
+        for row in rows:
+            if order is None or row[0] != order[0]:
+                if order is not None:
+                    chunk.append(_order_line(order, items))
+                order, items = tuple(row[:n]), []
+            if row[n] is not None:
+                items.append(row[n:])
+        if chunk:
+            yield b"".join(chunk)
+    if order is not None:
+        yield _order_line(order, items)
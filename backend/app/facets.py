@@ -0,0 +1,83 @@
+from collections import Counter
+
+from sqlalchemy import select, func, and_, true, text
+
+from .config import settings
+from .models import Product, ProductFacetCount
+
+# a cell is [category, supplier, price_bucket, n, in_price_range]; bucket i is
+# width_bucket(price, FACET_PRICE_BOUNDS): 0 below the first edge, len(bounds) above the last
+BOUNDS = [float(b) for b in settings.FACET_PRICE_BOUNDS]
+
+
+def price_buckets() -> list[tuple[float | None, float | None]]:
+    edges = [None, *BOUNDS, None]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def _upper(max_price: float) -> float:
+    # prices have 2 decimals: price <= max  <=>  price < max + 0.01
+    return round(max_price + 0.01, 2)
+
+
+def aligned(min_price: float | None, max_price: float | None) -> bool:
+    """Can the price filter be answered from whole buckets?"""
+    return ((min_price is None or min_price <= 0 or min_price in BOUNDS)
+            and (max_price is None or _upper(max_price) in BOUNDS))
+
+
+def _bucket_in_range(bucket: int, min_price: float | None, max_price: float | None) -> bool:
+    lo, hi = price_buckets()[bucket]
+    if min_price is not None and min_price > 0 and (lo is None or lo < min_price):
+        return False
+    if max_price is not None and (hi is None or hi > _upper(max_price)):
+        return False
+    return True
+
+
+def cube_query():
+    F = ProductFacetCount
+    return select(F.category, F.supplier, F.price_bucket, F.n).where(F.n > 0)
+
+
+def cube_cells(cube: list, min_price: float | None, max_price: float | None) -> list:
+    return [[c, s, b, n, _bucket_in_range(b, min_price, max_price)] for c, s, b, n in cube]
+
+
+def matching_query(where, min_price: float | None, max_price: float | None):
+    """Cells for products matching `where` (a search), grouped like the cube.
+
+    The price filter becomes a column instead of a WHERE, so the price facet
+    can still count outside the selected range.
+    """
+    bounds = [Product.price >= min_price] if min_price is not None else []
+    bounds += [Product.price <= max_price] if max_price is not None else []
+    stmt = select(
+        func.coalesce(Product.category, ""), func.coalesce(Product.supplier, ""),
+        func.products_price_bucket(Product.price), func.count(), and_(true(), *bounds),
+    ).group_by(text("1, 2, 3, 5"))
+    return stmt.where(where) if where is not None else stmt
+
+
+def count_facets(cells, category: str | None, supplier: str | None) -> dict:
+    """Counts per facet value; each facet ignores its own selection (so
+    alternatives stay visible) but applies all the others."""
+    categories, suppliers, prices = Counter(), Counter(), Counter()
+    total = 0
+    for c, s, b, n, in_range in cells:
+        cat_ok = not category or c == category
+        sup_ok = not supplier or s == supplier
+        if sup_ok and in_range:
+            categories[c] += n
+        if cat_ok and in_range:
+            suppliers[s] += n
+        if cat_ok and sup_ok:
+            prices[b] += n
+            if in_range:
+                total += n
+    return {
+        "total": total,
+        "categories": [{"value": v, "count": n} for v, n in sorted(categories.items()) if v],
+        "suppliers": [{"value": v, "count": n} for v, n in sorted(suppliers.items()) if v],
+        "price": [{"min": lo, "max": hi, "count": prices.get(i, 0)} for i, (lo, hi) in enumerate(price_buckets())],
+    }
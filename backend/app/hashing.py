@@ -0,0 +1,29 @@
+from passlib.context import CryptContext
+
+from .config import settings
+from .workers import WorkerPool
+
+# keep this module's imports light: spawned pool workers import it
+pwd = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def _hash(p: str) -> str:
+    return pwd.hash(p)
+
+
+def _verify_and_update(p: str, h: str) -> tuple[bool, str | None]:
+    # new hash is returned when `pwd` settings changed since `h` was created
+    return pwd.verify_and_update(p, h)
+
+
+class PasswordHasher(WorkerPool):
+    """bcrypt in its own pool, so a login storm gets 503s instead of stalling the worker."""
+
+    async def hash(self, p: str) -> str:
+        return await self.run(_hash, p)
+
+    async def verify_and_update(self, p: str, h: str) -> tuple[bool, str | None]:
+        return await self.run(_verify_and_update, p, h)
+
+
+hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING, "password")
@@ -0,0 +1,61 @@
+import hashlib
+import json
+
+from fastapi import Depends, Request, Response
+
+from .cache import normalize_params, catalog_cache
+from .config import settings
+
+
+def make_etag(version: int, name: str, params: dict) -> str | None:
+    """Validator for a catalog response: changes whenever the catalog version does.
+
+    The version is the database's committed products.version watermark, so
+    every worker builds the same tag and changes made outside the API
+    invalidate it too.
+    """
+    if not version:
+        return None
+    raw = json.dumps(normalize_params(params), ensure_ascii=False, sort_keys=True, default=str)
+    digest = hashlib.sha1(f"{name}:{raw}".encode("utf-8")).hexdigest()[:16]
+    return f'"{version:x}-{digest}"'
+
+
+def _tag_versions(header: str):
+    for tag in header.split(","):
+        head = tag.strip().removeprefix("W/").strip('"').split("-")[0]
+        try:
+            yield int(head, 16)
+        except ValueError:
+            pass
+
+
+async def catalog_watermark(request: Request) -> tuple[int, str | None]:
+    """Catalog version and WAL position for this request (a dependency, so the ETag and the
+    catalog session share one reading); a client's newer If-None-Match asks for a re-read."""
+    seen = max(_tag_versions(request.headers.get("if-none-match", "")), default=0)
+    return await catalog_cache.awatermark(seen)
+
+
+async def catalog_version(watermark: tuple[int, str | None] = Depends(catalog_watermark)) -> int:
+    return watermark[0]
+
+
+def cache_headers(route: str, etag: str | None) -> dict:
+    headers = {}
+    if cc := settings.HTTP_CACHE_CONTROL.get(route):
+        headers["Cache-Control"] = cc
+    if etag:
+        headers["ETag"] = etag
+    return headers
+
+
+def not_modified(request: Request, route: str, etag: str | None) -> Response | None:
+    """304 response if the client's If-None-Match already has `etag`."""
+    header = request.headers.get("if-none-match")
+    if not header or not etag:
+        return None
+    tags = {t.strip().removeprefix("W/") for t in header.split(",")}
+    if "*" in tags or etag in tags:
+        return Response(status_code=304, headers=cache_headers(route, etag))
+    return None
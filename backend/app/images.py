@@ -0,0 +1,165 @@
+import argparse
+import hashlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .config import settings
+from .workers import WorkerPool
+
+# width variants, largest last; files go to MEDIA_DIR/i/<content hash>-<variant>.<ext>
+VARIANTS = {"thumb": 160, "card": 480, "full": 1280}
+SUBDIR = "i"
+FORMATS = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG", ".webp": "WEBP"}
+
+
+class BadImage(ValueError):
+    """The upload is not a readable image (a 400; failing to write the files is not)."""
+
+
+BAD_IMAGE = (BadImage,)
+
+
+def _decode(data: bytes) -> Image.Image:
+    try:
+        with Image.open(io.BytesIO(data)) as src:
+            im = ImageOps.exif_transpose(src)
+            im.load()
+    # truncated or corrupt data surfaces as OSError / ValueError from Image.open / load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, ValueError) as e:
+        raise BadImage(str(e)) from None
+    return im
+
+
+def _save(im: Image.Image, media_dir: str, name: str, fmt: str) -> None:
+    path = os.path.join(media_dir, name)
+    if os.path.exists(path):  # same hash, same bytes
+        return
+    if fmt == "JPEG" and im.mode != "RGB":
+        im = im.convert("RGB")
+    elif fmt == "WEBP" and im.mode not in ("RGB", "RGBA"):
+        im = im.convert("RGBA")
+    opts = {"JPEG": {"quality": 85, "optimize": True, "progressive": True},
+            "PNG": {"optimize": True},
+            "WEBP": {"quality": 80, "method": 4}}[fmt]
+    tmp = f"{path}.{os.getpid()}.tmp"
+    im.save(tmp, fmt, **opts)
+    os.replace(tmp, path)
+
+
+def process_image(data: bytes, ext: str, media_dir: str) -> dict:
+    """Write the original plus WebP and same-format width variants; return their names.
+
+    Runs in a worker process. Raises BadImage for unreadable input.
+    """
+    ext = ".jpg" if ext == ".jpeg" else ext
+    digest = hashlib.sha256(data).hexdigest()[:24]
+    os.makedirs(os.path.join(media_dir, SUBDIR), exist_ok=True)
+    im = _decode(data)
+    original = f"{SUBDIR}/{digest}{ext}"
+    if not os.path.exists(os.path.join(media_dir, original)):
+        with open(os.path.join(media_dir, original), "wb") as f:
+            f.write(data)
+    variants = {}
+    for name, width in VARIANTS.items():
+        w = min(width, im.width)  # never upscale
+        resized = im if w == im.width else im.resize((w, max(1, round(im.height * w / im.width))), Image.LANCZOS)
+        webp = f"{SUBDIR}/{digest}-{name}.webp"
+        same = f"{SUBDIR}/{digest}-{name}{ext}"
+        _save(resized, media_dir, webp, "WEBP")
+        _save(resized, media_dir, same, FORMATS[ext])
+        variants[name] = {"w": w, "webp": webp, "src": same}
+    return {"original": original, "variants": variants}
+
+
+def process_file(path: str, media_dir: str) -> dict:
+    with open(path, "rb") as f:
+        data = f.read()
+    return process_image(data, os.path.splitext(path)[1].lower(), media_dir)
+
+
+def media_files(image_path: str | None, variants: dict | None) -> set[str]:
+    files = {image_path} if image_path else set()
+    for v in (variants or {}).values():
+        files.update((v["webp"], v["src"]))
+    return files
+
+
+def remove_media(names) -> None:
+    for name in names:
+        try:
+            os.remove(os.path.join(settings.MEDIA_DIR, name))
+        except FileNotFoundError:
+            pass
+
+
+def srcset(variants: dict | None) -> str | None:
+    if not variants:
+        return None
+    by_width = {}
+    for v in variants.values():  # small originals give several variants of one width
+        by_width.setdefault(v["w"], f"/media/{v['webp']} {v['w']}w")
+    return ", ".join(by_width.values())
+
+
+image_pool = WorkerPool(settings.IMAGE_WORKERS, settings.IMAGE_MAX_PENDING, "image")
+
+
+def backfill(batch_size: int = 50):
+    # imported here so pool workers, which import this module, stay light
+    from sqlalchemy import select
+    from .db import SessionLocal
+    from .models import Product
+    from .media import media_lock, unused, missing
+
+    done = failed = 0
+    with SessionLocal() as db, ProcessPoolExecutor(max_workers=image_pool.workers) as pool:
+        while True:
+            products = db.scalars(
+                select(Product)
+                .where(Product.image_path.is_not(None), Product.image_variants.is_(None))
+                .order_by(Product.id).limit(batch_size)
+            ).all()
+            if not products:
+                break
+            paths = [os.path.join(settings.MEDIA_DIR, p.image_path) for p in products]
+            jobs = [pool.submit(process_file, path, settings.MEDIA_DIR) for path in paths]
+            results = {}
+            for p, path, job in zip(products, paths, jobs):
+                try:
+                    results[p.id] = job.result()
+                except (FileNotFoundError, *BAD_IMAGE) as e:
+                    print(f"  product {p.id}: {p.image_path}: {e}")
+                    p.image_variants = {}  # marks it as processed
+                    failed += 1
+            # the pre-pipeline files go once nothing refers to them any more
+            with media_lock():
+                old = set()
+                for p, path in zip(products, paths):
+                    if (result := results.get(p.id)) is None:
+                        continue
+                    if missing(media_files(result["original"], result["variants"])):
+                        result = process_file(path, settings.MEDIA_DIR)  # removed with another product meanwhile
+                    old.add(p.image_path)
+                    p.image_path = result["original"]
+                    p.image_variants = result["variants"]
+                    done += 1
+                db.flush()
+                old = unused(db, old)
+                db.commit()
+                remove_media(old)
+            print(f"  {done} processed, {failed} failed")
+    print(f"Backfill complete: {done} processed, {failed} failed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Product image variants")
+    parser.add_argument("--backfill", action="store_true", help="Generate variants for products uploaded before the pipeline")
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+    if args.backfill:
+        backfill(args.batch_size)
+    else:
+        parser.print_help()
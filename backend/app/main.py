@@ -1,30 +1,68 @@
+import asyncio
+import hmac
 import os
-import shutil
-from typing import Optional
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Literal, Optional
 
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Query
+import anyio.to_thread
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Query, Header, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session
-from sqlalchemy import select, or_
-
-from .db import Base, engine, get_db
-from .models import User, Product, Favorite, CartItem, Order, OrderItem
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, update, delete, values, column, literal, text, Integer, or_, null
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from .db import engine, async_engine, get_db, get_async_db
+from .models import User, Product, Favorite, CartItem, Order, OrderItem, IdempotencyKey
 from .schemas import (
     RegisterIn, LoginIn, TokenOut,
     ProductOut, ProductCreate,
-    CartItemOut, OrderOut, CheckoutIn,
+    CartItemOut, CartBatchIn, FavoritesBatchIn, OrderOut, CheckoutIn,
 )
 from .auth import (
-    hash_password, verify_password,
     create_token, get_current_user,
-    require_admin,
+    get_current_user_async, require_admin, require_admin_async, Principal, watch_users,
 )
 from .config import settings
-
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title="Zelena Gryadka API", version="1.1")
+from .cache import catalog_cache
+from .search import search_clause, features as search_features
+from . import facets
+from .pagination import order_by_clauses, keyset_after, encode_cursor, decode_cursor
+from .querycount import count_queries
+from .replicas import read_router, get_catalog_db, get_user_read_db
+from . import metrics
+from .hashing import hasher
+from .http_cache import make_etag, cache_headers, not_modified, catalog_version
+from .images import image_pool, process_image, media_files, remove_media, BAD_IMAGE
+from .media import media_lock, amedia_lock, unused, aunused, missing
+from .payloads import product_to_out, product_json, json_list, RawJSONResponse
+from .export import export_stream, orders_csv_stream, orders_ndjson_stream
+from .migrate import check_version
+from .snapshot import catalog_snapshot
+from .suggest import suggestions, MAX_LIMIT as SUGGEST_MAX_LIMIT
+from .related import related
+from . import bulk
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await check_version()
+    monitor = asyncio.create_task(read_router.monitor()) if read_router.replicas else None
+    users = asyncio.create_task(watch_users())
+    yield
+    users.cancel()
+    if monitor:
+        monitor.cancel()
+    await read_router.dispose()
+    hasher.shutdown()
+    image_pool.shutdown()
+
+
+app = FastAPI(title="Zelena Gryadka API", version="1.1", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -32,80 +70,175 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Idempotent-Replayed", "X-Catalog-Version"],
 )
 
+@app.middleware("http")
+async def request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    metrics.http_in_flight.inc()
+    try:
+        with count_queries() as stats:
+            response = await call_next(request)
+        status = response.status_code
+    finally:
+        metrics.http_in_flight.dec()
+        route = getattr(request.scope.get("route"), "path", None)
+        if route is None:  # keep label values bounded
+            route = "/media" if request.url.path.startswith("/media/") else "<unmatched>"
+        metrics.http_requests.inc(method=request.method, route=route, status=status)
+        metrics.http_duration.observe(time.perf_counter() - started, method=request.method, route=route)
+        metrics.http_db_queries.observe(stats.count, route=route)
+        metrics.http_db_seconds.observe(stats.seconds, route=route)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and status < 400:
+        user_id = getattr(request.state, "user_id", None)
+        if user_id is not None:
+            read_router.mark_write(f"user:{user_id}")
+    if settings.QUERY_COUNT_HEADER:
+        response.headers["X-Query-Count"] = str(stats.count)
+    return response
+
 os.makedirs(settings.MEDIA_DIR, exist_ok=True)
 app.mount("/media", StaticFiles(directory=settings.MEDIA_DIR), name="media")
 
 
-def product_to_out(p: Product) -> ProductOut:
-    return ProductOut(
-        id=p.id,
-        name=p.name,
-        slug=p.slug,
-        description=p.description or "",
-        supplier=p.supplier,
-        category=getattr(p,'category',None),
-        price=float(p.price),
-        image_url=f"/media/{p.image_path}" if p.image_path else None,
+def order_to_out(o: Order) -> OrderOut:
+    return OrderOut(
+        id=o.id,
+        status=o.status,
+        payment_method=o.payment_method,
+        delivery_method=o.delivery_method,
+        full_name=o.full_name,
+        phone=o.phone,
+        city=o.city,
+        address=o.address,
+        comment=o.comment,
+        created_at=o.created_at,
+        items=[{"name": i.name, "price": float(i.price), "qty": i.qty} for i in o.items],
     )
 
 
+def pool_stats() -> dict:
+    pools = [("sync", engine.pool, settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW),
+             ("async", async_engine.pool, settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW)]
+    pools += [(r.label, r.engine.pool, settings.DB_REPLICA_POOL_SIZE + settings.DB_REPLICA_MAX_OVERFLOW)
+              for r in read_router.replicas]
+    out = {}
+    for label, pool, limit in pools:
+        checked_out = pool.checkedout()
+        out[label] = {
+            "size": pool.size(),
+            "checked_out": checked_out,
+            "overflow": pool.overflow(),
+            "headroom": limit - checked_out,
+        }
+    return out
+
+
 @app.get("/api/health")
-def health():
-    return {"ok": True}
+async def health(response: Response, deep: bool = False):
+    if not deep:
+        return {"ok": True}
+    # deep: DB answers within 2s and both pools have a free connection
+    started = time.perf_counter()
+    try:
+        async with asyncio.timeout(2):
+            async with async_engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        db = {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+    except (TimeoutError, SQLAlchemyError, OSError) as e:
+        db = {"ok": False, "error": type(e).__name__}
+    pools = pool_stats()
+    # replicas only degrade performance: reads fall back to the primary
+    replicas = {r.label: {"healthy": r.healthy, "lag_s": r.lag} for r in read_router.replicas}
+    ok = db["ok"] and all(p["headroom"] > 0 for label, p in pools.items() if label in ("sync", "async"))
+    if not ok:
+        response.status_code = 503
+    return {"ok": ok, "db": db, "pools": pools, "replicas": replicas}
+
+
+@app.get("/api/metrics", include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    token = settings.METRICS_TOKEN
+    if token and not hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {token}"):
+        raise HTTPException(401, "Unauthorized")
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    metrics.threadpool_busy.set(limiter.borrowed_tokens)
+    metrics.threadpool_size.set(limiter.total_tokens)
+    for label, p in pool_stats().items():
+        metrics.db_pool_size.set(p["size"], pool=label)
+        metrics.db_pool_checked_out.set(p["checked_out"], pool=label)
+        metrics.db_pool_overflow.set(p["overflow"], pool=label)
+    hasher.collect()
+    image_pool.collect()
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 # ---------- AUTH ----------
 @app.post("/api/auth/register", response_model=TokenOut)
-def register(inp: RegisterIn, db: Session = Depends(get_db)):
-    if db.scalar(select(User).where(or_(User.email == inp.email, User.nickname == inp.nickname))):
+async def register(inp: RegisterIn, db: AsyncSession = Depends(get_async_db)):
+    if await db.scalar(select(User).where(or_(User.email == inp.email, User.nickname == inp.nickname))):
         raise HTTPException(400, "Email або nickname вже зайняті")
     user = User(
         nickname=inp.nickname,
         email=inp.email,
-        password_hash=hash_password(inp.password),
+        password_hash=await hasher.hash(inp.password),
         is_admin=False,
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     token = create_token(user)
     return TokenOut(access_token=token, nickname=user.nickname, is_admin=user.is_admin)
 
 
 @app.post("/api/auth/login", response_model=TokenOut)
-def login(inp: LoginIn, db: Session = Depends(get_db)):
-    user = db.scalar(select(User).where(User.email == inp.email))
-    if not user or not verify_password(inp.password, user.password_hash):
+async def login(inp: LoginIn, db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(User).where(User.email == inp.email))
+    if not user:
+        raise HTTPException(401, "Невірний email або пароль")
+    ok, new_hash = await hasher.verify_and_update(inp.password, user.password_hash)
+    if not ok:
         raise HTTPException(401, "Невірний email або пароль")
+    if new_hash:
+        # CryptContext settings changed since this hash was made
+        user.password_hash = new_hash
+        await db.commit()
     token = create_token(user)
     return TokenOut(access_token=token, nickname=user.nickname, is_admin=user.is_admin)
 
 
 @app.get("/api/me")
-def me(user: User = Depends(get_current_user)):
+def me(user: Principal = Depends(get_current_user)):
     return {"nickname": user.nickname, "email": user.email, "is_admin": user.is_admin}
 
 
 # ---------- PRODUCTS ----------
-@app.get("/api/products", response_model=list[ProductOut])
-def list_products(
-    q: Optional[str] = None,
-    category: Optional[str] = None,
-    supplier: Optional[str] = None,
-    min_price: Optional[float] = None,
-    max_price: Optional[float] = None,
-    sort: str = "new",  # new | price_asc | price_desc | name_asc
-    skip: int = Query(0, ge=0),
-    limit: int = Query(24, ge=1, le=200),
-    db: Session = Depends(get_db),
-):
-    stmt = select(Product)
+async def query_products(db: AsyncSession, q, category, supplier, min_price, max_price,
+                         sort: str, skip: int, limit: int, cursor) -> dict:
+    """The SQL path of list_products: {"body": JSON list, "next_cursor": str | None}."""
+    rank = snippet = None
+    if q:
+        where, rank, snippet = search_clause(await search_features(db), q)
+
+    mode = sort
+    if sort == "price_asc":
+        order = [(Product.price, False)]
+    elif sort == "price_desc":
+        order = [(Product.price, True)]
+    elif sort == "name_asc":
+        order = [(Product.name, False)]
+    elif sort == "relevance" and rank is not None:
+        order = [(rank, True)]
+    else:
+        mode, order = "new", []
+    order.append((Product.id, True))
+
+    stmt = select(Product, snippet if snippet is not None else null(), *[col for col, _ in order])
 
     if q:
-        like = f"%{q.strip()}%"
-        stmt = stmt.where(or_(Product.name.ilike(like), Product.description.ilike(like)))
+        stmt = stmt.where(where)
 
     if category:
         stmt = stmt.where(Product.category == category)
@@ -119,39 +252,204 @@ def list_products(
     if max_price is not None:
         stmt = stmt.where(Product.price <= max_price)
 
-    if sort == "price_asc":
-        stmt = stmt.order_by(Product.price.asc(), Product.id.desc())
-    elif sort == "price_desc":
-        stmt = stmt.order_by(Product.price.desc(), Product.id.desc())
-    elif sort == "name_asc":
-        stmt = stmt.order_by(Product.name.asc(), Product.id.desc())
-    else:
-        stmt = stmt.order_by(Product.id.desc())
+    if cursor:
+        stmt = stmt.where(keyset_after(order, decode_cursor(cursor, mode, order)))
+
+    stmt = stmt.order_by(*order_by_clauses(order))
+    rows = (await db.execute(stmt.offset(skip).limit(limit + 1))).all()
+    next_cursor = encode_cursor(mode, rows[limit - 1][2:]) if len(rows) > limit else None
+    return {
+        "body": json_list(product_json(row[0], row[1]) for row in rows[:limit]).decode(),
+        "next_cursor": next_cursor,
+    }
 
-    items = db.scalars(stmt.offset(skip).limit(limit)).all()
-    return [product_to_out(p) for p in items]
+
+@app.get("/api/products", response_model=list[ProductOut])
+async def list_products(
+    request: Request,
+    q: Optional[str] = None,
+    category: Optional[str] = None,
+    supplier: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    sort: str = "new",  # new | price_asc | price_desc | name_asc | relevance (with q)
+    skip: int = Query(0, ge=0),
+    limit: int = Query(24, ge=1, le=200),
+    cursor: Optional[str] = None,  # X-Next-Cursor of the previous page
+    version: int = Depends(catalog_version),
+    db: AsyncSession = Depends(get_catalog_db),
+):
+    q = " ".join(q.split()) if q else None
+    params = dict(q=q, category=category, supplier=supplier, min_price=min_price,
+                  max_price=max_price, sort=sort, skip=skip, limit=limit, cursor=cursor)
+    etag = make_etag(version, "products", params)
+    if r := not_modified(request, "products", etag):
+        return r
+
+    async def load():
+        if catalog_snapshot.enabled and not q:
+            page = await catalog_snapshot.page(db, version, category, supplier, min_price, max_price,
+                                               sort, skip, limit, cursor)
+            if page is not None:
+                return page
+        return await query_products(db, q, category, supplier, min_price, max_price, sort, skip, limit, cursor)
+
+    page = await catalog_cache.aget_or_set("products", params, load, version)
+    headers = cache_headers("products", etag)
+    if page["next_cursor"]:
+        headers["X-Next-Cursor"] = page["next_cursor"]
+    return RawJSONResponse(page["body"], headers=headers)
+
+
+async def facet_cube(db: AsyncSession, version: int) -> list:
+    async def load():
+        return [list(row) for row in (await db.execute(facets.cube_query())).all()]
+    return await catalog_cache.aget_or_set("facet_cube", {}, load, version)
 
 
 @app.get("/api/products/filters")
-def product_filters(db: Session = Depends(get_db)):
-    cats = db.scalars(select(Product.category).where(Product.category.is_not(None)).distinct()).all()
-    sups = db.scalars(select(Product.supplier).where(Product.supplier.is_not(None)).distinct()).all()
-    cats = sorted([c for c in cats if c])
-    sups = sorted([s for s in sups if s])
-    return {"categories": cats, "suppliers": sups}
+async def product_filters(request: Request, response: Response,
+                          version: int = Depends(catalog_version), db: AsyncSession = Depends(get_catalog_db)):
+    etag = make_etag(version, "filters", {})
+    if r := not_modified(request, "filters", etag):
+        return r
+
+    async def load():
+        cube = await facet_cube(db, version)
+        return {
+            "categories": sorted({c for c, _, _, _ in cube if c}),
+            "suppliers": sorted({s for _, s, _, _ in cube if s}),
+        }
+
+    out = await catalog_cache.aget_or_set("filters", {}, load, version)
+    response.headers.update(cache_headers("filters", etag))
+    return out
+
+
+@app.get("/api/products/facets")
+async def product_facets(
+    request: Request,
+    response: Response,
+    q: Optional[str] = None,
+    category: Optional[str] = None,
+    supplier: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    version: int = Depends(catalog_version),
+    db: AsyncSession = Depends(get_catalog_db),
+):
+    q = " ".join(q.split()) if q else None
+    params = dict(q=q, category=category, supplier=supplier, min_price=min_price, max_price=max_price)
+    etag = make_etag(version, "facets", params)
+    if r := not_modified(request, "facets", etag):
+        return r
+
+    async def load():
+        if q or not facets.aligned(min_price, max_price):
+            # only matching products can be counted; still one grouped query
+            where = search_clause(await search_features(db), q).where if q else None
+            cells = (await db.execute(facets.matching_query(where, min_price, max_price))).all()
+        else:
+            cells = facets.cube_cells(await facet_cube(db, version), min_price, max_price)
+        return facets.count_facets(cells, category, supplier)
+
+    out = await catalog_cache.aget_or_set("facets", params, load, version)
+    response.headers.update(cache_headers("facets", etag))
+    return out
 
 @app.get("/api/products/slugs")
-def list_product_slugs(db: Session = Depends(get_db)):
-    slugs = db.scalars(select(Product.slug).order_by(Product.id.asc())).all()
-    return {"slugs": slugs}
+async def list_product_slugs(request: Request, response: Response,
+                             version: int = Depends(catalog_version), db: AsyncSession = Depends(get_catalog_db)):
+    etag = make_etag(version, "slugs", {})
+    if r := not_modified(request, "slugs", etag):
+        return r
+
+    async def load():
+        slugs = (await db.scalars(select(Product.slug).order_by(Product.id.asc()))).all()
+        return {"slugs": slugs}
+
+    out = await catalog_cache.aget_or_set("slugs", {}, load, version)
+    response.headers.update(cache_headers("slugs", etag))
+    return out
+
+
+@app.get("/api/products/suggest")
+async def suggest_products(
+    request: Request,
+    response: Response,
+    q: str = "",
+    limit: int = Query(8, ge=1, le=SUGGEST_MAX_LIMIT),
+    version: int = Depends(catalog_version),
+    db: AsyncSession = Depends(get_catalog_db),
+):
+    """Autocomplete: products, categories and suppliers whose words start with the typed ones."""
+    etag = make_etag(version, "suggest", {"q": q, "limit": limit})
+    if r := not_modified(request, "suggest", etag):
+        return r
+    out = await suggestions.suggest(db, version, q, limit)
+    response.headers.update(cache_headers("suggest", etag))
+    return out
+
 
+@app.get("/api/products/export")
+async def export_products(
+    request: Request,
+    since_version: int = Query(0, ge=0),  # X-Catalog-Version of an earlier export
+    updated_after: Optional[datetime] = None,
+):
+    """All products as NDJSON (one ProductOut per line, by id) for static site builds.
+
+    Deleted products are not reported; compare with /api/products/slugs.
+    """
+    stream = export_stream(since_version, updated_after)
+    watermark, top, total = await anext(stream)
+    params = {"since_version": since_version, "updated_after": updated_after}
+    etag = make_etag(top, "export", {**params, "count": total, "watermark": watermark})
+    if r := not_modified(request, "export", etag):
+        await stream.aclose()
+        return r
+    headers = {**cache_headers("export", etag), "X-Catalog-Version": str(watermark)}
+    return StreamingResponse(stream, media_type="application/x-ndjson", headers=headers)
 
 @app.get("/api/products/{slug}", response_model=ProductOut)
-def get_product(slug: str, db: Session = Depends(get_db)):
-    p = db.scalar(select(Product).where(Product.slug == slug))
-    if not p:
+async def get_product(slug: str, request: Request,
+                      version: int = Depends(catalog_version), db: AsyncSession = Depends(get_catalog_db)):
+    etag = make_etag(version, "product", {"slug": slug})
+    if r := not_modified(request, "product", etag):
+        return r
+
+    async def load():
+        p = await db.scalar(select(Product).where(Product.slug == slug))
+        return product_json(p).decode() if p else None
+
+    out = await catalog_cache.aget_or_set("product", {"slug": slug}, load, version)
+    if out is None:
         raise HTTPException(404, "Товар не знайдено")
-    return product_to_out(p)
+    return RawJSONResponse(out, headers=cache_headers("product", etag))
+
+
+@app.get("/api/products/{slug}/related", response_model=list[ProductOut])
+async def related_products(
+    slug: str,
+    request: Request,
+    limit: int = Query(8, ge=1, le=24),
+    version: int = Depends(catalog_version),
+    db: AsyncSession = Depends(get_catalog_db),
+):
+    """Frequently bought together, topped up with same-category / same-supplier products."""
+    # app.related takes a catalog version whenever it changes the pairs
+    etag = make_etag(version, "related", {"slug": slug, "limit": limit})
+    if r := not_modified(request, "related", etag):
+        return r
+
+    async def load():
+        p = await db.scalar(select(Product).where(Product.slug == slug))
+        return json_list(product_json(r) for r in await related(db, p, limit)).decode() if p else None
+
+    out = await catalog_cache.aget_or_set("related", {"slug": slug, "limit": limit}, load, version)
+    if out is None:
+        raise HTTPException(404, "Товар не знайдено")
+    return RawJSONResponse(out, headers=cache_headers("related", etag))
 
 
 # ---------- ADMIN PRODUCTS ----------
@@ -159,7 +457,7 @@ def get_product(slug: str, db: Session = Depends(get_db)):
 def admin_create_product(
     inp: ProductCreate,
     db: Session = Depends(get_db),
-    admin: User = Depends(require_admin),
+    admin: Principal = Depends(require_admin),
 ):
     if db.scalar(select(Product).where(Product.slug == inp.slug)):
         raise HTTPException(400, "Slug вже існує")
@@ -174,15 +472,48 @@ def admin_create_product(
     db.add(p)
     db.commit()
     db.refresh(p)
+    catalog_cache.bump()
     return product_to_out(p)
 
 
+@app.post("/api/admin/products/bulk")
+async def admin_bulk_products(
+    request: Request,
+    format: Literal["csv", "ndjson"] = "csv",
+    dry_run: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+    admin: Principal = Depends(require_admin_async),
+):
+    """Create / update products by slug from a CSV or NDJSON body, in one transaction; per-row report."""
+    records = (bulk.csv_records if format == "csv" else bulk.ndjson_records)(request.stream())
+    try:
+        out = await bulk.import_products(db, records, dry_run)
+    except IntegrityError:
+        raise HTTPException(409, "Slug щойно створено іншим запитом, повторіть імпорт")
+    if not dry_run and (out["summary"]["created"] or out["summary"]["updated"]):
+        catalog_cache.bump()
+    return out
+
+
+@app.post("/api/admin/products/images")
+async def admin_bulk_images(
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_async_db),
+    admin: Principal = Depends(require_admin_async),
+):
+    """Zip of <slug>.jpg|png|webp files; per-file report."""
+    out = await bulk.import_images(db, file.file, image_pool)
+    if out["summary"]["updated"]:
+        catalog_cache.bump()
+    return out
+
+
 @app.put("/api/admin/products/{product_id}", response_model=ProductOut)
 def admin_update_product(
     product_id: int,
     inp: ProductCreate,
     db: Session = Depends(get_db),
-    admin: User = Depends(require_admin),
+    admin: Principal = Depends(require_admin),
 ):
     p = db.get(Product, product_id)
     if not p:
@@ -199,6 +530,7 @@ def admin_update_product(
     p.price = inp.price
     db.commit()
     db.refresh(p)
+    catalog_cache.bump()
     return product_to_out(p)
 
 
@@ -206,207 +538,284 @@ def admin_update_product(
 def admin_delete_product(
     product_id: int,
     db: Session = Depends(get_db),
-    admin: User = Depends(require_admin),
+    admin: Principal = Depends(require_admin),
 ):
     p = db.get(Product, product_id)
     if not p:
         raise HTTPException(404, "Не знайдено")
-    if p.image_path:
-        try:
-            os.remove(os.path.join(settings.MEDIA_DIR, p.image_path))
-        except FileNotFoundError:
-            pass
-    db.delete(p)
-    db.commit()
+    files = media_files(p.image_path, p.image_variants)
+    with media_lock():
+        db.delete(p)
+        db.flush()
+        files = unused(db, files)
+        db.commit()
+        remove_media(files)
+    catalog_cache.bump()
     return {"deleted": True}
 
 
 @app.post("/api/admin/products/{product_id}/image", response_model=ProductOut)
-def admin_upload_image(
+async def admin_upload_image(
     product_id: int,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    admin: User = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_db),
+    admin: Principal = Depends(require_admin_async),
 ):
-    p = db.get(Product, product_id)
+    p = await db.get(Product, product_id)
     if not p:
         raise HTTPException(404, "Не знайдено")
     ext = os.path.splitext(file.filename or "")[1].lower()
     if ext not in [".jpg", ".jpeg", ".png", ".webp"]:
         raise HTTPException(400, "Підтримуються лише jpg/png/webp")
-    fname = f"p{product_id}{ext}"
-    dest = os.path.join(settings.MEDIA_DIR, fname)
-    with open(dest, "wb") as f:
-        shutil.copyfileobj(file.file, f)
-    p.image_path = fname
-    db.commit()
-    db.refresh(p)
+    data = await file.read()
+    try:
+        result = await image_pool.run(process_image, data, ext, settings.MEDIA_DIR)
+    except BAD_IMAGE:
+        raise HTTPException(400, "Не вдалося прочитати зображення")
+    async with amedia_lock():
+        new = media_files(result["original"], result["variants"])
+        if missing(new):  # same picture, removed with another product meanwhile
+            result = await image_pool.run(process_image, data, ext, settings.MEDIA_DIR)
+        old = media_files(p.image_path, p.image_variants) - new
+        p.image_path = result["original"]
+        p.image_variants = result["variants"]
+        await db.flush()
+        old = await aunused(db, old)
+        await db.commit()
+        remove_media(old)
+    catalog_cache.bump()
     return product_to_out(p)
 
 
 # ---------- FAVORITES ----------
 @app.get("/api/favorites", response_model=list[ProductOut])
-def list_favorites(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    favs = db.scalars(select(Favorite).where(Favorite.user_id == user.id)).all()
-    products = [db.get(Product, f.product_id) for f in favs]
-    return [product_to_out(p) for p in products if p]
+async def list_favorites(user: Principal = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
+    products = (await db.scalars(
+        select(Product).join(Favorite, Favorite.product_id == Product.id)
+        .where(Favorite.user_id == user.id).order_by(Favorite.id)
+    )).all()
+    return RawJSONResponse(json_list(product_json(p) for p in products))
+
+
+def _favorite_rows(user_id: int, product_ids):
+    # existing products only; unknown ids are skipped instead of failing the batch
+    v = values(column("product_id", Integer), name="v").data([(pid,) for pid in dict.fromkeys(product_ids)])
+    return select(literal(user_id), Product.id).select_from(v).join(Product, Product.id == v.c.product_id)
 
 
 @app.post("/api/favorites/{product_id}")
-def add_favorite(product_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    if not db.get(Product, product_id):
+def add_favorite(product_id: int, user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
+    try:
+        db.execute(pg_insert(Favorite).values(user_id=user.id, product_id=product_id)
+                   .on_conflict_do_nothing(index_elements=["user_id", "product_id"]))
+        db.commit()
+    except IntegrityError:  # products FK
         raise HTTPException(404, "Товар не знайдено")
-    if db.scalar(select(Favorite).where(Favorite.user_id == user.id, Favorite.product_id == product_id)):
-        return {"ok": True}
-    db.add(Favorite(user_id=user.id, product_id=product_id))
-    db.commit()
     return {"ok": True}
 
 
 @app.delete("/api/favorites/{product_id}")
-def remove_favorite(product_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    f = db.scalar(select(Favorite).where(Favorite.user_id == user.id, Favorite.product_id == product_id))
-    if f:
-        db.delete(f)
-        db.commit()
+def remove_favorite(product_id: int, user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
+    db.execute(delete(Favorite).where(Favorite.user_id == user.id, Favorite.product_id == product_id))
+    db.commit()
+    return {"ok": True}
+
+
+@app.put("/api/favorites")
+def update_favorites(inp: FavoritesBatchIn, user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
+    if inp.add:
+        db.execute(pg_insert(Favorite).from_select(["user_id", "product_id"], _favorite_rows(user.id, inp.add))
+                   .on_conflict_do_nothing(index_elements=["user_id", "product_id"]))
+    if inp.remove:
+        db.execute(delete(Favorite).where(Favorite.user_id == user.id, Favorite.product_id.in_(inp.remove)))
+    db.commit()
     return {"ok": True}
 
 
 # ---------- CART ----------
 @app.get("/api/cart", response_model=list[CartItemOut])
-def get_cart(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    items = db.scalars(select(CartItem).where(CartItem.user_id == user.id)).all()
-    out: list[CartItemOut] = []
-    for it in items:
-        p = db.get(Product, it.product_id)
-        if p:
-            out.append(CartItemOut(product=product_to_out(p), qty=it.qty))
-    return out
+async def get_cart(user: Principal = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
+    rows = (await db.execute(
+        select(CartItem.qty, Product).join(CartItem.product)
+        .where(CartItem.user_id == user.id).order_by(CartItem.id)
+    )).all()
+    return RawJSONResponse(json_list(b'{"product":%s,"qty":%d}' % (product_json(p), qty) for qty, p in rows))
+
+
+def _cart_upsert(stmt, add: bool):
+    qty = CartItem.qty + stmt.excluded.qty if add else stmt.excluded.qty
+    return stmt.on_conflict_do_update(index_elements=["user_id", "product_id"], set_={"qty": qty})
 
 
 @app.post("/api/cart/{product_id}")
-def cart_add(product_id: int, qty: int = 1, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def cart_add(product_id: int, qty: int = 1, user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
     if qty < 1:
         qty = 1
-    if not db.get(Product, product_id):
+    try:
+        db.execute(_cart_upsert(pg_insert(CartItem).values(user_id=user.id, product_id=product_id, qty=qty), add=True))
+        db.commit()
+    except IntegrityError:  # products FK
         raise HTTPException(404, "Товар не знайдено")
-    it = db.scalar(select(CartItem).where(CartItem.user_id == user.id, CartItem.product_id == product_id))
-    if it:
-        it.qty += qty
-    else:
-        db.add(CartItem(user_id=user.id, product_id=product_id, qty=qty))
-    db.commit()
     return {"ok": True}
 
 
 @app.patch("/api/cart/{product_id}")
-def cart_set_qty(product_id: int, qty: int, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    it = db.scalar(select(CartItem).where(CartItem.user_id == user.id, CartItem.product_id == product_id))
-    if not it:
-        raise HTTPException(404, "Немає в кошику")
+def cart_set_qty(product_id: int, qty: int, user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
+    where = (CartItem.user_id == user.id, CartItem.product_id == product_id)
     if qty <= 0:
-        db.delete(it)
+        stmt = delete(CartItem).where(*where)
     else:
-        it.qty = qty
+        stmt = update(CartItem).where(*where).values(qty=qty)
+    if db.scalar(stmt.returning(CartItem.id)) is None:
+        raise HTTPException(404, "Немає в кошику")
     db.commit()
     return {"ok": True}
 
 
 @app.delete("/api/cart/{product_id}")
-def cart_remove(product_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    it = db.scalar(select(CartItem).where(CartItem.user_id == user.id, CartItem.product_id == product_id))
-    if it:
-        db.delete(it)
-        db.commit()
+def cart_remove(product_id: int, user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
+    db.execute(delete(CartItem).where(CartItem.user_id == user.id, CartItem.product_id == product_id))
+    db.commit()
+    return {"ok": True}
+
+
+@app.put("/api/cart")
+def cart_update(inp: CartBatchIn, user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
+    lines: dict[int, int] = {}
+    for line in inp.items:
+        lines[line.product_id] = lines.get(line.product_id, 0) + line.qty if inp.mode == "add" else line.qty
+    keep = {pid: qty for pid, qty in lines.items() if qty > 0}
+    drop = [pid for pid, qty in lines.items() if qty <= 0 and inp.mode == "set"]
+
+    if inp.mode == "replace":
+        db.execute(delete(CartItem).where(CartItem.user_id == user.id, CartItem.product_id.not_in(keep)))
+    elif drop:
+        db.execute(delete(CartItem).where(CartItem.user_id == user.id, CartItem.product_id.in_(drop)))
+    if keep:
+        v = values(column("product_id", Integer), column("qty", Integer), name="v").data(list(keep.items()))
+        rows = select(literal(user.id), Product.id, v.c.qty).select_from(v).join(Product, Product.id == v.c.product_id)
+        db.execute(_cart_upsert(pg_insert(CartItem).from_select(["user_id", "product_id", "qty"], rows), add=inp.mode == "add"))
+    db.commit()
     return {"ok": True}
 
 
 # ---------- ORDERS ----------
 @app.post("/api/orders")
-def create_order(inp: CheckoutIn, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    cart = db.scalars(select(CartItem).where(CartItem.user_id == user.id)).all()
-    if not cart:
+def create_order(
+    inp: CheckoutIn,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=80),
+    user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    # lock the cart first: a concurrent checkout of the same cart waits here, then
+    # finds either its Idempotency-Key or an empty cart
+    cart_ids = db.scalars(
+        select(CartItem.id).where(CartItem.user_id == user.id).with_for_update()
+    ).all()
+    if idempotency_key:
+        order_id = db.scalar(select(IdempotencyKey.order_id).where(
+            IdempotencyKey.user_id == user.id, IdempotencyKey.key == idempotency_key))
+        if order_id is not None:
+            db.rollback()
+            response.headers["Idempotent-Replayed"] = "true"
+            return {"order_id": order_id}
+    if not cart_ids:
+        raise HTTPException(400, "Кошик порожній")
+
+    order_id = db.scalar(insert(Order).values(
+        user_id=user.id, status="paid" if inp.payment_method == "card" else "created",
+        payment_method=inp.payment_method, delivery_method=inp.delivery_method, full_name=inp.full_name,
+        phone=inp.phone, city=inp.city, address=inp.address, comment=inp.comment,
+    ).returning(Order.id))
+    added = db.execute(insert(OrderItem).from_select(
+        ["order_id", "product_id", "name", "price", "qty"],
+        select(literal(order_id), Product.id, Product.name, Product.price, CartItem.qty)
+        .join(Product, Product.id == CartItem.product_id)
+        .where(CartItem.id.in_(cart_ids))
+        .order_by(CartItem.id),
+    )).rowcount
+    if not added:
+        db.rollback()
         raise HTTPException(400, "Кошик порожній")
-    order = Order(user_id=user.id, status="created", payment_method=inp.payment_method, delivery_method=inp.delivery_method, full_name=inp.full_name, phone=inp.phone, city=inp.city, address=inp.address, comment=inp.comment)
-    db.add(order)
-    if inp.payment_method == "card":
-        order.status = "paid"
-    db.flush()
-    for it in cart:
-        p = db.get(Product, it.product_id)
-        if not p:
-            continue
-        db.add(OrderItem(order_id=order.id, product_id=p.id, name=p.name, price=float(p.price), qty=it.qty))
-    for it in cart:
-        db.delete(it)
+    db.execute(delete(CartItem).where(CartItem.id.in_(cart_ids)))
+    if idempotency_key:
+        db.add(IdempotencyKey(user_id=user.id, key=idempotency_key, order_id=order_id))
     db.commit()
-    return {"order_id": order.id}
+    return {"order_id": order_id}
 
 
 @app.get("/api/orders", response_model=list[OrderOut])
-def list_orders(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    orders = db.scalars(
-        select(Order).where(Order.user_id == user.id).order_by(Order.id.desc())
-    ).all()
-    out: list[OrderOut] = []
-    for o in orders:
-        items = db.scalars(select(OrderItem).where(OrderItem.order_id == o.id)).all()
-        out.append(
-            OrderOut(
-                id=o.id,
-                status=o.status,
-                payment_method=o.payment_method,
-                delivery_method=o.delivery_method,
-                full_name=o.full_name,
-                phone=o.phone,
-                city=o.city,
-                address=o.address,
-                comment=o.comment,
-                items=[{"name": it.name, "price": float(it.price), "qty": it.qty} for it in items],
-            )
-        )
-    return out
+async def list_orders(user: Principal = Depends(get_current_user_async), db: AsyncSession = Depends(get_user_read_db)):
+    orders = (await db.scalars(
+        select(Order).where(Order.user_id == user.id)
+        .options(selectinload(Order.items)).order_by(Order.id.desc())
+    )).all()
+    return [order_to_out(o) for o in orders]
 
 # ---------- ADMIN: ORDERS ----------
+def order_filters(
+    status: Optional[str] = None,
+    payment_method: Optional[str] = None,
+    delivery_method: Optional[str] = None,
+    city: Optional[str] = None,
+    created_from: Optional[datetime] = None,  # inclusive
+    created_to: Optional[datetime] = None,  # exclusive
+) -> list:
+    where = []
+    for col, value in ((Order.status, status), (Order.payment_method, payment_method),
+                       (Order.delivery_method, delivery_method), (Order.city, city)):
+        if value:
+            where.append(col == value)
+    if created_from is not None:
+        where.append(Order.created_at >= created_from)
+    if created_to is not None:
+        where.append(Order.created_at < created_to)
+    return where
+
+
 @app.get("/api/admin/orders", response_model=list[OrderOut])
-def admin_list_orders(user: User = Depends(require_admin), db: Session = Depends(get_db)):
-    orders = db.scalars(select(Order).order_by(Order.id.desc()).limit(200)).all()
-    out = []
-    for o in orders:
-        items = db.scalars(select(OrderItem).where(OrderItem.order_id == o.id)).all()
-        out.append(OrderOut(
-            id=o.id,
-            status=o.status,
-            payment_method=o.payment_method,
-            delivery_method=o.delivery_method,
-            full_name=o.full_name,
-            phone=o.phone,
-            city=o.city,
-            address=o.address,
-            comment=o.comment,
-            items=[{"name": i.name, "price": float(i.price), "qty": i.qty} for i in items],
-        ))
-    return out
+async def admin_list_orders(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,  # X-Next-Cursor of the previous page
+    where: list = Depends(order_filters),
+    user: Principal = Depends(require_admin_async),
+    db: AsyncSession = Depends(get_user_read_db),
+):
+    order = [(Order.created_at, True), (Order.id, True)]
+    stmt = select(Order, Order.created_at, Order.id).where(*where)
+    if cursor:
+        stmt = stmt.where(keyset_after(order, decode_cursor(cursor, "orders", order)))
+    rows = (await db.execute(
+        stmt.options(selectinload(Order.items)).order_by(*order_by_clauses(order)).limit(limit + 1)
+    )).all()
+    if len(rows) > limit:
+        response.headers["X-Next-Cursor"] = encode_cursor("orders", rows[limit - 1][1:])
+    return [order_to_out(row[0]) for row in rows[:limit]]
+
+
+@app.get("/api/admin/orders/export")
+async def admin_export_orders(
+    format: Literal["csv", "ndjson"] = "csv",
+    where: list = Depends(order_filters),
+    user: Principal = Depends(require_admin_async),
+):
+    """Orders with their items, oldest first: CSV (a row per item) or NDJSON (an order per line)."""
+    stream = orders_csv_stream(where, f"user:{user.id}") if format == "csv" else orders_ndjson_stream(where, f"user:{user.id}")
+    filename = f"orders-{time.strftime('%Y%m%d')}.{format}"
+    return StreamingResponse(
+        stream, media_type="text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 
 @app.patch("/api/admin/orders/{order_id}", response_model=OrderOut)
-def admin_update_order_status(order_id: int, status: str, user: User = Depends(require_admin), db: Session = Depends(get_db)):
-    o = db.get(Order, order_id)
+def admin_update_order_status(order_id: int, status: str, user: Principal = Depends(require_admin), db: Session = Depends(get_db)):
+    o = db.get(Order, order_id, options=[selectinload(Order.items)])
     if not o:
         raise HTTPException(404, "Order not found")
     o.status = status
+    out = order_to_out(o)
     db.commit()
-    items = db.scalars(select(OrderItem).where(OrderItem.order_id == o.id)).all()
-    return OrderOut(
-        id=o.id,
-        status=o.status,
-        payment_method=o.payment_method,
-        delivery_method=o.delivery_method,
-        full_name=o.full_name,
-        phone=o.phone,
-        city=o.city,
-        address=o.address,
-        comment=o.comment,
-        items=[{"name": i.name, "price": float(i.price), "qty": i.qty} for i in items],
-    )
-
+    return out
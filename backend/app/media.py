@@ -0,0 +1,79 @@
+"""Which media files are still in use.
+
+Image files are named by content hash (images.process_image), so products with
+the same picture share them: a file may only go when no products row refers to
+its hash any more. The check and the removal run under LOCK_KEY, and so does
+every write of new image references, after making sure the files are (still)
+on disk; an upload of the same bytes can't slip in between.
+"""
+import os
+from contextlib import contextmanager, asynccontextmanager
+
+from sqlalchemy import select, or_, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .db import engine, async_engine
+from .images import SUBDIR
+from .models import Product
+
+LOCK_KEY = 0x7A676D64  # pg_advisory_lock id, on a connection of its own
+LOCK_SQL = text("SELECT pg_advisory_lock(:k)")
+UNLOCK_SQL = text("SELECT pg_advisory_unlock(:k)")
+
+
+@contextmanager
+def media_lock():
+    with engine.connect() as conn:
+        conn.execute(LOCK_SQL, {"k": LOCK_KEY})
+        try:
+            yield
+        finally:
+            conn.execute(UNLOCK_SQL, {"k": LOCK_KEY})
+            conn.commit()
+
+
+@asynccontextmanager
+async def amedia_lock():
+    async with async_engine.connect() as conn:
+        await conn.execute(LOCK_SQL, {"k": LOCK_KEY})
+        try:
+            yield
+        finally:
+            await conn.execute(UNLOCK_SQL, {"k": LOCK_KEY})
+            await conn.commit()
+
+
+def _digest(name: str) -> str | None:
+    # i/<digest>.<ext>, i/<digest>-<variant>.<ext>; older uploads have other names
+    if not name.startswith(f"{SUBDIR}/"):
+        return None
+    return os.path.basename(name).split(".")[0].split("-")[0]
+
+
+def _users(names: set[str]):
+    # the original is always kept with the variants, so image_path tells which hashes are in use
+    digests = {d for d in map(_digest, names) if d}
+    return select(Product.image_path).where(or_(
+        Product.image_path.in_(names), *(Product.image_path.startswith(f"{SUBDIR}/{d}") for d in digests)
+    ))
+
+
+def _unused(names: set[str], paths) -> set[str]:
+    paths = set(paths)
+    used = {_digest(p) for p in paths} - {None}
+    return {n for n in names if n not in paths and _digest(n) not in used}
+
+
+def unused(db: Session, names: set[str]) -> set[str]:
+    """Of `names`, the files no product refers to (flush the change that dropped them first)."""
+    return _unused(names, db.scalars(_users(names))) if names else set()
+
+
+async def aunused(db: AsyncSession, names: set[str]) -> set[str]:
+    return _unused(names, await db.scalars(_users(names))) if names else set()
+
+
+def missing(names: set[str]) -> bool:
+    return any(not os.path.exists(os.path.join(settings.MEDIA_DIR, n)) for n in names)
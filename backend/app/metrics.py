@@ -0,0 +1,134 @@
+"""Prometheus metrics in the text exposition format, no client library.
+
+Values are per process: with several uvicorn workers each scrape sees the
+worker that answered it, so scrape workers individually (or run one worker
+per container) and aggregate in Prometheus.
+"""
+import threading
+from bisect import bisect_left
+
+REGISTRY: list["_Metric"] = []
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) and not v.is_integer() else str(int(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.doc = doc
+        self.labels = labels
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[n]) for n in self.labels)
+
+    def _labelstr(self, key: tuple, extra: str = "") -> str:
+        parts = [f'{n}="{_escape(v)}"' for n, v in zip(self.labels, key)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines += self._samples(key, value)
+        return lines
+
+    def _samples(self, key: tuple, value) -> list[str]:
+        return [f"{self.name}{self._labelstr(key)} {_fmt(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labels: tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket (non-cumulative) counts + the +Inf slot, sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+
+    def _samples(self, key: tuple, value) -> list[str]:
+        counts, total = value
+        lines, running = [], 0
+        for bound, n in zip((*self.buckets, float("inf")), counts):
+            running += n
+            le = 'le="%s"' % _fmt(bound)
+            lines.append(f"{self.name}_bucket{self._labelstr(key, le)} {running}")
+        lines.append(f"{self.name}_sum{self._labelstr(key)} {_fmt(total)}")
+        lines.append(f"{self.name}_count{self._labelstr(key)} {running}")
+        return lines
+
+
+def render() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+# ---------- HTTP ----------
+http_requests = Counter("zg_http_requests_total", "Finished HTTP requests.", ("method", "route", "status"))
+http_duration = Histogram("zg_http_request_duration_seconds", "Time to response headers.", ("method", "route"))
+http_in_flight = Gauge("zg_http_requests_in_flight", "Requests being handled.")
+http_db_queries = Histogram("zg_http_request_db_queries", "SQL statements per request.", ("route",), COUNT_BUCKETS)
+http_db_seconds = Histogram("zg_http_request_db_seconds", "Time in SQL statements per request.", ("route",))
+
+# ---------- runtime (set at scrape time) ----------
+threadpool_busy = Gauge("zg_threadpool_busy_threads", "Threads running sync endpoints/dependencies.")
+threadpool_size = Gauge("zg_threadpool_threads", "Thread limit for sync endpoints/dependencies.")
+db_pool_size = Gauge("zg_db_pool_size", "Configured pool size.", ("pool",))
+db_pool_checked_out = Gauge("zg_db_pool_checked_out", "Connections in use.", ("pool",))
+db_pool_overflow = Gauge("zg_db_pool_overflow", "Connections over pool_size (negative: not yet opened).", ("pool",))
+db_pool_wait = Histogram("zg_db_pool_wait_seconds", "Time to get a connection from the pool.", ("pool",))
+worker_pool_pending = Gauge("zg_worker_pool_pending", "Jobs running or queued in a process pool.", ("pool",))
+worker_pool_rejected = Counter("zg_worker_pool_rejected_total", "Jobs refused with 503.", ("pool",))
+
+# ---------- caches ----------
+cache_requests = Counter("zg_cache_requests_total", "Cache lookups.", ("cache", "result"))
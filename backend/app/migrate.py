@@ -1,32 +1,392 @@
-from sqlalchemy import text, inspect
-from .db import engine, Base
+"""Versioned schema migrations.
+
+`python -m app.migrate` applies the pending steps of MIGRATIONS in order, each in
+its own transaction together with its schema_version row, under an advisory lock
+so concurrent starts wait instead of racing. Steps are idempotent: a database
+created before schema_version existed simply replays all of them once. The app
+itself only checks the version at startup (`check_version`).
+
+Add a step by appending (next number, description, function); never edit or
+reorder applied steps.
+"""
+import argparse
+import re
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, ProgrammingError
+from .db import engine, async_engine, Base
 from .config import settings
+from . import models
+
+LOCK_KEY = 0x7A676D69  # pg_advisory_lock id shared by all migrating processes
+
+def ensure_column(conn, table: str, ddl: str):
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {ddl}"))
+
+def create_indexes(conn, model, *names: str):
+    # create_all only builds indexes together with a new table
+    for index in model.__table__.indexes:
+        if index.name in names:
+            index.create(conn, checkfirst=True)
+
+def search_config(conn) -> str:
+    cfg = settings.SEARCH_TS_CONFIG
+    if not cfg:
+        has_uk = conn.execute(text("SELECT 1 FROM pg_ts_config WHERE cfgname='ukrainian'")).first()
+        cfg = "ukrainian" if has_uk else "simple"
+    if not re.fullmatch(r"[a-z_][a-z0-9_]*", cfg):
+        raise ValueError(f"Invalid SEARCH_TS_CONFIG: {cfg}")
+    return cfg
+
+def ensure_search(conn, reindex: bool = False):
+    # products.search_vector: name (A, + russian stems as B) and tag-stripped description (C)
+    ensure_column(conn, "products", "search_vector TSVECTOR")
+    cfg = search_config(conn)
+    conn.execute(text(f"""
+        CREATE OR REPLACE FUNCTION products_search_plain(html text) RETURNS text
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT regexp_replace(coalesce(html, ''), '<[^>]*>', ' ', 'g')
+        $$;
+
+        CREATE OR REPLACE FUNCTION products_search_document(name text, description text) RETURNS tsvector
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT setweight(to_tsvector('{cfg}', coalesce(name, '')), 'A')
+                || setweight(to_tsvector('russian', coalesce(name, '')), 'B')
+                || setweight(to_tsvector('{cfg}', products_search_plain(description)), 'C')
+        $$;
+
+        CREATE OR REPLACE FUNCTION products_search_query(q text) RETURNS tsquery
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT websearch_to_tsquery('{cfg}', q) || websearch_to_tsquery('russian', q)
+        $$;
+
+        CREATE OR REPLACE FUNCTION products_search_headline(description text, q text) RETURNS text
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT ts_headline('{cfg}', products_search_plain(description), products_search_query(q),
+                'StartSel=<mark>, StopSel=</mark>, MaxWords=25, MinWords=8, MaxFragments=2')
+        $$;
+
+        CREATE OR REPLACE FUNCTION products_search_trigger() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.search_vector := products_search_document(NEW.name, NEW.description);
+            RETURN NEW;
+        END
+        $$;
+
+        DROP TRIGGER IF EXISTS products_search_update ON products;
+        CREATE TRIGGER products_search_update
+            BEFORE INSERT OR UPDATE OF name, description ON products
+            FOR EACH ROW EXECUTE FUNCTION products_search_trigger();
+
+        CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING gin (search_vector);
+    """))
+    where = "" if reindex else " WHERE search_vector IS NULL"
+    n = conn.execute(text(
+        f"UPDATE products SET search_vector = products_search_document(name, description){where}"
+    )).rowcount
+    print(f"Search index: config={cfg}, rows indexed={n}")
+
+    # typo tolerance; pg_trgm is optional (needs contrib + CREATE privilege)
+    try:
+        with conn.begin_nested():
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (name gin_trgm_ops)"
+            ))
+    except DBAPIError as e:
+        print(f"pg_trgm unavailable, fuzzy search disabled: {e.orig}")
+
+def ensure_versions(conn):
+    # products.version: next products_version_seq value on every INSERT and on every
+    # UPDATE that changes the row, so `version > N` is "changed since N"; updated_at with it
+    conn.execute(text("CREATE SEQUENCE IF NOT EXISTS products_version_seq"))
+    ensure_column(conn, "products", "version INTEGER NOT NULL DEFAULT nextval('products_version_seq')")
+    ensure_column(conn, "products", "updated_at TIMESTAMPTZ NOT NULL DEFAULT now()")
+    conn.execute(text("""
+        ALTER TABLE products ALTER COLUMN version SET DEFAULT nextval('products_version_seq');
+        SELECT setval('products_version_seq', greatest(
+            (SELECT max(version) FROM products), (SELECT last_value FROM products_version_seq)));
+
+        CREATE OR REPLACE FUNCTION products_version_trigger() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.version := nextval('products_version_seq');
+            NEW.updated_at := now();
+            RETURN NEW;
+        END
+        $$;
+
+        DROP TRIGGER IF EXISTS products_version ON products;
+        CREATE TRIGGER products_version
+            BEFORE UPDATE ON products
+            FOR EACH ROW WHEN (OLD.* IS DISTINCT FROM NEW.*) EXECUTE FUNCTION products_version_trigger();
+    """))
+    create_indexes(conn, models.Product, "ix_products_version")
+
+def ensure_facets(conn):
+    # product_facet_counts is kept in step by statement-level triggers (one grouped
+    # upsert per INSERT/UPDATE/DELETE statement, however many rows); rebuilt here
+    # so a change of FACET_PRICE_BOUNDS takes effect
+    bounds = ",".join(str(float(b)) for b in settings.FACET_PRICE_BOUNDS)
+    cell = "coalesce(category, ''), coalesce(supplier, ''), products_price_bucket(price)"
+    old = f"SELECT {cell}, -1 FROM old_rows"
+    new = f"SELECT {cell}, 1 FROM new_rows"
+    conn.execute(text(f"""
+        CREATE OR REPLACE FUNCTION products_price_bucket(price numeric) RETURNS smallint
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT width_bucket(price, ARRAY[{bounds}]::numeric[])::smallint
+        $$;
+
+        CREATE OR REPLACE FUNCTION products_facets_trigger() RETURNS trigger
+        LANGUAGE plpgsql AS $fn$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO product_facet_counts AS f (category, supplier, price_bucket, n)
+                SELECT {cell}, count(*) FROM new_rows GROUP BY 1, 2, 3
+                ON CONFLICT (category, supplier, price_bucket) DO UPDATE SET n = f.n + excluded.n;
+            ELSIF TG_OP = 'DELETE' THEN
+                INSERT INTO product_facet_counts AS f (category, supplier, price_bucket, n)
+                SELECT {cell}, -count(*) FROM old_rows GROUP BY 1, 2, 3
+                ON CONFLICT (category, supplier, price_bucket) DO UPDATE SET n = f.n + excluded.n;
+            ELSIF TG_OP = 'UPDATE' THEN
+                -- net change only: an update that keeps the cell writes nothing
+                INSERT INTO product_facet_counts AS f (category, supplier, price_bucket, n)
+                SELECT c, s, b, sum(d) FROM ({old} UNION ALL {new}) AS x(c, s, b, d)
+                GROUP BY 1, 2, 3 HAVING sum(d) <> 0
+                ON CONFLICT (category, supplier, price_bucket) DO UPDATE SET n = f.n + excluded.n;
+            ELSE  -- TRUNCATE
+                DELETE FROM product_facet_counts;
+            END IF;
+            RETURN NULL;
+        END
+        $fn$;
+
+        DROP TRIGGER IF EXISTS products_facets_insert ON products;
+        DROP TRIGGER IF EXISTS products_facets_update ON products;
+        DROP TRIGGER IF EXISTS products_facets_delete ON products;
+        DROP TRIGGER IF EXISTS products_facets_truncate ON products;
+        CREATE TRIGGER products_facets_insert AFTER INSERT ON products
+            REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION products_facets_trigger();
+        CREATE TRIGGER products_facets_update AFTER UPDATE ON products
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION products_facets_trigger();
+        CREATE TRIGGER products_facets_delete AFTER DELETE ON products
+            REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION products_facets_trigger();
+        CREATE TRIGGER products_facets_truncate AFTER TRUNCATE ON products
+            FOR EACH STATEMENT EXECUTE FUNCTION products_facets_trigger();
+    """))
+    conn.execute(text("LOCK TABLE products IN SHARE MODE"))  # no writes while rebuilding
+    conn.execute(text("DELETE FROM product_facet_counts"))
+    n = conn.execute(text(f"""
+        INSERT INTO product_facet_counts (category, supplier, price_bucket, n)
+        SELECT {cell}, count(*) FROM products GROUP BY 1, 2, 3
+    """)).rowcount
+    print(f"Facet index: {n} cells")
+
+def base_schema(conn):
+    # tables missing in older databases, then columns added to existing ones
+    Base.metadata.create_all(bind=conn)
+    ensure_column(conn, "users", "tokens_valid_after INTEGER NOT NULL DEFAULT 0")  # token revocation
+    ensure_column(conn, "products", "category VARCHAR(80)")
+    ensure_column(conn, "products", "image_variants JSONB")  # resized WebP/original-format files
+    for ddl in ("payment_method VARCHAR(30)", "delivery_method VARCHAR(30)", "full_name VARCHAR(120)",
+                "phone VARCHAR(40)", "city VARCHAR(120)", "address VARCHAR(200)", "comment TEXT"):
+        ensure_column(conn, "orders", ddl)
+
+def catalog_indexes(conn):
+    # products listing indexes (keyset pagination)
+    create_indexes(conn, models.Product, "ix_products_price_id", "ix_products_price_asc_id", "ix_products_name_id")
+
+def order_history(conn):
+    # orders.created_at + admin listing / history / export indexes
+    ensure_column(conn, "orders", "created_at TIMESTAMPTZ NOT NULL DEFAULT now()")
+    create_indexes(conn, models.Order, "ix_orders_created_at_id", "ix_orders_status_created_at_id", "ix_orders_user_id_id")
+    create_indexes(conn, models.OrderItem, "ix_order_items_order_id")
+
+def related_products(conn):
+    # "bought together" pair counts + job progress (filled by `python -m app.related`)
+    Base.metadata.create_all(bind=conn, tables=[models.ProductPair.__table__, models.JobWatermark.__table__])
+
+def user_notifications(conn):
+    # cached principals (auth.watch_users) are dropped when their users row changes, in any process
+    conn.execute(text("""
+        CREATE OR REPLACE FUNCTION users_notify_trigger() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM pg_notify('zg_users', OLD.id::text);  -- auth.USERS_CHANNEL
+            RETURN NULL;
+        END
+        $$;
+
+        DROP TRIGGER IF EXISTS users_notify ON users;
+        CREATE TRIGGER users_notify AFTER UPDATE OR DELETE ON users
+            FOR EACH ROW EXECUTE FUNCTION users_notify_trigger();
+    """))
+
+VERSION_LOCK = 0x7A677672  # advisory lock class of in-flight products writers
+
+def commit_safe_versions(conn):
+    # a version comes from the sequence when the statement runs, not at commit, so
+    # `max(version)` can pass a row that commits later with a smaller one. Every
+    # transaction writing products holds a shared advisory lock keyed by the last
+    # version handed out before its first one; below the smallest such key all
+    # versions are final (products_version_watermark)
+    conn.execute(text(f"""
+        CREATE OR REPLACE FUNCTION products_version_top() RETURNS integer
+        LANGUAGE sql VOLATILE AS $$
+            SELECT (CASE WHEN is_called THEN last_value ELSE last_value - 1 END)::integer FROM products_version_seq
+        $$;
+
+        CREATE OR REPLACE FUNCTION products_next_version() RETURNS integer
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF coalesce(current_setting('zg.version_claimed', true), '') = '' THEN
+                PERFORM pg_advisory_xact_lock_shared({VERSION_LOCK}, products_version_top());
+                PERFORM set_config('zg.version_claimed', '1', true);
+            END IF;
+            RETURN nextval('products_version_seq');
+        END
+        $$;
+
+        CREATE OR REPLACE FUNCTION products_version_watermark() RETURNS integer
+        LANGUAGE plpgsql AS $$
+        DECLARE
+            top integer := products_version_top();  -- read before the claims
+        BEGIN
+            RETURN least(top, (SELECT min(objid::bigint)::integer FROM pg_locks
+                               WHERE locktype = 'advisory' AND classid = {VERSION_LOCK} AND objsubid = 2));
+        END
+        $$;
+
+        CREATE OR REPLACE FUNCTION products_version_trigger() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.version := products_next_version();
+            NEW.updated_at := now();
+            RETURN NEW;
+        END
+        $$;
+
+        ALTER TABLE products ALTER COLUMN version SET DEFAULT products_next_version();
+    """))
+
+def versioned_deletes(conn):
+    # a DELETE / TRUNCATE takes a version too, so the watermark (catalog cache version) moves
+    conn.execute(text("""
+        CREATE OR REPLACE FUNCTION products_version_delete_trigger() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'TRUNCATE' OR EXISTS (SELECT 1 FROM gone) THEN
+                PERFORM products_next_version();
+            END IF;
+            RETURN NULL;
+        END
+        $$;
+
+        DROP TRIGGER IF EXISTS products_version_delete ON products;
+        CREATE TRIGGER products_version_delete AFTER DELETE ON products
+            REFERENCING OLD TABLE AS gone
+            FOR EACH STATEMENT EXECUTE FUNCTION products_version_delete_trigger();
+        DROP TRIGGER IF EXISTS products_version_truncate ON products;
+        CREATE TRIGGER products_version_truncate AFTER TRUNCATE ON products
+            FOR EACH STATEMENT EXECUTE FUNCTION products_version_delete_trigger();
+    """))
+
+
+def versioned_truncate(conn):
+    # v10's function read `gone` on TRUNCATE too, where there is no transition table
+    conn.execute(text("""
+        CREATE OR REPLACE FUNCTION products_version_delete_trigger() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                IF EXISTS (SELECT 1 FROM gone) THEN
+                    PERFORM products_next_version();
+                END IF;
+            ELSE  -- TRUNCATE
+                PERFORM products_next_version();
+            END IF;
+            RETURN NULL;
+        END
+        $$;
+    """))
+
+
+def seed_ownership(conn):
+    # rows `app.seed --upsert` may update; older rows count as seeded, as the upsert treated
+    # them (a constant default: no rewrite, no version triggers), later ones only if the seed
+    # inserted them
+    ensure_column(conn, "products", "seeded BOOLEAN NOT NULL DEFAULT true")
+    conn.execute(text("ALTER TABLE products ALTER COLUMN seeded SET DEFAULT false"))
+
+
+MIGRATIONS = [
+    (1, "base tables and columns", base_schema),
+    (2, "catalog keyset indexes", catalog_indexes),
+    (3, "full-text / trigram search", ensure_search),
+    (4, "facet counts", ensure_facets),
+    (5, "product versions", ensure_versions),
+    (6, "order history", order_history),
+    (7, "related products", related_products),
+    (8, "user change notifications", user_notifications),
+    (9, "commit-safe product versions", commit_safe_versions),
+    (10, "versioned product deletes", versioned_deletes),
+    (11, "versioned product truncate", versioned_truncate),
+    (12, "seed-owned products", seed_ownership),
+]
+LATEST = MIGRATIONS[-1][0]
+
+VERSION_SQL = text("SELECT coalesce(max(version), 0) FROM schema_version")
+
+def run(reindex_search: bool = False, rebuild_facets: bool = False):
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": LOCK_KEY})
+        conn.commit()
+        try:
+            with conn.begin():
+                conn.execute(text("""
+                    CREATE TABLE IF NOT EXISTS schema_version (
+                        version INTEGER PRIMARY KEY,
+                        description TEXT NOT NULL,
+                        applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                    )
+                """))
+                current = conn.execute(VERSION_SQL).scalar()
+            for version, description, step in MIGRATIONS:
+                if version <= current:
+                    continue
+                print(f"Migrating to v{version}: {description}")
+                with conn.begin():
+                    step(conn)
+                    conn.execute(text("INSERT INTO schema_version (version, description) VALUES (:v, :d)"),
+                                 {"v": version, "d": description})
+            # config-dependent objects, on request (not versioned)
+            if reindex_search:
+                with conn.begin():
+                    ensure_search(conn, reindex=True)
+            if rebuild_facets:
+                with conn.begin():
+                    ensure_facets(conn)
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": LOCK_KEY})
+            conn.commit()
+    print(f"Schema at v{LATEST}" if current < LATEST else f"Schema up to date (v{current})")
 
-def ensure_column(table: str, column: str, ddl: str):
-    with engine.begin() as conn:
-        exists = conn.execute(text("""
-            SELECT 1 FROM information_schema.columns
-            WHERE table_name=:t AND column_name=:c
-        """), {"t": table, "c": column}).first()
-        if not exists:
-            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {ddl};"))
-
-def run():
-    # create tables if missing
-    Base.metadata.create_all(bind=engine)
-
-    # products.category
-    ensure_column("products", "category", "category VARCHAR(80)")
-
-    # orders extended fields
-    ensure_column("orders", "payment_method", "payment_method VARCHAR(30)")
-    ensure_column("orders", "delivery_method", "delivery_method VARCHAR(30)")
-    ensure_column("orders", "full_name", "full_name VARCHAR(120)")
-    ensure_column("orders", "phone", "phone VARCHAR(40)")
-    ensure_column("orders", "city", "city VARCHAR(120)")
-    ensure_column("orders", "address", "address VARCHAR(200)")
-    ensure_column("orders", "comment", "comment TEXT")
+async def check_version():
+    """Startup check: one query, fails when `python -m app.migrate` has not run."""
+    async with async_engine.connect() as conn:
+        try:
+            current = await conn.scalar(VERSION_SQL)
+        except ProgrammingError:  # no schema_version table yet
+            current = 0
+    if current < LATEST:
+        raise RuntimeError(f"Схема БД v{current}, потрібна v{LATEST}: запустіть `python -m app.migrate`")
 
 if __name__ == "__main__":
-    run()
-    print("Migration complete")
+    parser = argparse.ArgumentParser(description="Apply schema migrations")
+    parser.add_argument("--reindex-search", action="store_true",
+                        help="Rebuild products.search_vector for every row (e.g. after changing SEARCH_TS_CONFIG)")
+    parser.add_argument("--rebuild-facets", action="store_true",
+                        help="Recreate facet buckets and counts (e.g. after changing FACET_PRICE_BOUNDS)")
+    args = parser.parse_args()
+    run(reindex_search=args.reindex_search, rebuild_facets=args.rebuild_facets)
@@ -1,4 +1,5 @@
-from sqlalchemy import String, Integer, Boolean, ForeignKey, Numeric, Text, UniqueConstraint
+from sqlalchemy import String, Integer, SmallInteger, BigInteger, Boolean, ForeignKey, Numeric, Text, UniqueConstraint, Index, DateTime, Sequence, func
+from sqlalchemy.dialects.postgresql import TSVECTOR, JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from .db import Base
 
@@ -9,11 +10,17 @@ class User(Base):
     email: Mapped[str] = mapped_column(String(120), unique=True, index=True)
     password_hash: Mapped[str] = mapped_column(String(255))
     is_admin: Mapped[bool] = mapped_column(Boolean, default=False)
+    # tokens with an earlier `iat` are rejected (see auth.revoke_tokens)
+    tokens_valid_after: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
 
     favorites = relationship("Favorite", back_populates="user", cascade="all, delete-orphan")
     cart_items = relationship("CartItem", back_populates="user", cascade="all, delete-orphan")
     orders = relationship("Order", back_populates="user", cascade="all, delete-orphan")
 
+# global change counter: every insert/update of a product takes the next value (a delete
+# statement takes one too, see migrate.versioned_deletes)
+product_version_seq = Sequence("products_version_seq", metadata=Base.metadata)
+
 class Product(Base):
     __tablename__ = "products"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -24,6 +31,33 @@ class Product(Base):
     category: Mapped[str | None] = mapped_column(String(80), nullable=True, index=True)
     price: Mapped[float] = mapped_column(Numeric(10,2))
     image_path: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    # {"thumb": {"w": 160, "webp": "i/<hash>-thumb.webp", "src": "i/<hash>-thumb.jpg"}, "card": ..., "full": ...}
+    image_variants: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    # inserted by app.seed: `--upsert` updates only these, see migrate.seed_ownership
+    seeded: Mapped[bool] = mapped_column(Boolean, default=False, server_default="false")
+    # maintained by the products_search_update trigger, see migrate.ensure_search
+    search_vector = mapped_column(TSVECTOR, nullable=True, deferred=True)
+    # renewed on every UPDATE by the products_version trigger, see migrate.ensure_versions;
+    # the default becomes products_next_version() in migrate.commit_safe_versions
+    version: Mapped[int] = mapped_column(Integer, server_default=product_version_seq.next_value())
+    updated_at = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+# keyset pagination for /api/products: every sort is tie-broken by id DESC
+Index("ix_products_price_id", Product.price, Product.id)  # price_desc (backward scan)
+Index("ix_products_price_asc_id", Product.price, Product.id.desc())  # price_asc
+Index("ix_products_name_id", Product.name, Product.id.desc())  # name_asc
+Index("ix_products_version", Product.version)  # /api/products/export?since_version
+
+class ProductFacetCount(Base):
+    """Products per (category, supplier, price bucket); NULLs stored as "".
+
+    Maintained by statement-level triggers on products, see migrate.ensure_facets.
+    """
+    __tablename__ = "product_facet_counts"
+    category: Mapped[str] = mapped_column(String(80), primary_key=True)
+    supplier: Mapped[str] = mapped_column(String(120), primary_key=True)
+    price_bucket: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    n: Mapped[int] = mapped_column(Integer)
 
 class Favorite(Base):
     __tablename__ = "favorites"
@@ -56,29 +90,48 @@ class Order(Base):
     city: Mapped[str | None] = mapped_column(String(120), nullable=True)
     address: Mapped[str | None] = mapped_column(String(200), nullable=True)
     comment: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     user = relationship("User", back_populates="orders")
-    items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
+    items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan", order_by="OrderItem.id")
+
+# admin listing (newest first, keyset on created_at + id) and per-user history
+Index("ix_orders_created_at_id", Order.created_at, Order.id)
+Index("ix_orders_status_created_at_id", Order.status, Order.created_at, Order.id)
+Index("ix_orders_user_id_id", Order.user_id, Order.id)
 
 class OrderItem(Base):
     __tablename__ = "order_items"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    order_id: Mapped[int] = mapped_column(ForeignKey("orders.id", ondelete="CASCADE"))
+    order_id: Mapped[int] = mapped_column(ForeignKey("orders.id", ondelete="CASCADE"), index=True)
     product_id: Mapped[int] = mapped_column(ForeignKey("products.id"))
     name: Mapped[str] = mapped_column(String(200))
     price: Mapped[float] = mapped_column(Numeric(10,2))
     qty: Mapped[int] = mapped_column(Integer, default=1)
     order = relationship("Order", back_populates="items")
 
-class Admin(Base): 
-    __tablename__ = "admin_table"
-    
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    user: Mapped[list["User"]] = relationship(back_populates="admin") 
-    
-class User(Base): 
-    __tablename__ = "user_table"
-    
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    admin_id: Mapped[int] = mapped_column(ForeignKey("admin_table.id"))
-    admin: Mapped["Admin"] = relationship(back_populates="user")  
-    
+class ProductPair(Base):
+    """Orders that contained both products, stored in both directions.
+
+    Folded in from new orders by `python -m app.related`.
+    """
+    __tablename__ = "product_pairs"
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    related_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    orders: Mapped[int] = mapped_column(Integer)
+
+# a product's most frequent companions: one index range scan
+Index("ix_product_pairs_product_orders", ProductPair.product_id, ProductPair.orders.desc(), ProductPair.related_id)
+
+class JobWatermark(Base):
+    """How far an incremental batch job has got (e.g. the last order id it processed)."""
+    __tablename__ = "job_watermarks"
+    name: Mapped[str] = mapped_column(String(40), primary_key=True)
+    value: Mapped[int] = mapped_column(BigInteger)
+
+class IdempotencyKey(Base):
+    """`Idempotency-Key` of a checkout request -> the order it created."""
+    __tablename__ = "idempotency_keys"
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    key: Mapped[str] = mapped_column(String(80), primary_key=True)
+    order_id: Mapped[int] = mapped_column(ForeignKey("orders.id", ondelete="CASCADE"))
+    created_at = mapped_column(DateTime(timezone=True), server_default=func.now())
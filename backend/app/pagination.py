@@ -0,0 +1,65 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+# An ordering is a list of (expression, descending) pairs that must end with a
+# unique column (Product.id), so every row has a distinct position to seek from.
+
+
+def order_by_clauses(order: list) -> list:
+    return [col.desc() if desc else col.asc() for col, desc in order]
+
+
+def keyset_after(order: list, values: list):
+    """Rows strictly after `values` in `order` (lexicographic seek predicate)."""
+    alts = []
+    for i, ((col, desc), v) in enumerate(zip(order, values)):
+        prefix = [c == pv for (c, _), pv in zip(order[:i], values[:i])]
+        alts.append(and_(*prefix, col < v if desc else col > v))
+    # redundant bound on the leading column lets Postgres start an index range scan
+    first, first_desc = order[0]
+    bound = first <= values[0] if first_desc else first >= values[0]
+    return and_(bound, or_(*alts))
+
+
+def _plain(v):
+    if isinstance(v, Decimal):
+        return str(v)
+    if isinstance(v, datetime):
+        return v.isoformat()
+    return v
+
+
+def _typed(col, v):
+    # back to the column's Python type: asyncpg will not compare numeric with text
+    if v is None:
+        return v
+    py = col.type.python_type
+    if isinstance(v, py):
+        return v
+    if py is datetime:
+        return datetime.fromisoformat(v)
+    return py(v)
+
+
+def encode_cursor(mode: str, values) -> str:
+    raw = json.dumps([mode, *map(_plain, values)], ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, mode: str, order: list) -> list:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, binascii.Error):
+        raise HTTPException(400, "Невірний курсор")
+    if not isinstance(data, list) or len(data) != len(order) + 1 or data[0] != mode:
+        raise HTTPException(400, "Невірний курсор")
+    try:
+        return [_typed(col, v) for (col, _), v in zip(order, data[1:])]
+    except (ValueError, TypeError, InvalidOperation):
+        raise HTTPException(400, "Невірний курсор")
@@ -0,0 +1,70 @@
+"""Pre-serialized product JSON for the hot read paths.
+
+Each product is encoded once per (id, version) with orjson and the bytes are
+spliced into list bodies, skipping pydantic validation and the stdlib encoder.
+The output is byte-for-byte what FastAPI renders for ``ProductOut``
+(compact separators, non-ASCII unescaped, fields in model order).
+"""
+from typing import Iterable, Optional
+
+import orjson
+from fastapi import Response
+
+from .cache import MemoryBackend
+from .config import settings
+from .images import srcset
+from .metrics import cache_requests
+from .models import Product
+from .schemas import ProductOut
+
+_NO_SNIPPET = b'"snippet":null}'
+
+_store = MemoryBackend(settings.PRODUCT_JSON_CACHE_ENTRIES)
+
+
+class RawJSONResponse(Response):
+    """Body already encoded as JSON bytes (or str)."""
+    media_type = "application/json"
+
+
+def product_to_out(p: Product, snippet: Optional[str] = None) -> ProductOut:
+    image_url = f"/media/{p.image_path}" if p.image_path else None
+    if p.image_variants:
+        image_url = f"/media/{p.image_variants['full']['src']}"
+    return ProductOut(
+        id=p.id,
+        name=p.name,
+        slug=p.slug,
+        description=p.description or "",
+        supplier=p.supplier,
+        category=getattr(p,'category',None),
+        price=float(p.price),
+        image_url=image_url,
+        image_srcset=srcset(p.image_variants),
+        snippet=snippet,
+    )
+
+
+def cached_product_json(product_id: int, version: int) -> bytes | None:
+    raw = _store.get(f"{product_id}:{version}")
+    if raw is not None:
+        cache_requests.inc(cache="product_json", result="hit")
+    return raw
+
+
+def product_json(p: Product, snippet: Optional[str] = None) -> bytes:
+    """``ProductOut`` JSON for `p`; rows are immutable per version, so the key never goes stale."""
+    key = f"{p.id}:{p.version}"
+    raw = _store.get(key)
+    cache_requests.inc(cache="product_json", result="miss" if raw is None else "hit")
+    if raw is None:
+        raw = orjson.dumps(product_to_out(p).model_dump())
+        _store.set(key, raw, settings.PRODUCT_JSON_CACHE_TTL_SECONDS)
+    if snippet is not None:
+        # snippet is the last field and differs per query
+        raw = raw[:-len(_NO_SNIPPET)] + b'"snippet":' + orjson.dumps(snippet) + b"}"
+    return raw
+
+
+def json_list(parts: Iterable[bytes]) -> bytes:
+    return b"[" + b",".join(parts) + b"]"
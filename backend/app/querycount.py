@@ -0,0 +1,79 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0  # time spent in the statements
+        self.statements: list[str] = []
+
+    def add(self, statement: str):
+        self.count += 1
+        self.statements.append(statement)
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+_process_wide: list[QueryStats] = []
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    context._zg_started = time.perf_counter()
+    stats = _current.get()
+    if stats is not None:
+        stats.add(statement)
+    for stats in _process_wide:
+        stats.add(statement)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _time_statement(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - context._zg_started
+    stats = _current.get()
+    if stats is not None:
+        stats.seconds += seconds
+    for stats in _process_wide:
+        stats.seconds += seconds
+
+
+@contextmanager
+def count_queries():
+    """Count SQL statements executed in this context (and tasks/threads spawned from it)."""
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def count_all_queries():
+    """Count every SQL statement in the process, e.g. around a TestClient call,
+    which runs the app in a thread that does not inherit our context."""
+    stats = QueryStats()
+    _process_wide.append(stats)
+    try:
+        yield stats
+    finally:
+        _process_wide.remove(stats)
+
+
+@contextmanager
+def query_budget(max_queries: int):
+    """Fail if the wrapped block runs more than `max_queries` statements.
+
+    with query_budget(3):
+        client.get("/api/cart", headers=auth)
+    """
+    with count_all_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        raise AssertionError(
+            f"{stats.count} queries executed, budget is {max_queries}:\n" + "\n---\n".join(stats.statements)
+        )
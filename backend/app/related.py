@@ -0,0 +1,101 @@
+""""Frequently bought together" from order history.
+
+`python -m app.related` (cron, e.g. every few minutes) folds orders placed since
+its last run into product_pairs: one self-join of order_items over the new
+orders only, added to the stored counts. Progress is the last order id in
+job_watermarks, committed with each batch. Orders younger than SETTLE_SECONDS
+wait for the next run, so a checkout still in flight is not skipped. Each batch
+also takes a catalog version (products_next_version), so related lists cached
+and ETagged under the catalog version are not served stale.
+
+`/api/products/{slug}/related` reads the best pairs of a product with one index
+range scan and tops the list up with same-category, then same-supplier products
+(new products and products nobody has ordered together yet).
+"""
+import argparse
+import time
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .db import engine
+from .models import Product, ProductPair
+
+WATERMARK = "related_orders"
+LOCK_KEY = 0x7A67726C  # pg_try_advisory_lock id: one job at a time
+BATCH_ORDERS = 5000
+SETTLE_SECONDS = 60
+
+PAIRS_SQL = text("""
+    INSERT INTO product_pairs (product_id, related_id, orders)
+    SELECT a.product_id, b.product_id, count(DISTINCT a.order_id)
+    FROM order_items a
+    JOIN order_items b ON b.order_id = a.order_id AND b.product_id <> a.product_id
+    WHERE a.order_id > :after AND a.order_id <= :upto
+    GROUP BY 1, 2
+    ON CONFLICT (product_id, related_id) DO UPDATE SET orders = product_pairs.orders + excluded.orders
+""")
+
+NEXT_VERSION_SQL = text("SELECT products_next_version()")
+
+
+def run(full: bool = False, batch: int = BATCH_ORDERS) -> None:
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        if not conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": LOCK_KEY}).scalar():
+            print("Another run is in progress")
+            return
+        conn.commit()
+        try:
+            with conn.begin():
+                if full:
+                    conn.execute(text("TRUNCATE product_pairs"))
+                    conn.execute(text("DELETE FROM job_watermarks WHERE name = :n"), {"n": WATERMARK})
+                    conn.execute(NEXT_VERSION_SQL)
+                after = conn.execute(text("SELECT value FROM job_watermarks WHERE name = :n"),
+                                     {"n": WATERMARK}).scalar() or 0
+                last = conn.execute(text(
+                    "SELECT max(id) FROM orders WHERE id > :after AND created_at < now() - make_interval(secs => :s)"
+                ), {"after": after, "s": SETTLE_SECONDS}).scalar() or after
+            first, pairs = after, 0
+            while after < last:
+                upto = min(after + batch, last)
+                with conn.begin():
+                    pairs += conn.execute(PAIRS_SQL, {"after": after, "upto": upto}).rowcount
+                    conn.execute(NEXT_VERSION_SQL)
+                    conn.execute(text("""
+                        INSERT INTO job_watermarks (name, value) VALUES (:n, :v)
+                        ON CONFLICT (name) DO UPDATE SET value = excluded.value
+                    """), {"n": WATERMARK, "v": upto})
+                after = upto
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": LOCK_KEY})
+            conn.commit()
+    print(f"Related products: orders {first + 1}..{last}, {pairs} pair upserts, "
+          f"{time.perf_counter() - started:.1f}s" if last > first else "Related products: no new orders")
+
+
+async def related(db: AsyncSession, p: Product, limit: int) -> list[Product]:
+    out = list(await db.scalars(
+        select(Product).join(ProductPair, ProductPair.related_id == Product.id)
+        .where(ProductPair.product_id == p.id)
+        .order_by(ProductPair.orders.desc(), ProductPair.related_id).limit(limit)
+    ))
+    for column in (Product.category, Product.supplier):
+        value = getattr(p, column.key)
+        if len(out) >= limit or not value:
+            continue
+        seen = [p.id, *(r.id for r in out)]
+        out += await db.scalars(
+            select(Product).where(column == value, Product.id.notin_(seen))
+            .order_by(Product.id.desc()).limit(limit - len(out))
+        )
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fold new orders into the related-products index")
+    parser.add_argument("--full", action="store_true", help="Forget the index and rebuild it from all orders")
+    parser.add_argument("--batch", type=int, default=BATCH_ORDERS, help="Orders per transaction")
+    args = parser.parse_args()
+    run(full=args.full, batch=args.batch)
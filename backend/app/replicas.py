@@ -0,0 +1,155 @@
+import asyncio
+import itertools
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import Depends
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, OperationalError, InterfaceError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from .config import settings
+from .db import AsyncPool, AsyncSessionLocal, async_url
+from .cache import make_backend
+from .http_cache import catalog_watermark
+from .auth import get_current_user_async, Principal
+
+log = logging.getLogger(__name__)
+
+# 0 when caught up (or not a standby at all), else seconds behind the primary
+LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+REPLAYED_SQL = text("SELECT NOT pg_is_in_recovery() OR pg_last_wal_replay_lsn() >= CAST(CAST(:lsn AS text) AS pg_lsn)")
+
+
+def lsn_int(lsn: str) -> int:
+    high, low = lsn.split("/")
+    return int(high, 16) << 32 | int(low, 16)
+
+
+async def replayed(db, lsn: str) -> bool:
+    """Whether `db` (session or connection; the primary always) has the primary's WAL up to `lsn`.
+    Snapshots of later statements include everything committed before it."""
+    return await db.scalar(REPLAYED_SQL, {"lsn": lsn})
+
+
+class Replica:
+    def __init__(self, url: str, label: str):
+        self.label = label
+        self.engine = create_async_engine(
+            async_url(url),
+            poolclass=type(f"{label.title()}Pool", (AsyncPool,), {"label": label}),
+            pool_size=settings.DB_REPLICA_POOL_SIZE,
+            max_overflow=settings.DB_REPLICA_MAX_OVERFLOW,
+            pool_pre_ping=True,
+        )
+        self.sessions = async_sessionmaker(bind=self.engine, autoflush=False, expire_on_commit=False)
+        self.healthy = True
+        self.lag: float | None = None
+        self.replayed_to = 0  # WAL position the replica is known to have replayed
+
+    def set_healthy(self, healthy: bool, reason: str = ""):
+        if healthy != self.healthy:
+            log.warning("replica %s %s %s", self.label, "back" if healthy else "down:", reason)
+        self.healthy = healthy
+        if not healthy:
+            self.replayed_to = 0  # may come back as a different (rebuilt) standby
+
+    async def check(self):
+        try:
+            async with asyncio.timeout(2):
+                async with self.engine.connect() as conn:
+                    self.lag = float(await conn.scalar(LAG_SQL))
+        except (TimeoutError, DBAPIError, OSError) as e:
+            self.lag = None
+            self.set_healthy(False, type(e).__name__)
+            return
+        self.set_healthy(self.lag <= settings.REPLICA_MAX_LAG_SECONDS, f"lag {self.lag:.1f}s")
+
+    async def replayed(self, lsn: str) -> bool:
+        # replay only moves forward, so most checks need no query
+        position = lsn_int(lsn)
+        if position <= self.replayed_to:
+            return True
+        async with self.engine.connect() as conn:
+            if not await replayed(conn, lsn):
+                return False
+        self.replayed_to = max(self.replayed_to, position)
+        return True
+
+
+class ReadRouter:
+    """Read-only sessions on a healthy replica, else on the primary.
+
+    A user who wrote within READ_YOUR_WRITES_SECONDS reads from the primary so
+    they see their own write; catalog reads go by WAL position instead.
+    Markers live in the CACHE_URL store, so use Redis with several workers.
+    """
+
+    def __init__(self, urls: list[str], window: int):
+        self.replicas = [Replica(url, f"replica{i}") for i, url in enumerate(urls)]
+        self.window = window
+        self._turn = itertools.count()
+        self._writes = make_backend(settings.CACHE_URL, settings.AUTH_CACHE_MAX_ENTRIES)
+
+    def mark_write(self, scope: str) -> None:
+        if self.replicas and self.window > 0:
+            self._writes.set(f"rw:{scope}", 1, self.window)
+
+    async def pick(self, scope: str) -> Replica | None:
+        healthy = [r for r in self.replicas if r.healthy]
+        if not healthy or await self._writes.aget(f"rw:{scope}") is not None:
+            return None
+        return healthy[next(self._turn) % len(healthy)]
+
+    @asynccontextmanager
+    async def session(self, scope: str, lsn: str | None = None):
+        """`lsn`: only a replica that has replayed the primary's WAL up to there (checked
+        before the session's first query, so its snapshot includes everything before)."""
+        replica = await self.pick(scope)
+        if replica is not None and lsn is not None and not await replica.replayed(lsn):
+            replica = None
+        if replica is None:
+            async with AsyncSessionLocal() as db:
+                yield db
+            return
+        try:
+            async with replica.sessions() as db:
+                yield db
+        except DBAPIError as e:
+            # lost connection etc.: later requests go to the primary until the next check passes
+            if e.connection_invalidated or isinstance(e, (OperationalError, InterfaceError)):
+                replica.set_healthy(False, type(e.orig).__name__)
+            raise
+
+    async def monitor(self):
+        while True:
+            await asyncio.gather(*(r.check() for r in self.replicas))
+            await asyncio.sleep(settings.REPLICA_CHECK_SECONDS)
+
+    async def dispose(self):
+        for r in self.replicas:
+            await r.engine.dispose()
+
+
+read_router = ReadRouter(
+    [u.strip() for u in settings.DATABASE_REPLICA_URLS.split(",") if u.strip()],
+    settings.READ_YOUR_WRITES_SECONDS,
+)
+
+
+async def get_catalog_db(watermark: tuple[int, str | None] = Depends(catalog_watermark)):
+    # only a replica that has everything up to the catalog version the response is cached and
+    # ETagged under, wherever the change came from
+    async with read_router.session("catalog", watermark[1]) as db:
+        yield db
+
+
+async def get_user_read_db(user: Principal = Depends(get_current_user_async)):
+    async with read_router.session(f"user:{user.id}") as db:
+        yield db
@@ -1,5 +1,8 @@
+from datetime import datetime
+from decimal import Decimal
+
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from typing import Optional, List, Literal
 
 class RegisterIn(BaseModel):
     nickname: str = Field(min_length=3, max_length=40)
@@ -28,6 +31,8 @@ class ProductOut(BaseModel):
     category: Optional[str] = None
     price: float
     image_url: Optional[str] = None
+    image_srcset: Optional[str] = None  # WebP width variants, "<url> 160w, <url> 480w, ..."
+    snippet: Optional[str] = None  # highlighted description fragment, only for `q` searches
 
 
 class ProductCreate(BaseModel):
@@ -38,6 +43,15 @@ class ProductCreate(BaseModel):
     category: Optional[str] = None
     price: float
 
+class ProductBulkRow(BaseModel):
+    """A row of /api/admin/products/bulk, keyed by slug; fields left out keep their value."""
+    slug: str = Field(min_length=1, max_length=220)
+    name: Optional[str] = Field(None, min_length=1, max_length=200)
+    description: Optional[str] = None
+    supplier: Optional[str] = Field(None, max_length=120)
+    category: Optional[str] = Field(None, max_length=80)
+    price: Optional[Decimal] = Field(None, ge=0, max_digits=10, decimal_places=2)
+
 class CheckoutIn(BaseModel):
     payment_method: str = Field(default="cod")  # cod | card
     delivery_method: str = Field(default="nova_poshta")  # nova_poshta | ukrposhta | courier
@@ -51,6 +65,23 @@ class CartItemOut(BaseModel):
     qty: int
 
 
+class CartLineIn(BaseModel):
+    product_id: int
+    qty: int
+
+
+class CartBatchIn(BaseModel):
+    # set: qty as given (0 removes), add: qty added to what is there (guest cart merge),
+    # replace: cart becomes exactly `items`
+    items: List[CartLineIn] = Field(max_length=500)
+    mode: Literal["set", "add", "replace"] = "set"
+
+
+class FavoritesBatchIn(BaseModel):
+    add: List[int] = Field(default=[], max_length=500)
+    remove: List[int] = Field(default=[], max_length=500)
+
+
 class OrderItemOut(BaseModel):
     name: str
     price: float
@@ -67,4 +98,5 @@ class OrderOut(BaseModel):
     city: Optional[str] = None
     address: Optional[str] = None
     comment: Optional[str] = None
+    created_at: Optional[datetime] = None
     items: List[OrderItemOut]
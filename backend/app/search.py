@@ -0,0 +1,43 @@
+from typing import NamedTuple
+
+from sqlalchemy import Float, func, literal, or_, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Product
+
+_features: dict | None = None
+
+
+async def features(db: AsyncSession) -> dict:
+    """Which search objects `app.migrate` managed to create (checked once per process)."""
+    global _features
+    if _features is None:
+        row = (await db.execute(text("""
+            SELECT to_regprocedure('products_search_query(text)') IS NOT NULL,
+                   EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')
+        """))).one()
+        _features = {"fulltext": bool(row[0]), "trigram": bool(row[1])}
+    return _features
+
+
+class SearchClause(NamedTuple):
+    where: object
+    rank: object | None
+    snippet: object | None
+
+
+def search_clause(f: dict, q: str) -> SearchClause:
+    if not f["fulltext"]:
+        like = f"%{q}%"
+        return SearchClause(or_(Product.name.ilike(like), Product.description.ilike(like)), None, None)
+
+    tsq = func.products_search_query(q)
+    where = Product.search_vector.op("@@")(tsq)
+    rank = func.ts_rank_cd(Product.search_vector, tsq)
+    if f["trigram"]:
+        # `q <% name` is served by ix_products_name_trgm and tolerates typos
+        where = or_(where, literal(q).op("<%")(Product.name))
+        rank = rank + func.word_similarity(q, Product.name)
+    snippet = func.products_search_headline(Product.description, q)
+    # double precision so the value round-trips exactly through a keyset cursor
+    return SearchClause(where, rank.cast(Float), snippet)
@@ -1,13 +1,17 @@
 import json
 import argparse
+import itertools
 import re
+import time
 from pathlib import Path
+from typing import Iterator
 
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import insert, select, literal_column, case
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
-from .db import SessionLocal
+from .db import engine
 from .models import Product
+from .categories import default_rules
 
 
 def slugify(text: str) -> str:
@@ -29,71 +33,149 @@ def parse_price(raw_price) -> float:
 
 
 def infer_category(name: str) -> str:
-    n = name.lower()
-    if "насіння" in n or "семена" in n:
-        return "Насіння"
-    if "добрив" in n or "добриво" in n or "fert" in n:
-        return "Добрива"
-    if "фунгіцид" in n or "фунгицид" in n or "інсектицид" in n or "гербіцид" in n:
-        return "ЗЗР"
-    if "грунт" in n or "ґрунт" in n or "субстрат" in n:
-        return "Ґрунти/Субстрати"
-    if "горщик" in n or "кашпо" in n or "лоток" in n:
-        return "Інвентар"
-    return "Інше"
-
-def run_seed(file_path: str):
+    return default_rules().categorize(name)
+
+
+def _iter_json_array(f, chunk_size: int = 1 << 16) -> Iterator[dict]:
+    # `f` is positioned right after the opening "["
+    decoder = json.JSONDecoder()
+    buf, eof = "", False
+    while True:
+        buf = buf.lstrip()
+        if buf.startswith(","):
+            buf = buf[1:].lstrip()
+        if buf.startswith("]"):
+            return
+        try:
+            obj, end = decoder.raw_decode(buf)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buf += chunk
+            continue
+        yield obj
+        buf = buf[end:]
+
+
+def iter_records(path: Path) -> Iterator[dict]:
+    """Stream items from a JSON array or an NDJSON file without loading it whole."""
+    with open(path, "r", encoding="utf-8") as f:
+        head = f.read(1)
+        while head.isspace():
+            head = f.read(1)
+        if head == "[":
+            yield from _iter_json_array(f)
+            return
+        for line in itertools.chain([head + f.readline()], f):
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+class SlugAllocator:
+    """Unique slugs decided in memory: base, base-2, base-3, ... skipping `taken`."""
+
+    def __init__(self, taken: set[str]):
+        self.taken = taken
+        self.next_suffix: dict[str, int] = {}
+
+    def allocate(self, base: str) -> str:
+        slug = base
+        counter = self.next_suffix.get(base, 2)
+        while slug in self.taken:
+            slug = f"{base}-{counter}"
+            counter += 1
+        self.next_suffix[base] = counter
+        self.taken.add(slug)
+        return slug
+
+
+def to_row(item: dict, slugs: SlugAllocator) -> dict | None:
+    name = (item.get("name") or "").strip()
+    if not name:
+        return None
+    return {
+        "name": name,
+        "slug": slugs.allocate(slugify(name)),
+        "description": (item.get("description") or "").strip(),
+        "supplier": (item.get("supplier") or "").strip() if item.get("supplier") else None,
+        "price": parse_price(item.get("price")),
+        "category": infer_category(name),
+        "image_path": item.get("image"),
+        "seeded": True,
+    }
+
+
+def run_seed(file_path: str, batch_size: int = 1000, upsert: bool = False):
     path = Path(file_path)
     if not path.exists():
         raise FileNotFoundError(f"Seed file not found: {file_path}")
 
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    db: Session = SessionLocal()
-    inserted = 0
-
-    for item in data:
-        name = (item.get("name") or "").strip()
-        if not name:
-            continue
-
-        base_slug = slugify(name)
-        slug = base_slug
-        counter = 2
-
-        while True:
-            p = Product(
-                name=name,
-                slug=slug,
-                description=(item.get("description") or "").strip(),
-                supplier=(item.get("supplier") or "").strip() if item.get("supplier") else None,
-                price=parse_price(item.get("price")),
-                category=infer_category(name),
-                image_path=item.get("image"),
-            )
-            try:
-                db.add(p)
-                db.flush()  # ensures unique checks within same batch
-                inserted += 1
-                break
-            except IntegrityError:
-                db.rollback()
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-
-    db.commit()
-    db.close()
-
-    print(f"Inserted {inserted} products")
-    print("Done")
+    products = Product.__table__
+    if upsert:
+        # slugs are re-derived the same way on every import, so they identify rows; a slug
+        # taken by a product the seed did not insert (admin, bulk import) is left alone, and
+        # a photo uploaded or backfilled since (image_variants) is kept
+        taken: set[str] = set()
+        stmt = pg_insert(products)
+        image_path = case((products.c.image_variants.is_(None), stmt.excluded.image_path), else_=products.c.image_path)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[products.c.slug],
+            set_={**{c: stmt.excluded[c] for c in ("name", "description", "supplier", "price", "category")},
+                  "image_path": image_path},
+            where=products.c.seeded,
+        ).returning(products.c.slug, literal_column("xmax = 0"))
+    else:
+        with engine.connect() as conn:
+            taken = set(conn.scalars(select(products.c.slug)))
+        stmt = insert(products)
+
+    slugs = SlugAllocator(taken)
+    inserted = updated = skipped = 0
+    collisions: list[str] = []
+    started = time.perf_counter()
+
+    records = iter_records(path)
+    while True:
+        batch = []
+        for item in itertools.islice(records, batch_size):
+            row = to_row(item, slugs)
+            if row is None:
+                skipped += 1
+            else:
+                batch.append(row)
+        if not batch:
+            break
+        with engine.begin() as conn:
+            if upsert:
+                written = dict(conn.execute(stmt, batch).all())
+                inserted += sum(1 for f in written.values() if f)
+                updated += sum(1 for f in written.values() if not f)
+                collisions += [row["slug"] for row in batch if row["slug"] not in written]
+            else:
+                conn.execute(stmt, batch)
+                inserted += len(batch)
+        elapsed = time.perf_counter() - started
+        print(f"  {inserted + updated} rows, {(inserted + updated) / elapsed:.0f} rows/s")
+
+    elapsed = time.perf_counter() - started
+    total = inserted + updated
+    print(f"Inserted {inserted} products, updated {updated}, skipped {skipped}")
+    if collisions:
+        print(f"Left {len(collisions)} products not inserted by the seed (same slug): {', '.join(collisions[:20])}"
+              + (" ..." if len(collisions) > 20 else ""))
+    print(f"Done in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} rows/s)")
 
 
 def main():
     parser = argparse.ArgumentParser(description="Seed products into database")
-    parser.add_argument("--file", required=True, help="Path to products seed JSON file")
+    parser.add_argument("--file", required=True, help="Path to products seed file (JSON array or NDJSON)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per INSERT batch / transaction")
+    parser.add_argument("--upsert", action="store_true", help="Update existing products matched by slug instead of adding copies")
     args = parser.parse_args()
-    run_seed(args.file)
+    run_seed(args.file, batch_size=args.batch_size, upsert=args.upsert)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,280 @@
+"""In-process columnar copy of the catalog for `/api/products` listings without `q`.
+
+Columns are NumPy arrays indexed by row (price as float64, category/supplier as
+dictionary codes, -1 for NULL); each sort mode has a permutation of the live
+rows in exactly the SQL order (ties by id DESC), so a listing is a vectorized
+mask, a gather and a slice. Name order comes from Postgres (its collation),
+everything else is ordered here.
+
+Refreshing is incremental and driven by `products.version`: rows with a newer
+version are patched in place and re-inserted into the permutations, deletions
+are found by comparing the row count. The next refresh starts from the version
+watermark read before this one (db.version_watermark), not from the largest
+version seen: a transaction that took its versions earlier can commit later.
+It runs when the catalog version changes (admin mutations, seed) or every
+CATALOG_SNAPSHOT_REFRESH_SECONDS.
+
+Needs numpy; enable with CATALOG_SNAPSHOT=true.
+"""
+import asyncio
+import logging
+import time
+from decimal import Decimal
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .db import AsyncSessionLocal, version_watermark
+from .models import Product
+from .pagination import encode_cursor, decode_cursor
+from .payloads import product_json, cached_product_json, json_list
+from .replicas import replayed
+
+log = logging.getLogger(__name__)
+
+# sort mode -> ORDER BY of the SQL path (for cursors)
+ORDERS = {
+    "new": [(Product.id, True)],
+    "price_asc": [(Product.price, False), (Product.id, True)],
+    "price_desc": [(Product.price, True), (Product.id, True)],
+    "name_asc": [(Product.name, False), (Product.id, True)],
+}
+COLUMNS = (Product.id, Product.price, Product.category, Product.supplier, Product.name, Product.version)
+FULL_REBUILD_ROWS = 500  # bigger change sets (imports) reload everything
+
+
+class CatalogSnapshot:
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.ready = False
+        self.catalog_version = None
+        self.refreshed_at = 0.0
+        self._lock = asyncio.Lock()
+        if enabled:
+            try:
+                import numpy
+            except ImportError as e:
+                raise RuntimeError("CATALOG_SNAPSHOT=true потребує пакет `numpy`") from e
+            self.np = numpy
+
+    # ---------- building ----------
+    def _codes(self, values: list, dictionary: dict) -> list[int]:
+        return [-1 if v is None else dictionary.setdefault(v, len(dictionary)) for v in values]
+
+    def _load(self, rows: list) -> None:
+        """Rows in name order (name ASC, id DESC)."""
+        np = self.np
+        n = len(rows)
+        ids, prices, categories, suppliers, names, versions = zip(*rows) if rows else ((),) * 6
+        self.categories, self.suppliers = {}, {}
+        self.ids = np.array(ids, dtype=np.int64)
+        self.price = np.array([float(p) for p in prices], dtype=np.float64)
+        self.category = np.array(self._codes(categories, self.categories), dtype=np.int32)
+        self.supplier = np.array(self._codes(suppliers, self.suppliers), dtype=np.int32)
+        self.version = np.array(versions, dtype=np.int64)
+        self.names = list(names)
+        self.alive = np.ones(n, dtype=bool)
+        self.row_of = np.full(int(self.ids.max()) + 1 if n else 0, -1, dtype=np.int64)
+        self.row_of[self.ids] = np.arange(n)
+        self.live = n
+        self.perms = {"name_asc": np.arange(n, dtype=np.int64)}
+        self._sort_local(("new", "price_asc", "price_desc"))
+
+    def _sort_local(self, modes) -> None:
+        np = self.np
+        rows = np.flatnonzero(self.alive)
+        neg_id = -self.ids[rows]
+        keys = {"new": (neg_id,), "price_asc": (neg_id, self.price[rows]), "price_desc": (neg_id, -self.price[rows])}
+        for mode in modes:
+            self.perms[mode] = rows[np.lexsort(keys[mode])]
+        self._ranks()
+
+    def _ranks(self) -> None:
+        # rank[mode][row] = position of row in the mode's permutation (cursor seeks)
+        np = self.np
+        self.ranks = {}
+        for mode, perm in self.perms.items():
+            rank = np.full(len(self.ids), -1, dtype=np.int64)
+            rank[perm] = np.arange(len(perm))
+            self.ranks[mode] = rank
+
+    def _insert_sorted(self, mode: str, row: int) -> None:
+        np = self.np
+        perm = self.perms[mode]
+        neg_id = -self.ids[row]
+        lo, hi = 0, len(perm)
+        if mode != "new":
+            key = self.price[perm] if mode == "price_asc" else -self.price[perm]
+            value = self.price[row] if mode == "price_asc" else -self.price[row]
+            lo, hi = np.searchsorted(key, value, "left"), np.searchsorted(key, value, "right")
+        pos = lo + np.searchsorted(-self.ids[perm[lo:hi]], neg_id)
+        self.perms[mode] = np.insert(perm, pos, row)
+
+    def _known(self, id_: int) -> bool:
+        return id_ < len(self.row_of) and self.row_of[id_] >= 0
+
+    def _rows(self, ids):
+        """Live rows of `ids`, in the given order (ids unknown to the snapshot are skipped)."""
+        np = self.np
+        ids = np.array(ids, dtype=np.int64)
+        rows = self.row_of[ids[ids < len(self.row_of)]]
+        rows = rows[rows >= 0]
+        return rows[self.alive[rows]]
+
+    def _patch(self, rows: list) -> None:
+        np = self.np
+        changed = []
+        for id_, price, category, supplier, name, version in rows:
+            if id_ >= len(self.row_of):
+                self.row_of = np.concatenate([self.row_of, np.full(id_ + 1 - len(self.row_of), -1, dtype=np.int64)])
+            row = int(self.row_of[id_])
+            if row < 0:
+                row = len(self.ids)
+                self.row_of[id_] = row
+                self.ids = np.append(self.ids, id_)
+                self.price = np.append(self.price, 0.0)
+                self.category = np.append(self.category, np.int32(-1))
+                self.supplier = np.append(self.supplier, np.int32(-1))
+                self.version = np.append(self.version, 0)
+                self.alive = np.append(self.alive, False)
+                self.names.append(name)
+            self.names[row] = name
+            self.price[row] = float(price)
+            self.category[row] = self._codes([category], self.categories)[0]
+            self.supplier[row] = self._codes([supplier], self.suppliers)[0]
+            self.version[row] = version
+            if not self.alive[row]:
+                self.alive[row] = True
+                self.live += 1
+            changed.append(row)
+
+        moved = np.array(changed, dtype=np.int64)
+        for mode in ("new", "price_asc", "price_desc"):
+            perm = self.perms[mode]
+            self.perms[mode] = perm[~np.isin(perm, moved)]
+            for row in changed:
+                self._insert_sorted(mode, row)
+
+    def _drop(self, live_ids) -> None:
+        keep = self.np.zeros(len(self.ids), dtype=bool)
+        keep[self._rows(live_ids)] = True
+        self.alive &= keep
+        self.live = int(self.alive.sum())
+        for mode, perm in self.perms.items():
+            self.perms[mode] = perm[self.alive[perm]]
+
+    async def refresh(self, db: AsyncSession, catalog_version: int) -> None:
+        watermark, lsn = await version_watermark()
+        if not await replayed(db, lsn):  # a replica behind the watermark
+            async with AsyncSessionLocal() as primary:
+                return await self._refresh(primary, catalog_version, watermark)
+        await self._refresh(db, catalog_version, watermark)
+
+    async def _refresh(self, db: AsyncSession, catalog_version: int, watermark: int) -> None:
+        started = time.perf_counter()
+        everything = select(*COLUMNS).order_by(Product.name, Product.id.desc())
+        rows = None
+        if self.ready:
+            rows = (await db.execute(select(*COLUMNS).where(Product.version > self.max_version))).all()
+        if rows is None or len(rows) > FULL_REBUILD_ROWS:
+            self._load((await db.execute(everything)).all())
+        else:
+            fresh = sum(not self._known(r[0]) for r in rows)
+            live_ids = name_ids = None
+            if await db.scalar(select(func.count()).select_from(Product)) != self.live + fresh:
+                live_ids = (await db.scalars(select(Product.id))).all()
+            if fresh or any(self.names[self.row_of[r[0]]] != r[4] for r in rows):
+                # index-only scan of ix_products_name_id; keeps the database's collation
+                name_ids = (await db.scalars(select(Product.id).order_by(Product.name, Product.id.desc()))).all()
+            # no awaits from here on: requests never see a half-applied refresh
+            self._patch(rows)
+            if live_ids is not None:
+                self._drop(live_ids)
+            if name_ids is not None:
+                self.perms["name_asc"] = self._rows(name_ids)
+            self._ranks()
+        self.max_version = watermark  # rows above it are read again next time
+        self.ready = True
+        self.catalog_version = catalog_version
+        self.refreshed_at = time.monotonic()
+        log.info("catalog snapshot: %d products, %.1f ms", self.live, (time.perf_counter() - started) * 1000)
+
+    def _stale(self, catalog_version: int) -> bool:
+        return (not self.ready or catalog_version != self.catalog_version
+                or time.monotonic() - self.refreshed_at > settings.CATALOG_SNAPSHOT_REFRESH_SECONDS)
+
+    async def ensure_fresh(self, db: AsyncSession, catalog_version: int) -> None:
+        if self._stale(catalog_version):
+            async with self._lock:
+                if self._stale(catalog_version):
+                    await self.refresh(db, catalog_version)
+
+    # ---------- querying ----------
+    def select(self, mode: str, category, supplier, min_price, max_price):
+        """Positions (in the mode's permutation) of the matching rows, in order."""
+        np = self.np
+        perm = self.perms[mode]
+        mask = None
+        for column, dictionary, value in ((self.category, self.categories, category),
+                                          (self.supplier, self.suppliers, supplier)):
+            if value:
+                code = dictionary.get(value)
+                if code is None:
+                    return np.empty(0, dtype=np.int64)
+                m = column[perm] == code
+                mask = m if mask is None else mask & m
+        if min_price is not None or max_price is not None:
+            prices = self.price[perm]
+            if min_price is not None:
+                m = prices >= min_price
+                mask = m if mask is None else mask & m
+            if max_price is not None:
+                m = prices <= max_price
+                mask = m if mask is None else mask & m
+        return np.arange(len(perm)) if mask is None else np.flatnonzero(mask)
+
+    def _cursor_values(self, mode: str, row: int) -> list:
+        values = [int(self.ids[row])]
+        if mode in ("price_asc", "price_desc"):
+            values.insert(0, Decimal(f"{self.price[row]:.2f}"))
+        elif mode == "name_asc":
+            values.insert(0, self.names[row])
+        return values
+
+    def _seek(self, mode: str, cursor: str):
+        """Permutation position after the cursor row, None if that row moved or is gone."""
+        values = decode_cursor(cursor, mode, ORDERS[mode])
+        id_ = values[-1]
+        row = int(self.row_of[id_]) if 0 <= id_ < len(self.row_of) else -1
+        if row < 0 or not self.alive[row] or self._cursor_values(mode, row) != values:
+            return None
+        return int(self.ranks[mode][row]) + 1
+
+    async def page(self, db: AsyncSession, catalog_version: int, category, supplier,
+                   min_price, max_price, sort: str, skip: int, limit: int, cursor) -> dict | None:
+        """`list_products` result without `q`, or None to use the SQL path."""
+        await self.ensure_fresh(db, catalog_version)
+        mode = sort if sort in ORDERS else "new"
+        positions = self.select(mode, category, supplier, min_price, max_price)
+        start = 0
+        if cursor:
+            start = self._seek(mode, cursor)
+            if start is None:
+                return None
+            start = int(self.np.searchsorted(positions, start))
+        rows = self.perms[mode][positions[start + skip:start + skip + limit + 1]]
+        next_cursor = encode_cursor(mode, self._cursor_values(mode, int(rows[limit - 1]))) if len(rows) > limit else None
+        rows = rows[:limit]
+
+        parts = [cached_product_json(int(self.ids[r]), int(self.version[r])) for r in rows]
+        missing = [int(self.ids[r]) for r, raw in zip(rows, parts) if raw is None]
+        if missing:
+            fetched = {p.id: product_json(p) for p in await db.scalars(select(Product).where(Product.id.in_(missing)))}
+            if len(fetched) < len(missing):
+                return None  # deleted since the last refresh
+            parts = [raw if raw is not None else fetched[int(self.ids[r])] for r, raw in zip(rows, parts)]
+        return {"body": json_list(parts).decode(), "next_cursor": next_cursor}
+
+
+catalog_snapshot = CatalogSnapshot(settings.CATALOG_SNAPSHOT)
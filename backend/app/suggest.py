@@ -0,0 +1,225 @@
+"""Search-as-you-type suggestions from an in-process prefix index.
+
+Product names, categories and suppliers are split into normalized words (case,
+Ukrainian/Russian letter variants and apostrophes folded) kept in one sorted
+list per kind, so a prefix is a bisect range. Every query word must be a
+prefix of some word of a match; matches rank by popularity (order lines of the
+product, summed over a category or supplier). One- and two-letter prefixes,
+the widest ranges, are memoized until a word under them changes.
+
+Like the catalog snapshot the index follows `products.version`: rows changed
+since the version watermark of the last refresh are re-indexed when the
+catalog version moves, and
+everything, popularity included, is rebuilt every SUGGEST_REBUILD_SECONDS.
+Only the SUGGEST_MAX_PRODUCTS most ordered products are indexed.
+"""
+import asyncio
+import bisect
+import heapq
+import logging
+import re
+import time
+
+import anyio.to_thread
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .db import AsyncSessionLocal, version_watermark
+from .models import Product, OrderItem
+from .replicas import replayed
+
+log = logging.getLogger(__name__)
+
+MAX_LIMIT = 20  # products per response
+GROUP_LIMIT = 3  # categories / suppliers per response
+MEMO_PREFIX = 2
+FULL_REBUILD_ROWS = 500
+
+# і/ї/и/ы (and a Latin i typed for і), є/е/э/ё, ґ/г, ъ/ь meet on one letter; apostrophes go
+_FOLD = str.maketrans({"ї": "и", "і": "и", "ы": "и", "i": "и", "є": "е", "э": "е", "ё": "е", "ґ": "г", "ъ": "ь",
+                       **dict.fromkeys("'`’‘ʼʹ")})
+_WORD = re.compile(r"\w+")
+
+
+def normalize(text: str | None) -> list[str]:
+    if not text:
+        return []
+    return _WORD.findall(text.casefold().translate(_FOLD))
+
+
+class PrefixIndex:
+    """Words -> keys. A key's entry is (rank, words, payload) with rank = (-score, label, key);
+    each word's posting list is kept sorted by rank, so the best matches of a prefix
+    are the head of a merge of its words' lists."""
+
+    def __init__(self, limit: int, items=()):
+        self.limit = limit
+        self.entries: dict = {}
+        self.postings: dict[str, list] = {}
+        self.memo: dict[str, list] = {}
+        for key, label, score, payload in items:
+            entry = self.entries[key] = self._entry(key, label, score, payload)
+            for w in entry[1]:
+                self.postings.setdefault(w, []).append(entry[0])
+        for ranks in self.postings.values():
+            ranks.sort()
+        self.words = sorted(self.postings)
+
+    @staticmethod
+    def _entry(key, label: str, score: int, payload) -> tuple:
+        return (-score, label, key), tuple(dict.fromkeys(normalize(label))), payload
+
+    def add(self, key, label: str, score: int, payload) -> None:
+        self.remove(key)
+        entry = self.entries[key] = self._entry(key, label, score, payload)
+        for w in entry[1]:
+            ranks = self.postings.get(w)
+            if ranks is None:
+                ranks = self.postings[w] = []
+                bisect.insort(self.words, w)
+            bisect.insort(ranks, entry[0])
+        self._forget(entry[1])
+
+    def remove(self, key) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for w in entry[1]:
+            ranks = self.postings[w]
+            del ranks[bisect.bisect_left(ranks, entry[0])]
+            if not ranks:
+                del self.postings[w]
+                del self.words[bisect.bisect_left(self.words, w)]
+        self._forget(entry[1])
+
+    def _forget(self, words) -> None:
+        for w in words:
+            for n in range(1, MEMO_PREFIX + 1):
+                self.memo.pop(w[:n], None)
+
+    def _range(self, prefix: str) -> list[str]:
+        lo = bisect.bisect_left(self.words, prefix)
+        return self.words[lo:bisect.bisect_left(self.words, prefix + "\U0010ffff", lo)]
+
+    def search(self, words: list[str]) -> list:
+        """Payloads of the best `limit` keys matching every word as a prefix."""
+        if not words:
+            return []
+        memo = words[0] if len(words) == 1 and len(words[0]) <= MEMO_PREFIX else None
+        if memo in self.memo:
+            return self.memo[memo]
+        # walk the query word with the fewest candidates, check the others per key
+        ranges = [self._range(w) for w in words]
+        probe = min(ranges, key=lambda r: sum(len(self.postings[w]) for w in r))
+        out, seen = [], set()
+        for rank in heapq.merge(*(self.postings[w] for w in probe)):
+            key = rank[2]
+            if key in seen:
+                continue
+            seen.add(key)
+            _, terms, payload = self.entries[key]
+            if len(words) == 1 or all(any(t.startswith(w) for t in terms) for w in words):
+                out.append(payload)
+                if len(out) == self.limit:
+                    break
+        if memo is not None:
+            self.memo[memo] = out
+        return out
+
+
+def _popularity():
+    return (select(OrderItem.product_id, func.count().label("n"))
+            .where(OrderItem.product_id.isnot(None)).group_by(OrderItem.product_id).subquery())
+
+
+def _product_item(row) -> tuple:
+    id_, name, slug, category, score = row
+    return id_, name, score, {"id": id_, "name": name, "slug": slug, "category": category}
+
+
+class Suggestions:
+    def __init__(self):
+        self.ready = False
+        self.catalog_version = None
+        self.built_at = 0.0
+        self._lock = asyncio.Lock()
+        self.products = self.categories = self.suppliers = PrefixIndex(MAX_LIMIT)
+
+    async def _groups(self, db: AsyncSession, pop, column) -> PrefixIndex:
+        rows = (await db.execute(
+            select(column, func.count(), func.coalesce(func.sum(pop.c.n), 0))
+            .outerjoin(pop, pop.c.product_id == Product.id)
+            .where(column.isnot(None), column != "")
+            .group_by(column)
+        )).all()
+        return PrefixIndex(GROUP_LIMIT, ((name, name, int(score), {"name": name, "count": n}) for name, n, score in rows))
+
+    async def refresh(self, db: AsyncSession, catalog_version: int) -> None:
+        watermark, lsn = await version_watermark()
+        if not await replayed(db, lsn):  # a replica behind the watermark
+            async with AsyncSessionLocal() as primary:
+                return await self._refresh(primary, catalog_version, watermark)
+        await self._refresh(db, catalog_version, watermark)
+
+    async def _refresh(self, db: AsyncSession, catalog_version: int, watermark: int) -> None:
+        started = time.perf_counter()
+        pop = _popularity()
+        score = func.coalesce(pop.c.n, 0)
+        stmt = (select(Product.id, Product.name, Product.slug, Product.category, score)
+                .outerjoin(pop, pop.c.product_id == Product.id))
+        total, top_id = (await db.execute(select(func.count(), func.coalesce(func.max(Product.id), 0)))).one()
+        rows = None
+        if self.ready and time.monotonic() - self.built_at < settings.SUGGEST_REBUILD_SECONDS:
+            rows = (await db.execute(stmt.where(Product.version > self.max_version))).all()
+        live_ids = None
+        if rows is None or len(rows) > FULL_REBUILD_ROWS:
+            rows = (await db.execute(
+                stmt.order_by(score.desc(), Product.id.desc()).limit(settings.SUGGEST_MAX_PRODUCTS)
+            )).all()
+            products = await anyio.to_thread.run_sync(PrefixIndex, MAX_LIMIT, [_product_item(r) for r in rows])
+            self.built_at = time.monotonic()
+        else:
+            products = self.products
+            if total != self.total + sum(r[0] > self.top_id for r in rows):
+                live_ids = set((await db.scalars(select(Product.id))).all())
+        categories = await self._groups(db, pop, Product.category)
+        suppliers = await self._groups(db, pop, Product.supplier)
+
+        # no awaits from here on
+        if products is self.products:
+            if live_ids is not None:
+                for id_ in [k for k in products.entries if k not in live_ids]:
+                    products.remove(id_)
+            for row in rows:
+                if row[0] in products.entries or len(products.entries) < settings.SUGGEST_MAX_PRODUCTS:
+                    products.add(*_product_item(row))
+        self.products, self.categories, self.suppliers = products, categories, suppliers
+        self.max_version, self.total, self.top_id = watermark, total, top_id  # above it: read again next time
+        self.ready = True
+        self.catalog_version = catalog_version
+        log.info("suggest index: %d products, %.1f ms", len(products.entries), (time.perf_counter() - started) * 1000)
+
+    def _stale(self, catalog_version: int) -> bool:
+        return (not self.ready or catalog_version != self.catalog_version
+                or time.monotonic() - self.built_at > settings.SUGGEST_REBUILD_SECONDS)
+
+    async def ensure_fresh(self, db: AsyncSession, catalog_version: int) -> None:
+        if self._stale(catalog_version):
+            async with self._lock:
+                if self._stale(catalog_version):
+                    await self.refresh(db, catalog_version)
+
+    async def suggest(self, db: AsyncSession, catalog_version: int, q: str, limit: int) -> dict:
+        words = normalize(q)
+        if not words:
+            return {"products": [], "categories": [], "suppliers": []}
+        await self.ensure_fresh(db, catalog_version)
+        return {
+            "products": self.products.search(words)[:limit],
+            "categories": self.categories.search(words),
+            "suppliers": self.suppliers.search(words),
+        }
+
+
+suggestions = Suggestions()
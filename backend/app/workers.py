@@ -0,0 +1,54 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi import HTTPException
+
+from .metrics import worker_pool_pending, worker_pool_rejected
+
+
+class WorkerPool:
+    """CPU-bound work off the event loop, in a bounded process pool.
+
+    At most `max_pending` jobs may be running or queued; beyond that callers get
+    503 straight away instead of growing a backlog. Workers are spawned, so
+    submitted functions must live in modules with light imports.
+    """
+
+    def __init__(self, workers: int, max_pending: int, name: str = "default"):
+        self.name = name
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor: ProcessPoolExecutor | None = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            worker_pool_rejected.inc(pool=self.name)
+            raise HTTPException(503, "Сервер перевантажений, спробуйте пізніше", headers={"Retry-After": "1"})
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool(), fn, *args)
+        except BrokenProcessPool:
+            self._executor = None
+            worker_pool_rejected.inc(pool=self.name)
+            raise HTTPException(503, "Сервер перевантажений, спробуйте пізніше", headers={"Retry-After": "1"})
+        finally:
+            self.pending -= 1
+
+    def collect(self):
+        worker_pool_pending.set(self.pending, pool=self.name)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
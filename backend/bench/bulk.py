@@ -0,0 +1,90 @@
+"""Bulk product import: one batched transaction vs one request-sized commit per row.
+
+python -m bench.bulk --rows 20000
+
+Takes the first --rows products of DATABASE_URL, builds a CSV that changes the
+price of most of them, leaves the rest alone and adds --new products, then
+applies it the old way (select + update + commit per row, like PUT
+/api/admin/products/{id}) and through app.bulk. Checks the report and the
+table against the expected state and restores the original rows at the end.
+"""
+import argparse
+import asyncio
+import random
+import time
+from decimal import Decimal
+
+from sqlalchemy import select, delete
+
+from app.bulk import import_products, csv_records, _update, _chunks, FIELDS
+from app.db import AsyncSessionLocal
+from app.models import Product
+
+
+async def stream(body: bytes, size: int = 64 * 1024):
+    for i in range(0, len(body), size):
+        yield body[i:i + size]
+
+
+async def main(rows: int, new: int, seed: int):
+    rng = random.Random(seed)
+    async with AsyncSessionLocal() as db:
+        original = (await db.execute(
+            select(Product.id, Product.slug, *(getattr(Product, f) for f in FIELDS)).order_by(Product.id).limit(rows)
+        )).all()
+    changed = {r.slug: r.price + Decimal("0.01") * rng.randint(1, 500) for r in original if rng.random() < 0.8}
+    lines = ["slug,name,price"] + [f"{r.slug},,{changed.get(r.slug, r.price)}" for r in original]
+    lines += [f"bench-bulk-{i},\"Бенч товар {i}, 1 кг\",{i % 90 + 1}.50" for i in range(new)]
+    body = ("\n".join(lines) + "\n").encode()
+    print(f"{len(original)} existing rows ({len(changed)} changed), {new} new, {len(body) / 2**20:.1f} MB CSV")
+
+    try:
+        started = time.perf_counter()
+        async with AsyncSessionLocal() as db:
+            for slug, price in changed.items():
+                p = await db.scalar(select(Product).where(Product.slug == slug))
+                p.price = price
+                await db.commit()
+        per_row = time.perf_counter() - started
+        print(f"per row: {per_row:.2f}s ({len(changed)} commits)")
+        await restore(original)
+
+        async with AsyncSessionLocal() as db:
+            started = time.perf_counter()
+            dry = await import_products(db, csv_records(stream(body)), dry_run=True)
+            print(f"dry run: {time.perf_counter() - started:.2f}s {dry['summary']}")
+        async with AsyncSessionLocal() as db:
+            started = time.perf_counter()
+            out = await import_products(db, csv_records(stream(body)), dry_run=False)
+            elapsed = time.perf_counter() - started
+            print(f"bulk:    {elapsed:.2f}s {out['summary']}, {per_row / elapsed:.0f}x")
+
+        expected = {"created": new, "updated": len(changed), "unchanged": len(original) - len(changed), "error": 0}
+        if dry["summary"] != expected or out["summary"] != expected:
+            raise SystemExit(f"summary mismatch, expected {expected}")
+        async with AsyncSessionLocal() as db:
+            now = dict((await db.execute(select(Product.slug, Product.price).where(Product.id <= original[-1].id))).all())
+            created = await db.scalar(select(Product.id).where(Product.slug.like("bench-bulk-%")).limit(1))
+        wrong = [r.slug for r in original if now[r.slug] != changed.get(r.slug, r.price)]
+        if wrong or (new and created is None):
+            raise SystemExit(f"table mismatch: {wrong[:5]}")
+        print("parity: table matches the CSV")
+    finally:
+        await restore(original)
+
+
+async def restore(original: list):
+    async with AsyncSessionLocal() as db:
+        for chunk in _chunks([(r.id, *(getattr(r, f) for f in FIELDS)) for r in original]):
+            await db.execute(_update(FIELDS, chunk))
+        await db.execute(delete(Product).where(Product.slug.like("bench-bulk-%")))
+        await db.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time bulk product import against per-row updates")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--new", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.new, args.seed))
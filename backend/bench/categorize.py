@@ -0,0 +1,100 @@
+"""Category rules: parity with the old substring chain, and throughput.
+
+python -m bench.categorize --products 100000
+
+Classifies synthetic names (bench.datagen vocabulary) with the compiled rules
+and with the hard-coded chain they replaced, which must agree, then checks the
+automaton against a brute-force scan on random keyword sets with overlapping
+words and shared prefixes.
+"""
+import argparse
+import random
+import re
+import time
+
+from app.categories import CategoryRules, default_rules
+from bench.datagen import products
+
+
+def chain(name: str) -> str:
+    # seed.infer_category before the rules moved to app/category_rules.json
+    n = name.lower()
+    if "насіння" in n or "семена" in n:
+        return "Насіння"
+    if "добрив" in n or "добриво" in n or "fert" in n:
+        return "Добрива"
+    if "фунгіцид" in n or "фунгицид" in n or "інсектицид" in n or "гербіцид" in n:
+        return "ЗЗР"
+    if "грунт" in n or "ґрунт" in n or "субстрат" in n:
+        return "Ґрунти/Субстрати"
+    if "горщик" in n or "кашпо" in n or "лоток" in n:
+        return "Інвентар"
+    return "Інше"
+
+
+def timed(label: str, fn, names: list[str]) -> list:
+    started = time.perf_counter()
+    out = [fn(n) for n in names]
+    elapsed = time.perf_counter() - started
+    print(f"{label:>8}: {elapsed:.2f}s, {len(names) / elapsed:,.0f} names/s")
+    return out
+
+
+def random_rules(rng: random.Random) -> list[dict]:
+    alphabet = "абвгаб"  # few letters: lots of overlaps and shared prefixes
+    word = lambda: "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 5)))
+    rules = [{"category": f"c{i}", "keywords": [word() for _ in range(rng.randint(0, 4))]}
+             for i in range(rng.randint(1, 12))]
+    if rng.random() < 0.5:
+        rules[rng.randrange(len(rules))]["regex"] = [rf"^{word()}"]
+    return rules
+
+
+def brute(rules: list[dict], name: str) -> str | None:
+    n = name.lower()
+    for rule in rules:
+        if any(k.lower() in n for k in rule["keywords"]) or any(re.search(p, name, re.I) for p in rule.get("regex", [])):
+            return rule["category"]
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check category rules against the old chain and time them")
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--rules", type=int, default=300, help="Rules in the scaling comparison")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    names = [p["name"] for p in products(args.products, rng)]
+    rules = default_rules()
+    old = timed("chain", chain, names)
+    new = timed("rules", rules.categorize, names)
+    mismatches = [(n, o, c) for n, o, c in zip(names, old, new) if o != c]
+    if mismatches:
+        raise SystemExit(f"{len(mismatches)} mismatches, e.g. {mismatches[:3]}")
+    print(f"parity: {len(names)} names identical")
+
+    # the chain's cost grows with the number of keywords, the automaton's does not
+    vocabulary = sorted({w for n in names[:5000] for w in n.lower().split() if len(w) > 3})
+    spec = [{"category": f"c{i}", "keywords": rng.sample(vocabulary, 3)} for i in range(args.rules)]
+    many = CategoryRules(spec, "Інше")
+    sample = names[:20_000]
+    print(f"{args.rules} rules, {3 * args.rules} keywords:")
+    slow = timed("chain", lambda n: brute(spec, n) or "Інше", sample)
+    fast = timed("rules", many.categorize, sample)
+    if slow != fast:
+        raise SystemExit("many-rules mismatch")
+
+    for _ in range(2000):
+        spec = random_rules(rng)
+        compiled = CategoryRules(spec)
+        for _ in range(20):
+            name = "".join(rng.choice("абвгдАБ ") for _ in range(rng.randint(0, 20)))
+            if compiled.match(name) != brute(spec, name):
+                raise SystemExit(f"Automaton mismatch for {name!r} with {spec}")
+    print("automaton: 40000 random cases identical")
+
+
+if __name__ == "__main__":
+    main()
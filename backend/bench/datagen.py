@@ -0,0 +1,144 @@
+"""Synthetic catalog, users, carts and orders for the load benchmark.
+
+python -m bench.datagen --scale 100k --truncate
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import insert, select, text
+
+from app.db import engine
+from app.hashing import pwd
+from app.models import User, Product, CartItem, Order, OrderItem
+from app.seed import iter_records, run_seed
+
+SEED_FILE = Path(__file__).resolve().parents[2] / "seed" / "greenahryadka_products_seed.json"
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+PASSWORD = "bench-password"
+ADMIN_EMAIL = "bench-admin@bench.example.com"
+# user i logs in as bench<i>@bench.example.com
+USER_EMAIL = "bench{}@bench.example.com"
+
+VARIANTS = ["", "Екстра", "Преміум", "Еко", "Професійний", "Органік", "Міні", "Макс"]
+PACKS = ["0,3 г", "0,5 г", "1 г", "5 г", "10 г", "25 г", "100 г", "1 кг", "5 л", "10 шт"]
+
+
+def products(n: int, rng: random.Random, seed_file: Path = SEED_FILE):
+    """`n` products derived from the real seed: same vocabulary, categories and price spread."""
+    base = [item for item in iter_records(seed_file) if item.get("name")]
+    for i in range(n):
+        item = base[i % len(base)]
+        name = item["name"]
+        if i >= len(base):
+            name = f"{name} {rng.choice(VARIANTS)} {rng.choice(PACKS)} #{i // len(base)}".replace("  ", " ")
+        price = float(item.get("price") or 0) or rng.uniform(5, 500)
+        yield {
+            "name": name,
+            "price": round(price * rng.uniform(0.7, 1.5), 2),
+            "supplier": item.get("supplier"),
+            "description": item.get("description") or "",
+        }
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def generate(n_products: int, n_users: int, n_orders: int, cart_share: float, seed: int,
+             batch_size: int, truncate: bool, seed_file: Path = SEED_FILE):
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    if truncate:
+        with engine.begin() as conn:
+            conn.execute(text("TRUNCATE products, users, orders RESTART IDENTITY CASCADE"))
+
+    with tempfile.NamedTemporaryFile("w", suffix=".ndjson", encoding="utf-8", delete=False) as f:
+        for row in products(n_products, rng, seed_file):
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    try:
+        run_seed(f.name, batch_size=batch_size)
+    finally:
+        os.unlink(f.name)
+
+    password_hash = pwd.hash(PASSWORD)  # one hash for everyone, bcrypt per row would dominate
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"nickname": "bench-admin", "email": ADMIN_EMAIL,
+                                     "password_hash": password_hash, "is_admin": True}])
+        product_rows = conn.execute(select(Product.id, Product.name, Product.price)).all()
+    users = (
+        {"nickname": f"bench-{i}", "email": USER_EMAIL.format(i), "password_hash": password_hash, "is_admin": False}
+        for i in range(n_users)
+    )
+    user_ids = []
+    for batch in _batches(users, batch_size):
+        with engine.begin() as conn:
+            user_ids += conn.scalars(insert(User).returning(User.id, sort_by_parameter_order=True), batch).all()
+    print(f"  {len(user_ids)} users")
+
+    def cart_lines():
+        for uid in user_ids:
+            if rng.random() < cart_share:
+                for pid, _, _ in rng.sample(product_rows, rng.randint(1, 5)):
+                    yield {"user_id": uid, "product_id": pid, "qty": rng.randint(1, 3)}
+
+    carts = 0
+    for batch in _batches(cart_lines(), batch_size):
+        with engine.begin() as conn:
+            conn.execute(insert(CartItem), batch)
+        carts += len(batch)
+    print(f"  {carts} cart lines")
+
+    orders = 0
+    for count in _batches(range(n_orders), batch_size):
+        rows = [{
+            "user_id": rng.choice(user_ids), "status": rng.choice(["created", "paid", "shipped", "done"]),
+            "payment_method": rng.choice(["cod", "card"]), "delivery_method": "nova_poshta",
+            "full_name": "Bench User", "phone": "+380000000000", "city": "Київ", "address": "вул. Тестова, 1",
+        } for _ in count]
+        with engine.begin() as conn:
+            order_ids = conn.scalars(insert(Order).returning(Order.id, sort_by_parameter_order=True), rows).all()
+            items = [
+                {"order_id": oid, "product_id": pid, "name": name, "price": price, "qty": rng.randint(1, 3)}
+                for oid in order_ids
+                for pid, name, price in rng.sample(product_rows, rng.randint(1, 5))
+            ]
+            conn.execute(insert(OrderItem), items)
+        orders += len(order_ids)
+    print(f"  {orders} orders")
+    print(f"Generated in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate benchmark data (writes to DATABASE_URL)")
+    parser.add_argument("--scale", choices=SCALES, help="Product count preset")
+    parser.add_argument("--products", type=int, help="Product count (overrides --scale)")
+    parser.add_argument("--users", type=int, help="Default: products / 10, at least 100")
+    parser.add_argument("--orders", type=int, help="Default: 2 per user")
+    parser.add_argument("--cart-share", type=float, default=0.3, help="Share of users with a non-empty cart")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed; same seed, same data")
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--seed-file", type=Path, default=SEED_FILE, help="Products to scale up (JSON array or NDJSON)")
+    parser.add_argument("--truncate", action="store_true",
+                        help="Delete ALL products, users, carts and orders first (never on a real database)")
+    args = parser.parse_args()
+    n_products = args.products or SCALES[args.scale or "10k"]
+    n_users = args.users or max(100, n_products // 10)
+    n_orders = args.orders if args.orders is not None else 2 * n_users
+    generate(n_products, n_users, n_orders, args.cart_share, args.seed, args.batch_size, args.truncate, args.seed_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""Closed-loop async load driver with a scripted shop workload.
+
+python -m bench.load --spawn --workers 2 --concurrency 32 --duration 60 --out results.json
+python -m bench.load --base-url http://127.0.0.1:8000 --baseline baseline.json
+
+Needs data from `python -m bench.datagen` and httpx (bench/requirements.txt).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+from .datagen import SEED_FILE, PASSWORD, ADMIN_EMAIL, USER_EMAIL
+from .report import summarize, print_table, compare
+from app.seed import iter_records
+
+# scenario -> weight; each scenario is one user action (one or more requests)
+MIX = {
+    "browse": 30,
+    "search": 20,
+    "filter": 15,
+    "product": 20,
+    "cart": 8,
+    "checkout": 4,
+    "admin_orders": 3,
+}
+SORTS = ["new", "price_asc", "price_desc", "name_asc"]
+CHECKOUT = {"full_name": "Bench User", "phone": "+380000000000", "city": "Київ", "address": "вул. Тестова, 1"}
+
+
+class Recorder:
+    def __init__(self):
+        self.active = False
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    def add(self, label: str, seconds: float, ok: bool):
+        if not self.active:
+            return
+        self.latencies[label].append(seconds)
+        if not ok:
+            self.errors[label] += 1
+
+
+class Shop:
+    """Shared fixtures (tokens, product ids/slugs, search terms) and the scenarios."""
+
+    def __init__(self, client: httpx.AsyncClient, rec: Recorder):
+        self.client = client
+        self.rec = rec
+        self.products: list[dict] = []
+        self.categories: list[str] = []
+        self.terms: list[str] = []
+        self.admin: dict = {}
+
+    async def call(self, label: str, method: str, url: str, **kw) -> httpx.Response:
+        started = time.perf_counter()
+        try:
+            r = await self.client.request(method, url, **kw)
+        except httpx.HTTPError:
+            self.rec.add(label, time.perf_counter() - started, False)
+            return None
+        self.rec.add(label, time.perf_counter() - started, r.status_code < 400)
+        return r
+
+    async def login(self, email: str) -> dict:
+        r = await self.client.post("/api/auth/login", json={"email": email, "password": PASSWORD})
+        r.raise_for_status()
+        return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+    async def setup(self, rng: random.Random, seed_file: Path):
+        for sort in SORTS:
+            r = await self.client.get("/api/products", params={"limit": 100, "sort": sort})
+            r.raise_for_status()
+            self.products += r.json()
+        if not self.products:
+            raise SystemExit("No products; run `python -m bench.datagen` first")
+        filters = (await self.client.get("/api/products/filters")).json()
+        self.categories = filters.get("categories") or []
+        words = {w for item in iter_records(seed_file) for w in re.findall(r"\w{4,}", (item.get("name") or "").lower())}
+        self.terms = sorted(w for w in words if not w.isdigit())
+        rng.shuffle(self.terms)
+        self.admin = await self.login(ADMIN_EMAIL)
+
+    async def browse(self, rng, auth):
+        r = await self.call("GET /api/products", "GET", "/api/products", params={"limit": 24, "sort": rng.choice(SORTS)})
+        cursor = r is not None and r.headers.get("X-Next-Cursor")
+        if cursor:
+            await self.call("GET /api/products?cursor", "GET", "/api/products",
+                            params={"limit": 24, "sort": r.request.url.params["sort"], "cursor": cursor})
+
+    async def search(self, rng, auth):
+        await self.call("GET /api/products?q", "GET", "/api/products",
+                        params={"q": rng.choice(self.terms), "limit": 24, "sort": rng.choice(["relevance", "new"])})
+
+    async def filter(self, rng, auth):
+        params = {"limit": 24, "sort": rng.choice(SORTS), "min_price": rng.choice([0, 10, 50]),
+                  "max_price": rng.choice([100, 500, 5000])}
+        if self.categories:
+            params["category"] = rng.choice(self.categories)
+        await self.call("GET /api/products?filter", "GET", "/api/products", params=params)
+
+    async def product(self, rng, auth):
+        await self.call("GET /api/products/{slug}", "GET", f"/api/products/{rng.choice(self.products)['slug']}")
+
+    async def cart(self, rng, auth):
+        await self.call("POST /api/cart/{id}", "POST", f"/api/cart/{rng.choice(self.products)['id']}", headers=auth)
+        await self.call("GET /api/cart", "GET", "/api/cart", headers=auth)
+
+    async def checkout(self, rng, auth):
+        await self.call("POST /api/cart/{id}", "POST", f"/api/cart/{rng.choice(self.products)['id']}", headers=auth)
+        await self.call("POST /api/orders", "POST", "/api/orders", json=CHECKOUT,
+                        headers={**auth, "Idempotency-Key": str(uuid.UUID(int=rng.getrandbits(128)))})
+
+    async def admin_orders(self, rng, auth):
+        await self.call("GET /api/admin/orders", "GET", "/api/admin/orders", headers=self.admin)
+
+
+async def virtual_user(shop: Shop, mix: dict, rng: random.Random, auth: dict, stop_at: float, think: float):
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < stop_at:
+        await getattr(shop, rng.choices(names, weights)[0])(rng, auth)
+        if think:
+            await asyncio.sleep(rng.expovariate(1 / think))
+
+
+async def run(args) -> dict:
+    rec = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30) as client:
+        shop = Shop(client, rec)
+        rng = random.Random(args.seed)
+        await shop.setup(rng, args.seed_file)
+        tokens = [await shop.login(USER_EMAIL.format(i % args.users)) for i in range(args.concurrency)]
+
+        start = time.perf_counter()
+        stop_at = start + args.warmup + args.duration
+        users = [
+            asyncio.create_task(virtual_user(shop, args.mix, random.Random(args.seed + i + 1), tokens[i], stop_at, args.think))
+            for i in range(args.concurrency)
+        ]
+        await asyncio.sleep(args.warmup)
+        rec.active = True
+        measured_from = time.perf_counter()
+        await asyncio.gather(*users)
+        seconds = time.perf_counter() - measured_from
+
+    endpoints = {label: summarize(values, rec.errors[label], seconds) for label, values in sorted(rec.latencies.items())}
+    everything = [v for values in rec.latencies.values() for v in values]
+    return {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git": _git_rev(),
+            "base_url": args.base_url,
+            "concurrency": args.concurrency,
+            "duration_s": round(seconds, 1),
+            "warmup_s": args.warmup,
+            "think_s": args.think,
+            "seed": args.seed,
+            "mix": args.mix,
+            "workers": args.workers if args.spawn else None,
+        },
+        "endpoints": endpoints,
+        "total": summarize(everything, sum(rec.errors.values()), seconds),
+    }
+
+
+def _git_rev() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def spawn_app(port: int, workers: int) -> subprocess.Popen:
+    """Start `uvicorn app.main:app` on localhost and wait for /api/health."""
+    backend = Path(__file__).resolve().parents[1]
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=backend, env={**os.environ, "PYTHONPATH": str(backend)},
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"uvicorn exited with {proc.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/health", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.3)
+    proc.terminate()
+    raise SystemExit("uvicorn did not become healthy in 60s")
+
+
+def parse_mix(raw: str) -> dict:
+    mix = {}
+    for part in raw.split(","):
+        name, _, weight = part.partition("=")
+        if name not in MIX:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}, choose from {', '.join(MIX)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the shop workload against the API and report latencies")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--spawn", action="store_true", help="Start a local uvicorn (uses DATABASE_URL etc.)")
+    parser.add_argument("--port", type=int, default=8765, help="Port for --spawn")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for --spawn")
+    parser.add_argument("--concurrency", type=int, default=32, help="Virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds before")
+    parser.add_argument("--think", type=float, default=0, help="Mean pause between actions, seconds")
+    parser.add_argument("--mix", type=parse_mix, default=MIX, help="e.g. browse=50,search=30,product=20")
+    parser.add_argument("--users", type=int, default=100, help="Bench users to log in as (from datagen)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--seed-file", type=Path, default=SEED_FILE, help="Source of search terms")
+    parser.add_argument("--out", help="Write results JSON here")
+    parser.add_argument("--baseline", help="Compare with an earlier results JSON")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="Exit 1 if any p95 grows or rps drops by more than this percent vs --baseline")
+    args = parser.parse_args()
+
+    proc = None
+    if args.spawn:
+        proc = spawn_app(args.port, args.workers)
+        args.base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(10)
+
+    print_table(results)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
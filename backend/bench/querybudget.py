@@ -0,0 +1,89 @@
+"""Query budget check: favorites, cart and order routes must not run a query per row.
+
+python -m bench.querybudget --items 20 --orders 5
+
+Creates a throwaway admin user on DATABASE_URL with --items favorites, a cart
+of --items products and --orders orders, calls each route through TestClient
+under `querycount.query_budget` and exits non-zero (printing the statements)
+when one runs more than its budget. An N+1 would show up as ~--items extra
+queries. The user and everything it made are deleted at the end.
+"""
+import argparse
+import secrets
+import sys
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select, delete
+
+from app import auth
+from app.auth import create_token
+from app.db import SessionLocal
+from app.main import app
+from app.models import Product, User, Order
+from app.querycount import query_budget
+
+# (method, route, statements); the user comes from the principal cache
+BUDGETS = [
+    ("GET", "/api/favorites", 1),
+    ("GET", "/api/cart", 1),
+    ("GET", "/api/orders", 2),  # orders + selectinload(items)
+    ("GET", "/api/admin/orders", 2),
+    ("PATCH", "/api/admin/orders/{order_id}?status=shipped", 3),  # order + items + UPDATE
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check per-route SQL query budgets")
+    parser.add_argument("--items", type=int, default=20, help="Favorites / cart lines / items per order")
+    parser.add_argument("--orders", type=int, default=5)
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        ids = db.scalars(select(Product.id).order_by(Product.id).limit(args.items)).all()
+        if len(ids) < args.items:
+            raise SystemExit("Not enough products; run `python -m bench.datagen` first")
+        name = f"bench-{secrets.token_hex(4)}"
+        user = User(nickname=name, email=f"{name}@example.com", password_hash="!", is_admin=True)
+        db.add(user)
+        db.commit()
+        user_id, headers = user.id, {"Authorization": f"Bearer {create_token(user)}"}
+
+    failed = []
+    try:
+        with TestClient(app, headers=headers) as c:
+            # the principal cache is only used once watch_users is connected
+            deadline = time.monotonic() + 10
+            while not auth._listening and time.monotonic() < deadline:
+                time.sleep(0.1)
+            cart = {"items": [{"product_id": i, "qty": 2} for i in ids], "mode": "replace"}
+            checkout = {"full_name": "Бенч", "phone": "0000000", "city": "Київ", "address": "вул. Тестова, 1"}
+            for _ in range(args.orders):
+                c.put("/api/cart", json=cart).raise_for_status()
+                order_id = c.post("/api/orders", json=checkout).raise_for_status().json()["order_id"]
+            c.put("/api/cart", json=cart).raise_for_status()
+            c.put("/api/favorites", json={"add": ids}).raise_for_status()
+
+            for method, route, budget in BUDGETS:
+                try:
+                    with query_budget(budget) as stats:
+                        r = c.request(method, route.format(order_id=order_id))
+                except AssertionError as e:
+                    failed.append(route)
+                    print(f"{method} {route}: over budget\n{e}\n", file=sys.stderr)
+                    continue
+                r.raise_for_status()
+                body = r.json()
+                print(f"{method:5} {route:50} {stats.count} queries (budget {budget}), "
+                      f"{len(body) if isinstance(body, list) else len(body['items'])} items")
+    finally:
+        with SessionLocal() as db:
+            db.execute(delete(Order).where(Order.user_id == user_id))
+            db.execute(delete(User).where(User.id == user_id))
+            db.commit()
+    if failed:
+        raise SystemExit(f"over budget: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Per-endpoint latency/throughput summaries and baseline comparison.
+
+python -m bench.report results.json --baseline baseline.json --threshold 10
+"""
+import argparse
+import json
+import math
+import sys
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    # nearest-rank, so p99 of 100 samples is the 99th value, not an interpolation
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def summarize(latencies: list[float], errors: int, seconds: float) -> dict:
+    values = sorted(latencies)
+    ms = lambda v: round(v * 1000, 2)
+    return {
+        "count": len(values),
+        "errors": errors,
+        "rps": round(len(values) / seconds, 1) if seconds else 0.0,
+        "mean_ms": ms(sum(values) / len(values)) if values else 0.0,
+        "p50_ms": ms(percentile(values, 50)),
+        "p95_ms": ms(percentile(values, 95)),
+        "p99_ms": ms(percentile(values, 99)),
+        "max_ms": ms(values[-1]) if values else 0.0,
+    }
+
+
+def print_table(results: dict) -> None:
+    cols = ("count", "errors", "rps", "p50_ms", "p95_ms", "p99_ms", "max_ms")
+    rows = {**results["endpoints"], "TOTAL": results["total"]}
+    width = max(len(name) for name in rows)
+    print(f"{'endpoint':<{width}}  " + "  ".join(f"{c:>9}" for c in cols))
+    for name, row in rows.items():
+        print(f"{name:<{width}}  " + "  ".join(f"{row[c]:>9}" for c in cols))
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Print p50/p95/rps deltas; return the regressions worse than `threshold` percent."""
+    regressions = []
+    rows = {**results["endpoints"], "TOTAL": results["total"]}
+    base_rows = {**baseline["endpoints"], "TOTAL": baseline["total"]}
+    width = max(len(name) for name in rows)
+    print(f"\n{'vs baseline':<{width}}  {'p50':>9}  {'p95':>9}  {'rps':>9}")
+    for name, row in rows.items():
+        base = base_rows.get(name)
+        if not base:
+            print(f"{name:<{width}}  {'(new)':>9}")
+            continue
+        deltas = []
+        for key, higher_is_worse in (("p50_ms", True), ("p95_ms", True), ("rps", False)):
+            if not base[key]:
+                deltas.append("n/a")
+                continue
+            change = (row[key] - base[key]) / base[key] * 100
+            deltas.append(f"{change:+.1f}%")
+            worse = change if higher_is_worse else -change
+            if key != "p50_ms" and worse > threshold:
+                regressions.append(f"{name} {key}: {base[key]} -> {row[key]} ({change:+.1f}%)")
+        print(f"{name:<{width}}  " + "  ".join(f"{d:>9}" for d in deltas))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show benchmark results, optionally against a baseline")
+    parser.add_argument("results")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare with")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="Exit 1 if any p95 grows or rps drops by more than this percent")
+    args = parser.parse_args()
+    with open(args.results, encoding="utf-8") as f:
+        results = json.load(f)
+    print_table(results)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Micro-benchmark: rendering a product list the FastAPI way vs pre-serialized bytes.
+
+python -m bench.serialize --limit 200 --rounds 200
+
+Loads products from DATABASE_URL, checks that both paths produce identical
+bytes for every loaded product, then times one list body per round.
+"""
+import argparse
+import time
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import select
+
+from app.db import SessionLocal
+from app.models import Product
+from app.payloads import product_to_out, product_json, json_list
+from app.schemas import ProductOut
+
+
+def fastapi_body(products: list[Product], adapter: TypeAdapter) -> bytes:
+    # what an endpoint with response_model=list[ProductOut] does per request
+    items = adapter.validate_python([product_to_out(p).model_dump() for p in products])
+    return JSONResponse(jsonable_encoder(adapter.dump_python(items, mode="json"))).body
+
+
+def timed(fn, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare product list serialization paths")
+    parser.add_argument("--limit", type=int, default=200, help="Products per list")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        products = db.scalars(select(Product).order_by(Product.id.desc()).limit(args.limit)).all()
+    if not products:
+        raise SystemExit("No products; run `python -m bench.datagen` first")
+    adapter = TypeAdapter(list[ProductOut])
+
+    expected = fastapi_body(products, adapter)
+    if json_list(product_json(p) for p in products) != expected:
+        raise SystemExit("Pre-serialized body differs from the ProductOut rendering")
+    snippet = 'a <mark>"b"</mark> \\ ґ '
+    one = TypeAdapter(ProductOut)
+    if product_json(products[0], snippet) != JSONResponse(one.dump_python(product_to_out(products[0], snippet), mode="json")).body:
+        raise SystemExit("Snippet splicing differs from the ProductOut rendering")
+
+    baseline = timed(lambda: fastapi_body(products, adapter), args.rounds)
+    miss = timed(lambda: json_list(orjson.dumps(product_to_out(p).model_dump()) for p in products), args.rounds)
+    hit = timed(lambda: json_list(product_json(p) for p in products), args.rounds)
+    print(f"{len(products)} products, {len(expected)} bytes, identical output")
+    print(f"response_model + json:      {baseline * 1000:8.3f} ms/list")
+    print(f"orjson, product cache miss: {miss * 1000:8.3f} ms/list  ({baseline / miss:.1f}x)")
+    print(f"orjson, product cache hit:  {hit * 1000:8.3f} ms/list  ({baseline / hit:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
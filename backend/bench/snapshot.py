@@ -0,0 +1,109 @@
+"""Parity check and timing: in-memory catalog snapshot vs the SQL listing path.
+
+python -m bench.snapshot --rounds 300
+
+Needs numpy. Builds a snapshot from DATABASE_URL and compares random
+filter/sort/page/cursor combinations with `query_products` byte for byte,
+then changes, adds and deletes products inside a transaction (rolled back at
+the end), refreshes incrementally and compares again.
+"""
+import argparse
+import asyncio
+import random
+import time
+from decimal import Decimal
+
+from sqlalchemy import select, update, delete, insert, exists
+
+from app.db import AsyncSessionLocal
+from app.main import query_products
+from app.models import Product, OrderItem
+from app.snapshot import CatalogSnapshot, ORDERS
+
+
+def random_query(rng: random.Random, snap: CatalogSnapshot) -> dict:
+    prices = snap.price[snap.alive]
+    pick_price = lambda: rng.choice([float(rng.choice(prices)), round(rng.uniform(0, float(prices.max())), 1), 10.1])
+    return {
+        "category": rng.choice([None, None, "no such category", *snap.categories]),
+        "supplier": rng.choice([None, None, *list(snap.suppliers)[:20]]),
+        "min_price": rng.choice([None, pick_price()]),
+        "max_price": rng.choice([None, pick_price()]),
+        "sort": rng.choice([*ORDERS, "bogus"]),
+        "skip": rng.choice([0, 0, 0, 3, 50]),
+        "limit": rng.choice([1, 24, 200]),
+    }
+
+
+async def compare(db, snap: CatalogSnapshot, version: int, rng: random.Random, rounds: int) -> int:
+    checked = 0
+    for _ in range(rounds):
+        query = random_query(rng, snap)
+        cursor = None
+        for _ in range(3):  # first page + two cursor pages
+            sql = await query_products(db, None, **query, cursor=cursor)
+            fast = await snap.page(db, version, **query, cursor=cursor)
+            if fast != sql:
+                raise SystemExit(f"Mismatch for {query} cursor={cursor}:\n  sql  {sql['body'][:200]} {sql['next_cursor']}"
+                                 f"\n  snap {fast and fast['body'][:200]} {fast and fast['next_cursor']}")
+            checked += 1
+            cursor = sql["next_cursor"]
+            if not cursor:
+                break
+    return checked
+
+
+async def mutate(db, rng: random.Random) -> None:
+    ids = (await db.scalars(select(Product.id))).all()
+    categories = (await db.scalars(select(Product.category).distinct())).all()
+    for id_ in rng.sample(ids, min(40, len(ids))):
+        await db.execute(update(Product).where(Product.id == id_).values(price=Decimal(rng.randint(0, 50000)) / 100))
+    for id_ in rng.sample(ids, min(10, len(ids))):
+        await db.execute(update(Product).where(Product.id == id_).values(category=rng.choice(categories)))
+    for id_ in rng.sample(ids, min(5, len(ids))):
+        await db.execute(update(Product).where(Product.id == id_).values(name=f"{rng.choice('AБЯz')} bench rename {id_}"))
+    for i in range(3):
+        await db.execute(insert(Product).values(name=f"Bench new {i}", slug=f"bench-snapshot-new-{i}-{rng.random()}",
+                                                description="", price=Decimal("12.50"), category=rng.choice(categories)))
+    unordered = select(Product.id).where(~exists().where(OrderItem.product_id == Product.id)).limit(3)
+    await db.execute(delete(Product).where(Product.id.in_(unordered)))
+
+
+async def run(args) -> None:
+    rng = random.Random(args.seed)
+    async with AsyncSessionLocal() as db:
+        snap = CatalogSnapshot(True)
+        started = time.perf_counter()
+        await snap.refresh(db, 1)
+        print(f"snapshot: {snap.live} products in {(time.perf_counter() - started) * 1000:.0f} ms")
+        print(f"parity: {await compare(db, snap, 1, rng, args.rounds)} pages identical")
+
+        await mutate(db, rng)
+        started = time.perf_counter()
+        await snap.refresh(db, 2)
+        print(f"incremental refresh: {(time.perf_counter() - started) * 1000:.1f} ms, {snap.live} products")
+        print(f"parity after changes: {await compare(db, snap, 2, rng, args.rounds)} pages identical")
+        await db.rollback()
+
+        snap = CatalogSnapshot(True)  # the rolled-back rows must not linger
+        await snap.refresh(db, 3)
+        queries = [random_query(rng, snap) for _ in range(200)]
+        for name, fn in (("sql", lambda q: query_products(db, None, **q, cursor=None)),
+                         ("snapshot", lambda q: snap.page(db, 3, **q, cursor=None))):
+            for q in queries[:20]:  # warm the product JSON cache
+                await fn(q)
+            started = time.perf_counter()
+            for q in queries:
+                await fn(q)
+            print(f"{name:>8}: {(time.perf_counter() - started) / len(queries) * 1000:.3f} ms/listing")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the catalog snapshot against SQL and time both")
+    parser.add_argument("--rounds", type=int, default=200, help="Random queries per parity pass")
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
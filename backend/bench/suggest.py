@@ -0,0 +1,84 @@
+"""Parity check and timing for /api/products/suggest's prefix index.
+
+python -m bench.suggest --rounds 500
+
+Compares random prefixes of product words with a brute-force scan of the
+products table, then changes, adds and deletes products inside a transaction
+(rolled back at the end), refreshes incrementally and compares again.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from sqlalchemy import select, func
+
+from app.db import AsyncSessionLocal
+from app.models import Product, OrderItem
+from app.suggest import Suggestions, normalize, MAX_LIMIT
+from bench.snapshot import mutate
+
+
+async def expected(db) -> list:
+    pop = (select(OrderItem.product_id, func.count().label("n")).group_by(OrderItem.product_id).subquery())
+    rows = (await db.execute(select(Product.id, Product.name, func.coalesce(pop.c.n, 0))
+                             .outerjoin(pop, pop.c.product_id == Product.id))).all()
+    return sorted(((-n, name, id_), normalize(name)) for id_, name, n in rows)
+
+
+def random_query(rng: random.Random, names: list) -> str:
+    words = rng.choice(names)[1] or ["x"]
+    picked = rng.sample(words, min(len(words), rng.choice([1, 1, 2])))
+    return " ".join(w[:rng.randint(1, len(w))] for w in picked)
+
+
+async def compare(db, index: Suggestions, version: int, rng: random.Random, rounds: int) -> int:
+    names = await expected(db)
+    for _ in range(rounds):
+        q = random_query(rng, names)
+        words = normalize(q)
+        want = [rank[2] for rank, terms in names
+                if all(any(t.startswith(w) for t in terms) for w in words)][:MAX_LIMIT]
+        got = [p["id"] for p in (await index.suggest(db, version, q, MAX_LIMIT))["products"]]
+        if got != want:
+            raise SystemExit(f"Mismatch for {q!r}:\n  want {want}\n  got  {got}")
+    return rounds
+
+
+async def run(args) -> None:
+    rng = random.Random(args.seed)
+    async with AsyncSessionLocal() as db:
+        index = Suggestions()
+        started = time.perf_counter()
+        await index.refresh(db, 1)
+        print(f"index: {len(index.products.entries)} products, {len(index.products.words)} words "
+              f"in {(time.perf_counter() - started) * 1000:.0f} ms")
+        print(f"parity: {await compare(db, index, 1, rng, args.rounds)} queries identical")
+
+        await mutate(db, rng)
+        started = time.perf_counter()
+        await index.refresh(db, 2)
+        print(f"incremental refresh: {(time.perf_counter() - started) * 1000:.1f} ms")
+        print(f"parity after changes: {await compare(db, index, 2, rng, args.rounds)} queries identical")
+        await db.rollback()
+
+        index = Suggestions()
+        await index.refresh(db, 3)
+        names = await expected(db)
+        queries = [random_query(rng, names) for _ in range(1000)]
+        for label, qs in (("cold", queries), ("warm", queries)):
+            started = time.perf_counter()
+            for q in qs:
+                await index.suggest(db, 3, q, 8)
+            print(f"{label:>5}: {(time.perf_counter() - started) / len(qs) * 1000:.3f} ms/query")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the suggest index against a full scan and time it")
+    parser.add_argument("--rounds", type=int, default=500, help="Random queries per parity pass")
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
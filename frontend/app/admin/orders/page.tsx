@@ -2,7 +2,7 @@
 
 import { useEffect, useState } from "react";
 import Link from "next/link";
-import { api } from "../../../components/api";
+import { api, apiResponse } from "../../../components/api";
 
 type OrderItem = { name: string; price: number; qty: number };
 type Order = {
@@ -15,37 +15,87 @@ type Order = {
   city?: string | null;
   address?: string | null;
   comment?: string | null;
+  created_at?: string | null;
   items: OrderItem[];
 };
 
+type Filters = { status: string; payment_method: string; delivery_method: string; city: string; created_from: string; created_to: string };
+const NO_FILTERS: Filters = { status: "", payment_method: "", delivery_method: "", city: "", created_from: "", created_to: "" };
+
+function filterQuery(f: Filters): URLSearchParams {
+  const params = new URLSearchParams();
+  for (const [k, v] of Object.entries(f)) if (v.trim()) params.set(k, v.trim());
+  if (f.created_to) {
+    // API bound is exclusive; the picked day should be included
+    const next = new Date(`${f.created_to}T00:00:00Z`);
+    next.setUTCDate(next.getUTCDate() + 1);
+    params.set("created_to", next.toISOString().slice(0, 10));
+  }
+  return params;
+}
+
 const STATUSES = ["created", "paid", "processing", "shipped", "delivered", "canceled"];
 
 export default function AdminOrdersPage() {
   const [orders, setOrders] = useState<Order[]>([]);
+  const [filters, setFilters] = useState<Filters>(NO_FILTERS);
+  const [applied, setApplied] = useState<Filters>(NO_FILTERS);
+  const [cursor, setCursor] = useState<string | null>(null);
   const [err, setErr] = useState<string | null>(null);
 
-  async function load() {
+  async function load(f: Filters, after: string | null) {
     setErr(null);
     try {
-      const data = await api("/api/admin/orders");
-      setOrders(data);
+      const params = filterQuery(f);
+      if (after) params.set("cursor", after);
+      const res = await apiResponse(`/api/admin/orders?${params.toString()}`);
+      const data: Order[] = await res.json();
+      setOrders((prev) => (after ? [...prev, ...data] : data));
+      setCursor(res.headers.get("X-Next-Cursor"));
     } catch (e: any) {
       setErr(e?.message || "Помилка");
     }
   }
 
-  useEffect(() => { load(); }, []);
+  useEffect(() => { load(applied, null); }, [applied]);
 
   async function setStatus(id: number, status: string) {
     setErr(null);
     try {
-      await api(`/api/admin/orders/${id}?status=${encodeURIComponent(status)}`, { method: "PATCH" });
-      await load();
+      const updated: Order = await api(`/api/admin/orders/${id}?status=${encodeURIComponent(status)}`, { method: "PATCH" });
+      setOrders((prev) => prev.map((o) => (o.id === id ? updated : o)));
     } catch (e: any) {
       setErr(e?.message || "Помилка");
     }
   }
 
+  async function download(format: "csv" | "ndjson") {
+    setErr(null);
+    try {
+      const params = filterQuery(applied);
+      params.set("format", format);
+      const res = await apiResponse(`/api/admin/orders/export?${params.toString()}`);
+      const url = URL.createObjectURL(await res.blob());
+      const a = document.createElement("a");
+      a.href = url;
+      a.download = `orders.${format}`;
+      a.click();
+      URL.revokeObjectURL(url);
+    } catch (e: any) {
+      setErr(e?.message || "Помилка");
+    }
+  }
+
+  const input = (key: keyof Filters, placeholder: string, type = "text") => (
+    <input
+      className="rounded-xl border px-3 py-2 text-sm"
+      type={type}
+      placeholder={placeholder}
+      value={filters[key]}
+      onChange={(e) => setFilters({ ...filters, [key]: e.target.value })}
+    />
+  );
+
   return (
     <div className="mx-auto max-w-5xl p-6 space-y-6">
       <div className="flex items-center justify-between">
@@ -53,6 +103,28 @@ export default function AdminOrdersPage() {
         <Link href="/admin" className="text-emerald-700 hover:underline">← Назад до товарів</Link>
       </div>
 
+      <form
+        className="flex flex-wrap items-end gap-2 rounded-2xl border bg-white p-4 shadow-sm"
+        onSubmit={(e) => { e.preventDefault(); setApplied(filters); }}
+      >
+        <select
+          className="rounded-xl border px-3 py-2 text-sm"
+          value={filters.status}
+          onChange={(e) => setFilters({ ...filters, status: e.target.value })}
+        >
+          <option value="">Усі статуси</option>
+          {STATUSES.map((s) => <option key={s} value={s}>{s}</option>)}
+        </select>
+        {input("payment_method", "Оплата (cod, card)")}
+        {input("delivery_method", "Доставка")}
+        {input("city", "Місто")}
+        <label className="text-sm text-zinc-600">Від {input("created_from", "", "date")}</label>
+        <label className="text-sm text-zinc-600">До {input("created_to", "", "date")}</label>
+        <button className="rounded-xl bg-emerald-600 px-4 py-2 text-sm font-medium text-white" type="submit">Фільтрувати</button>
+        <button className="rounded-xl border px-4 py-2 text-sm" type="button" onClick={() => download("csv")}>CSV</button>
+        <button className="rounded-xl border px-4 py-2 text-sm" type="button" onClick={() => download("ndjson")}>NDJSON</button>
+      </form>
+
       {err && <div className="rounded-xl border border-red-200 bg-red-50 p-3 text-sm text-red-800">{err}</div>}
 
       <div className="space-y-4">
@@ -61,7 +133,10 @@ export default function AdminOrdersPage() {
           return (
             <div key={o.id} className="rounded-2xl border bg-white p-4 shadow-sm">
               <div className="flex flex-wrap items-center justify-between gap-3">
-                <div className="font-medium">Замовлення #{o.id}</div>
+                <div className="font-medium">
+                  Замовлення #{o.id}
+                  {o.created_at && <span className="ml-2 text-sm font-normal text-zinc-500">{new Date(o.created_at).toLocaleString("uk-UA")}</span>}
+                </div>
                 <div className="flex items-center gap-2">
                   <span className="text-sm text-zinc-600">Статус:</span>
                   <select
@@ -102,6 +177,11 @@ export default function AdminOrdersPage() {
           );
         })}
         {orders.length === 0 && <div className="text-sm text-zinc-600">Нема замовлень.</div>}
+        {cursor && (
+          <button className="rounded-xl border px-4 py-2 text-sm hover:bg-zinc-50" onClick={() => load(applied, cursor)}>
+            Показати ще
+          </button>
+        )}
       </div>
     </div>
   );
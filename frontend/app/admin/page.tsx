@@ -3,6 +3,7 @@
 import { useEffect, useMemo, useState } from "react";
 import { api, API_BASE } from "../../components/api";
 import { RichTextEditor } from "../../components/RichTextEditor";
+import { BulkImport } from "../../components/BulkImport";
 
 type Product = {
   id: number;
@@ -288,6 +289,8 @@ export default function AdminPage() {
           </div>
         </div>
       </div>
+
+      <BulkImport onDone={refresh} />
     </div>
   );
 }
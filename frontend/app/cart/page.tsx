@@ -1,5 +1,5 @@
 "use client";
-import { useEffect, useMemo, useState } from "react";
+import { useEffect, useMemo, useRef, useState } from "react";
 import { api } from "../../components/api";
 import Link from "next/link";
 
@@ -21,6 +21,8 @@ export default function CartPage() {
   const [err, setErr] = useState<string | null>(null);
   const [ok, setOk] = useState<string | null>(null);
   const [busy, setBusy] = useState(false);
+  // reused by retries of the same checkout, so the server creates the order once
+  const checkoutKey = useRef<string | null>(null);
 
   const [checkout, setCheckout] = useState({
     payment_method: "cod",
@@ -55,7 +57,13 @@ export default function CartPage() {
     setOk(null);
     setBusy(true);
     try {
-      const r = await api("/api/orders", { method: "POST", body: JSON.stringify(checkout) });
+      checkoutKey.current ??= crypto.randomUUID();
+      const r = await api("/api/orders", {
+        method: "POST",
+        body: JSON.stringify(checkout),
+        headers: { "Idempotency-Key": checkoutKey.current },
+      });
+      checkoutKey.current = null;
       setOk(`Замовлення створено: #${r.order_id}`);
       setItems([]);
     } catch (e: any) {
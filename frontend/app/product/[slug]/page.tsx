@@ -3,6 +3,8 @@ import Link from "next/link";
 import { notFound } from "next/navigation";
 import { getAllSeedSlugs, getSeedProduct } from "../../../lib/seed";
 import { ProductActions } from "../../../components/ProductActions";
+import { RelatedProducts } from "../../../components/RelatedProducts";
+import { buildCatalog } from "../../../lib/catalogExport";
 
 const API_BASE = process.env.NEXT_PUBLIC_API_BASE || "http://localhost:8000";
 
@@ -23,6 +25,8 @@ function stripHtmlToText(html: string): string {
 }
 
 async function fetchProduct(slug: string) {
+  const catalog = await buildCatalog();
+  if (catalog) return catalog.get(slug) ?? null;
   try {
     const res = await fetch(`${API_BASE}/api/products/${encodeURIComponent(slug)}`, {
       // якщо API доступний у проді — буде підтягувати актуальні дані з кешем
@@ -37,11 +41,13 @@ async function fetchProduct(slug: string) {
 
 export async function generateStaticParams() {
   // SSG під всі 800+ товарів
-  return getAllSeedSlugs().map((slug) => ({ slug }));
+  const catalog = await buildCatalog();
+  const slugs = catalog ? Array.from(catalog.keys()) : getAllSeedSlugs();
+  return slugs.map((slug) => ({ slug }));
 }
 
 export async function generateMetadata({ params }: { params: { slug: string } }) {
-  const seed = getSeedProduct(params.slug);
+  const seed = (await buildCatalog())?.get(params.slug) ?? getSeedProduct(params.slug);
   if (!seed) return { title: "Товар не знайдено — Зелена грядка" };
   const title = `${seed.name} — Зелена грядка`;
   const desc = (seed.description || "").slice(0, 160);
@@ -113,6 +119,8 @@ export default async function ProductPage({ params }: { params: { slug: string }
           )}
         </div>
       </div>
+
+      <RelatedProducts slug={params.slug} />
     </div>
   );
 }
\ No newline at end of file
@@ -8,9 +8,11 @@ export const metadata = {
 export default function ProductsPage({
   searchParams,
 }: {
-  searchParams: { q?: string; page?: string };
+  searchParams: { q?: string; page?: string; category?: string; supplier?: string };
 }) {
   const q = (searchParams.q || "").trim();
+  const category = searchParams.category || "";
+  const supplier = searchParams.supplier || "";
   const page = Math.max(1, Number(searchParams.page || "1") || 1);
 
   return (
@@ -19,7 +21,8 @@ export default function ProductsPage({
         <h1 className="text-3xl font-extrabold">Каталог</h1>
         <p className="text-zinc-600">Фільтри, сортування, пошук — швидко навіть з 800+ товарів.</p>
       </div>
-      <ProductsBrowser initialQ={q} initialPage={page} />
+      {/* key: a search from the header (new URL) starts the browser over */}
+      <ProductsBrowser key={`${q}|${category}|${supplier}`} initialQ={q} initialPage={page} initialCategory={category} initialSupplier={supplier} />
     </div>
   );
 }
@@ -0,0 +1,138 @@
+"use client";
+import { useState } from "react";
+import { api } from "./api";
+
+type Row = { line?: number; file?: string; slug: string | null; status: string; error?: string; changes?: Record<string, [unknown, unknown]> };
+type Report = { dry_run?: boolean; summary: Record<string, number>; rows?: Row[]; files?: Row[] };
+
+const STATUS: Record<string, string> = {
+  created: "Створено",
+  updated: "Оновлено",
+  unchanged: "Без змін",
+  error: "Помилка",
+};
+
+function ReportView({ report }: { report: Report }) {
+  // рядки без змін не показуємо: у великому файлі їх тисячі
+  const rows = (report.rows || report.files || []).filter((r) => r.status !== "unchanged");
+  return (
+    <div className="mt-3">
+      <div className="text-sm font-bold">
+        {report.dry_run ? "Перевірка (нічого не збережено): " : ""}
+        {Object.entries(report.summary).map(([k, n]) => `${STATUS[k] || k}: ${n}`).join(" · ")}
+      </div>
+      {rows.length > 0 && (
+        <div className="mt-2 max-h-72 overflow-auto rounded-2xl border text-xs">
+          {rows.slice(0, 500).map((r, i) => (
+            <div key={i} className={`px-3 py-2 border-b ${r.status === "error" ? "text-red-700" : ""}`}>
+              <span className="text-zinc-500">{r.line ? `рядок ${r.line}` : r.file}</span>{" "}
+              <span className="font-bold">{r.slug}</span> — {STATUS[r.status] || r.status}
+              {r.error && `: ${r.error}`}
+              {r.changes &&
+                ": " + Object.entries(r.changes).map(([f, [a, b]]) => `${f} ${a ?? "—"} → ${b ?? "—"}`).join(", ")}
+            </div>
+          ))}
+          {rows.length > 500 && <div className="px-3 py-2 text-zinc-500">… і ще {rows.length - 500}</div>}
+        </div>
+      )}
+    </div>
+  );
+}
+
+export function BulkImport({ onDone }: { onDone: () => void }) {
+  const [file, setFile] = useState<File | null>(null);
+  const [report, setReport] = useState<Report | null>(null);
+  const [images, setImages] = useState<Report | null>(null);
+  const [busy, setBusy] = useState(false);
+  const [err, setErr] = useState<string | null>(null);
+
+  async function run(dryRun: boolean) {
+    if (!file) return;
+    setBusy(true);
+    setErr(null);
+    try {
+      const ndjson = /\.(nd)?jsonl?$/i.test(file.name);
+      setReport(await api(`/api/admin/products/bulk?format=${ndjson ? "ndjson" : "csv"}&dry_run=${dryRun}`, {
+        method: "POST",
+        body: file,
+        headers: { "Content-Type": ndjson ? "application/x-ndjson" : "text/csv" },
+      }));
+      if (!dryRun) onDone();
+    } catch (e: any) {
+      setErr(String(e?.message || e));
+    } finally {
+      setBusy(false);
+    }
+  }
+
+  async function uploadZip(zip: File) {
+    setBusy(true);
+    setErr(null);
+    try {
+      const fd = new FormData();
+      fd.append("file", zip);
+      setImages(await api(`/api/admin/products/images`, { method: "POST", body: fd }));
+      onDone();
+    } catch (e: any) {
+      setErr(String(e?.message || e));
+    } finally {
+      setBusy(false);
+    }
+  }
+
+  return (
+    <div className="mt-6 rounded-3xl border bg-white shadow-sm p-5">
+      <div className="font-extrabold">Масове оновлення</div>
+      {err && <div className="mt-3 p-3 rounded-2xl border border-red-200 bg-red-50 text-red-800 text-sm">{err}</div>}
+
+      <div className="mt-4 grid lg:grid-cols-2 gap-6">
+        <div>
+          <div className="font-bold">Товари: CSV або NDJSON</div>
+          <div className="text-xs text-zinc-500 mt-1">
+            Колонки: slug, name, description, supplier, category, price. Товари шукаються за slug; порожня клітинка
+            лишає поле як є. Для нових товарів потрібні name і price.
+          </div>
+          <input
+            type="file"
+            accept=".csv,.ndjson,.jsonl,text/csv"
+            className="mt-3"
+            onChange={(e) => { setFile(e.target.files?.[0] || null); setReport(null); }}
+          />
+          <div className="mt-3 flex gap-2">
+            <button
+              disabled={busy || !file}
+              onClick={() => run(true)}
+              className="rounded-2xl px-4 py-2 border font-bold hover:bg-zinc-50 disabled:opacity-60"
+            >
+              Перевірити
+            </button>
+            <button
+              disabled={busy || !file}
+              onClick={() => run(false)}
+              className="rounded-2xl px-4 py-2 bg-emerald-600 text-white font-bold hover:bg-emerald-700 disabled:opacity-60"
+            >
+              Застосувати
+            </button>
+          </div>
+          {report && <ReportView report={report} />}
+        </div>
+
+        <div>
+          <div className="font-bold">Фото: zip-архів</div>
+          <div className="text-xs text-zinc-500 mt-1">Файли &lt;slug&gt;.jpg / png / webp, папки в архіві не важливі.</div>
+          <input
+            type="file"
+            accept=".zip,application/zip"
+            disabled={busy}
+            className="mt-3"
+            onChange={(e) => {
+              const zip = e.target.files?.[0];
+              if (zip) uploadZip(zip);
+            }}
+          />
+          {images && <ReportView report={images} />}
+        </div>
+      </div>
+    </div>
+  );
+}
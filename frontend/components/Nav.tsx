@@ -1,7 +1,8 @@
 "use client";
 import Link from "next/link";
-import { useEffect, useState } from "react";
+import { Suspense, useEffect, useState } from "react";
 import { clearToken } from "./api";
+import { SearchBar } from "./SearchBar";
 
 export function Nav() {
   const [nick, setNick] = useState<string | null>(null);
@@ -14,10 +15,15 @@ export function Nav() {
 
   return (
     <header className="sticky top-0 z-50 backdrop-blur bg-white/70 border-b">
-      <div className="max-w-6xl mx-auto px-4 py-3 flex items-center justify-between">
+      <div className="max-w-6xl mx-auto px-4 py-3 flex items-center justify-between gap-4">
         <Link href="/" className="font-black tracking-tight text-xl">
           <span className="text-emerald-600">Зелена</span> грядка
         </Link>
+        <div className="hidden md:block flex-1 max-w-md">
+          <Suspense>
+            <SearchBar />
+          </Suspense>
+        </div>
         <nav className="flex items-center gap-4 text-sm">
           <Link href="/cart" className="hover:underline">Кошик</Link>
           {nick ? (
@@ -1,6 +1,7 @@
 "use client";
 import Link from "next/link";
 import { motion } from "framer-motion";
+import { API_BASE } from "./api";
 
 export type Product = {
   id: number;
@@ -10,8 +11,13 @@ export type Product = {
   supplier?: string | null;
   price: number;
   image_url?: string | null;
+  image_srcset?: string | null;
 };
 
+function withBase(srcset: string): string {
+  return srcset.split(", ").map((s) => `${API_BASE}${s}`).join(", ");
+}
+
 export function ProductCard({ p }: { p: Product }) {
   return (
     <motion.div
@@ -23,7 +29,14 @@ export function ProductCard({ p }: { p: Product }) {
         <div className="aspect-[4/3] bg-gradient-to-br from-emerald-50 to-zinc-50 flex items-center justify-center">
           {p.image_url ? (
             // eslint-disable-next-line @next/next/no-img-element
-            <img src={`${API_BASE}${p.image_url}`} alt={p.name} className="w-full h-full object-cover" />
+            <img
+              src={`${API_BASE}${p.image_url}`}
+              srcSet={p.image_srcset ? withBase(p.image_srcset) : undefined}
+              sizes="(max-width: 640px) 100vw, (max-width: 1024px) 50vw, 33vw"
+              loading="lazy"
+              alt={p.name}
+              className="w-full h-full object-cover"
+            />
           ) : (
             <div className="text-emerald-700/70 text-sm">Фото буде тут</div>
           )}
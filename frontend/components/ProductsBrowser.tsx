@@ -6,25 +6,35 @@ import { ProductCard, Product } from "./ProductCard";
 
 const PAGE_SIZE = 24;
 
-type Filters = { categories: string[]; suppliers: string[] };
+type FacetValue = { value: string; count: number };
+type PriceBucket = { min: number | null; max: number | null; count: number };
+type Facets = { total: number; categories: FacetValue[]; suppliers: FacetValue[]; price: PriceBucket[] };
+
+function withSelected(values: FacetValue[], selected: string): FacetValue[] {
+  return !selected || values.some((v) => v.value === selected) ? values : [{ value: selected, count: 0 }, ...values];
+}
 
 export function ProductsBrowser({
   initialQ,
   initialPage,
+  initialCategory = "",
+  initialSupplier = "",
 }: {
   initialQ: string;
   initialPage: number;
+  initialCategory?: string;
+  initialSupplier?: string;
 }) {
   const [q, setQ] = useState(initialQ);
   const [page, setPage] = useState(initialPage);
 
-  const [category, setCategory] = useState("");
-  const [supplier, setSupplier] = useState("");
+  const [category, setCategory] = useState(initialCategory);
+  const [supplier, setSupplier] = useState(initialSupplier);
   const [minPrice, setMinPrice] = useState("");
   const [maxPrice, setMaxPrice] = useState("");
   const [sort, setSort] = useState<"new" | "price_asc" | "price_desc" | "name_asc">("new");
 
-  const [filters, setFilters] = useState<Filters>({ categories: [], suppliers: [] });
+  const [facets, setFacets] = useState<Facets>({ total: 0, categories: [], suppliers: [], price: [] });
   const [items, setItems] = useState<Product[]>([]);
   const [err, setErr] = useState<string | null>(null);
   const [busy, setBusy] = useState(false);
@@ -34,13 +44,24 @@ export function ProductsBrowser({
   useEffect(() => {
     (async () => {
       try {
-        const f = await api("/api/products/filters");
-        setFilters(f);
+        const params = new URLSearchParams();
+        if (q.trim()) params.set("q", q.trim());
+        if (category) params.set("category", category);
+        if (supplier) params.set("supplier", supplier);
+        if (minPrice) params.set("min_price", minPrice);
+        if (maxPrice) params.set("max_price", maxPrice);
+        setFacets(await api(`/api/products/facets?${params.toString()}`));
       } catch {
         // ignore
       }
     })();
-  }, []);
+  }, [q, category, supplier, minPrice, maxPrice]);
+
+  function pickPrice(b: PriceBucket) {
+    setPage(1);
+    setMinPrice(b.min === null ? "" : String(b.min));
+    setMaxPrice(b.max === null ? "" : (b.max - 0.01).toFixed(2));
+  }
 
   useEffect(() => {
     (async () => {
@@ -82,14 +103,14 @@ export function ProductsBrowser({
             <div className="text-xs text-zinc-500 mb-1">Категорія</div>
             <select className="w-full rounded-xl border px-3 py-2" value={category} onChange={(e) => { setPage(1); setCategory(e.target.value); }}>
               <option value="">Всі</option>
-              {filters.categories.map((c) => <option key={c} value={c}>{c}</option>)}
+              {withSelected(facets.categories, category).map((c) => <option key={c.value} value={c.value}>{c.value} ({c.count})</option>)}
             </select>
           </div>
           <div>
             <div className="text-xs text-zinc-500 mb-1">Постачальник</div>
             <select className="w-full rounded-xl border px-3 py-2" value={supplier} onChange={(e) => { setPage(1); setSupplier(e.target.value); }}>
               <option value="">Всі</option>
-              {filters.suppliers.map((s) => <option key={s} value={s}>{s}</option>)}
+              {withSelected(facets.suppliers, supplier).map((s) => <option key={s.value} value={s.value}>{s.value} ({s.count})</option>)}
             </select>
           </div>
           <div>
@@ -109,6 +130,18 @@ export function ProductsBrowser({
             </select>
           </div>
         </div>
+        <div className="mt-3 flex flex-wrap gap-2">
+          {facets.price.filter((b) => b.count > 0).map((b) => (
+            <button
+              key={`${b.min}-${b.max}`}
+              className="rounded-xl border px-3 py-2 text-sm hover:bg-zinc-50"
+              onClick={() => pickPrice(b)}
+              type="button"
+            >
+              {b.min === null ? `до ${b.max}` : b.max === null ? `від ${b.min}` : `${b.min}–${b.max}`} ₴ ({b.count})
+            </button>
+          ))}
+        </div>
         <div className="mt-3 flex flex-wrap gap-2">
           <button
             className="rounded-xl border px-3 py-2 text-sm hover:bg-zinc-50"
@@ -117,6 +150,7 @@ export function ProductsBrowser({
           >
             Скинути
           </button>
+          <div className="text-sm text-zinc-500 py-2">Знайдено: {facets.total}</div>
           {busy && <div className="text-sm text-zinc-500 py-2">Завантаження…</div>}
         </div>
         {err && <div className="mt-3 text-sm text-red-700">{err}</div>}
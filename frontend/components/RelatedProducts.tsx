@@ -0,0 +1,25 @@
+"use client";
+import { useEffect, useState } from "react";
+import { api } from "./api";
+import { ProductCard, Product } from "./ProductCard";
+
+// Завантажується в браузері: сторінка товару статична, а пари "купують разом" змінюються з новими замовленнями.
+export function RelatedProducts({ slug }: { slug: string }) {
+  const [items, setItems] = useState<Product[]>([]);
+
+  useEffect(() => {
+    api(`/api/products/${encodeURIComponent(slug)}/related?limit=4`)
+      .then(setItems)
+      .catch(() => setItems([]));
+  }, [slug]);
+
+  if (!items.length) return null;
+  return (
+    <section className="mt-10">
+      <h2 className="text-xl font-extrabold mb-4">Разом з цим купують</h2>
+      <div className="grid grid-cols-2 md:grid-cols-4 gap-4">
+        {items.map((p) => <ProductCard key={p.id} p={p} />)}
+      </div>
+    </section>
+  );
+}
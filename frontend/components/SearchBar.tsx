@@ -1,18 +1,48 @@
 "use client";
+import Link from "next/link";
 import { useEffect, useState } from "react";
 import { useRouter, useSearchParams } from "next/navigation";
+import { api } from "./api";
+
+type Suggestions = {
+  products: { id: number; name: string; slug: string; category: string | null }[];
+  categories: { name: string; count: number }[];
+  suppliers: { name: string; count: number }[];
+};
+
+const EMPTY: Suggestions = { products: [], categories: [], suppliers: [] };
 
 export function SearchBar() {
   const router = useRouter();
   const sp = useSearchParams();
   const [q, setQ] = useState(sp.get("q") || "");
+  const [open, setOpen] = useState(false);
+  const [hints, setHints] = useState<Suggestions>(EMPTY);
 
   useEffect(() => {
     setQ(sp.get("q") || "");
   }, [sp]);
 
+  useEffect(() => {
+    if (!q.trim()) {
+      setHints(EMPTY);
+      return;
+    }
+    // підказки з індексу в памʼяті API; запит — після паузи в наборі
+    const ctrl = new AbortController();
+    const t = setTimeout(async () => {
+      try {
+        setHints(await api(`/api/products/suggest?q=${encodeURIComponent(q.trim())}&limit=6`, { signal: ctrl.signal }));
+      } catch {
+        // ignore
+      }
+    }, 120);
+    return () => { clearTimeout(t); ctrl.abort(); };
+  }, [q]);
+
   function submit(e: React.FormEvent) {
     e.preventDefault();
+    setOpen(false);
     const p = new URLSearchParams(sp.toString());
     if (q.trim()) p.set("q", q.trim());
     else p.delete("q");
@@ -20,17 +50,48 @@ export function SearchBar() {
     router.push(`/products?${p.toString()}`);
   }
 
+  function pick(param: "category" | "supplier", value: string) {
+    setOpen(false);
+    setQ("");
+    router.push(`/products?${new URLSearchParams({ [param]: value }).toString()}`);
+  }
+
+  const shown = open && (hints.products.length + hints.categories.length + hints.suppliers.length > 0);
+
   return (
-    <form onSubmit={submit} className="flex gap-2">
+    <form onSubmit={submit} className="relative flex gap-2">
       <input
         value={q}
-        onChange={(e) => setQ(e.target.value)}
+        onChange={(e) => { setQ(e.target.value); setOpen(true); }}
+        onFocus={() => setOpen(true)}
+        onBlur={() => setTimeout(() => setOpen(false), 150)}
+        onKeyDown={(e) => { if (e.key === "Escape") setOpen(false); }}
         placeholder="Пошук товарів..."
         className="flex-1 rounded-2xl border px-4 py-3"
       />
       <button className="rounded-2xl px-5 py-3 bg-zinc-900 text-white font-bold hover:bg-zinc-800">
         Пошук
       </button>
+      {shown && (
+        <div className="absolute left-0 right-0 top-full mt-1 z-50 rounded-2xl border bg-white shadow-lg py-2 text-sm">
+          {hints.products.map((p) => (
+            <Link key={p.id} href={`/product/${p.slug}`} onClick={() => setOpen(false)} className="block px-4 py-2 hover:bg-zinc-50">
+              {p.name}
+              {p.category && <span className="ml-2 text-xs text-zinc-500">{p.category}</span>}
+            </Link>
+          ))}
+          {hints.categories.map((c) => (
+            <button key={`c-${c.name}`} type="button" onClick={() => pick("category", c.name)} className="block w-full text-left px-4 py-2 hover:bg-zinc-50">
+              <span className="text-zinc-500">Категорія:</span> {c.name} <span className="text-xs text-zinc-500">({c.count})</span>
+            </button>
+          ))}
+          {hints.suppliers.map((s) => (
+            <button key={`s-${s.name}`} type="button" onClick={() => pick("supplier", s.name)} className="block w-full text-left px-4 py-2 hover:bg-zinc-50">
+              <span className="text-zinc-500">Постачальник:</span> {s.name} <span className="text-xs text-zinc-500">({s.count})</span>
+            </button>
+          ))}
+        </div>
+      )}
     </form>
   );
 }
@@ -15,7 +15,7 @@ export function clearToken() {
   localStorage.removeItem("zg_is_admin");
 }
 
-export async function api(path: string, opts: RequestInit = {}) {
+export async function apiResponse(path: string, opts: RequestInit = {}): Promise<Response> {
   const token = getToken();
   const headers = new Headers(opts.headers || {});
   if (!headers.has("Content-Type") && !(opts.body instanceof FormData)) headers.set("Content-Type","application/json");
@@ -25,6 +25,11 @@ export async function api(path: string, opts: RequestInit = {}) {
     const msg = await res.text().catch(()=> "");
     throw new Error(msg || `HTTP ${res.status}`);
   }
+  return res;
+}
+
+export async function api(path: string, opts: RequestInit = {}) {
+  const res = await apiResponse(path, opts);
   const ct = res.headers.get("content-type") || "";
   if (ct.includes("application/json")) return res.json();
   return res.text();
@@ -0,0 +1,29 @@
+import { PHASE_PRODUCTION_BUILD } from "next/constants";
+
+const API_BASE = process.env.NEXT_PUBLIC_API_BASE || "http://localhost:8000";
+
+let exported: Promise<Map<string, any> | null> | null = null;
+
+async function load(): Promise<Map<string, any> | null> {
+  try {
+    // NDJSON, one ProductOut per line; too big for the fetch cache
+    const res = await fetch(`${API_BASE}/api/products/export`, { cache: "no-store" });
+    if (!res.ok) return null;
+    const bySlug = new Map<string, any>();
+    for (const line of (await res.text()).split("\n")) {
+      if (!line) continue;
+      const p = JSON.parse(line);
+      bySlug.set(p.slug, p);
+    }
+    return bySlug;
+  } catch {
+    return null;
+  }
+}
+
+// Під час `next build` — один запит на весь каталог (на процес збірки) замість запиту на кожен товар.
+export function buildCatalog(): Promise<Map<string, any> | null> {
+  if (process.env.NEXT_PHASE !== PHASE_PRODUCTION_BUILD) return Promise.resolve(null);
+  exported ??= load();
+  return exported;
+}